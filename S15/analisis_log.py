@@ -0,0 +1,239 @@
+"""
+Analítica en streaming sobre parking.log.
+
+Lee tanto el formato de texto original ("2026-01-14 17:55:54 - ENTRADA EXITOSA - ...")
+como las líneas JSON que escribe configurar_logging(). El fichero se recorre línea
+a línea con memoria constante: solo se acumulan contadores por hora, por plaza y
+un histograma de tiempos de estancia. Con --procesos N el fichero se divide en
+trozos por bytes que se procesan en paralelo y luego se combinan.
+
+Uso:
+    python analisis_log.py parking.log
+    python analisis_log.py parking.log --procesos 8 --json
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from bisect import bisect_left
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# "Veh\S*" tolera la tilde mal codificada de los logs antiguos
+RE_LINEA = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) - (.*)$')
+RE_ENTRADA = re.compile(r'ENTRADA EXITOSA - Veh\S* (\w+) estacionado en plaza (\w+)')
+RE_SALIDA = re.compile(r'SALIDA - Veh\S* (\w+) sale de plaza (\w+) - Tiempo: ([\d.]+)s - Tarifa: ([\d.]+)')
+RE_RECHAZO = re.compile(r'ENTRADA RECHAZADA')
+
+# Límites superiores (segundos) de los tramos del histograma de estancias
+TRAMOS_ESTANCIA = (10, 30, 60, 300, 900, 1800, 3600, 7200, 14400, 28800, 86400)
+
+class Estadisticas:
+    """Acumulador combinable de los contadores del log"""
+    def __init__(self):
+        self.lineas = 0
+        self.entradas = 0
+        self.rechazos = 0
+        self.salidas = 0
+        self.ingresos_por_hora = Counter()
+        self.segundos_por_plaza = Counter()
+        self.histograma = [0] * (len(TRAMOS_ESTANCIA) + 1)
+        self.suma_estancias = 0.0
+        self.max_estancia = 0.0
+        self.primer_ts = None
+        self.ultimo_ts = None
+    
+    def registrar(self, ts, evento, plaza=None, segundos=0.0, tarifa=0.0):
+        """Acumula un evento ya interpretado"""
+        if self.primer_ts is None or ts < self.primer_ts:
+            self.primer_ts = ts
+        if self.ultimo_ts is None or ts > self.ultimo_ts:
+            self.ultimo_ts = ts
+        
+        if evento == 'entrada':
+            self.entradas += 1
+        elif evento == 'rechazo':
+            self.rechazos += 1
+        elif evento == 'salida':
+            self.salidas += 1
+            self.ingresos_por_hora[ts[:13]] += tarifa
+            self.segundos_por_plaza[plaza] += segundos
+            self.histograma[bisect_left(TRAMOS_ESTANCIA, segundos)] += 1
+            self.suma_estancias += segundos
+            if segundos > self.max_estancia:
+                self.max_estancia = segundos
+    
+    def combinar(self, otra):
+        """Suma en esta instancia los contadores de otra"""
+        self.lineas += otra.lineas
+        self.entradas += otra.entradas
+        self.rechazos += otra.rechazos
+        self.salidas += otra.salidas
+        self.ingresos_por_hora.update(otra.ingresos_por_hora)
+        self.segundos_por_plaza.update(otra.segundos_por_plaza)
+        self.histograma = [a + b for a, b in zip(self.histograma, otra.histograma)]
+        self.suma_estancias += otra.suma_estancias
+        self.max_estancia = max(self.max_estancia, otra.max_estancia)
+        for ts in (otra.primer_ts, otra.ultimo_ts):
+            if ts is not None:
+                if self.primer_ts is None or ts < self.primer_ts:
+                    self.primer_ts = ts
+                if self.ultimo_ts is None or ts > self.ultimo_ts:
+                    self.ultimo_ts = ts
+        return self
+    
+    def informe(self):
+        """Devuelve las métricas derivadas como diccionario"""
+        intentos = self.entradas + self.rechazos
+        periodo = _segundos_entre(self.primer_ts, self.ultimo_ts)
+        return {
+            'lineas': self.lineas,
+            'entradas': self.entradas,
+            'rechazos': self.rechazos,
+            'salidas': self.salidas,
+            'tasa_rechazo': self.rechazos / intentos if intentos else 0,
+            'ingresos_total': round(sum(self.ingresos_por_hora.values()), 2),
+            'ingresos_por_hora': {h: round(v, 2) for h, v in sorted(self.ingresos_por_hora.items())},
+            'estancia_media_segundos': self.suma_estancias / self.salidas if self.salidas else 0,
+            'estancia_max_segundos': self.max_estancia,
+            'histograma_estancias': {
+                _etiqueta_tramo(i): n for i, n in enumerate(self.histograma)
+            },
+            'periodo_segundos': periodo,
+            'utilizacion_por_plaza': {
+                plaza: (segundos / periodo if periodo else 0)
+                for plaza, segundos in sorted(self.segundos_por_plaza.items())
+            }
+        }
+
+def _segundos_entre(ts_inicio, ts_fin):
+    """Segundos entre dos timestamps 'YYYY-MM-DD HH:MM:SS'"""
+    if ts_inicio is None or ts_fin is None:
+        return 0
+    formato = '%Y-%m-%d %H:%M:%S'
+    return (datetime.strptime(ts_fin, formato) - datetime.strptime(ts_inicio, formato)).total_seconds()
+
+def _etiqueta_tramo(indice):
+    if indice == len(TRAMOS_ESTANCIA):
+        return f">{TRAMOS_ESTANCIA[-1]}s"
+    return f"<={TRAMOS_ESTANCIA[indice]}s"
+
+def _decodificar(linea_bytes):
+    """Los logs antiguos están en cp1252; los nuevos en UTF-8"""
+    try:
+        return linea_bytes.decode('utf-8')
+    except UnicodeDecodeError:
+        return linea_bytes.decode('cp1252', errors='replace')
+
+def procesar_linea(linea, estadisticas):
+    """Interpreta una línea (texto o JSON) y la acumula"""
+    estadisticas.lineas += 1
+    
+    if linea.startswith('{'):
+        try:
+            datos = json.loads(linea)
+        except ValueError:
+            return
+        evento = datos.get('evento')
+        if evento in ('entrada', 'rechazo', 'salida'):
+            estadisticas.registrar(datos['ts'], evento, datos.get('plaza'),
+                                   datos.get('segundos', 0.0), datos.get('tarifa', 0.0))
+        return
+    
+    coincidencia = RE_LINEA.match(linea)
+    if not coincidencia:
+        return
+    ts, mensaje = coincidencia.groups()
+    
+    if mensaje.startswith('ENTRADA EXITOSA'):
+        if RE_ENTRADA.match(mensaje):
+            estadisticas.registrar(ts, 'entrada')
+    elif mensaje.startswith('SALIDA -'):
+        salida = RE_SALIDA.match(mensaje)
+        if salida:
+            _, plaza, segundos, tarifa = salida.groups()
+            estadisticas.registrar(ts, 'salida', plaza, float(segundos), float(tarifa))
+    elif RE_RECHAZO.match(mensaje):
+        estadisticas.registrar(ts, 'rechazo')
+
+def analizar_trozo(archivo, inicio, fin):
+    """Procesa las líneas que empiezan en el rango de bytes [inicio, fin)"""
+    estadisticas = Estadisticas()
+    with open(archivo, 'rb') as f:
+        if inicio > 0:
+            # Alinear al comienzo de la siguiente línea completa
+            f.seek(inicio - 1)
+            f.readline()
+        while f.tell() < fin:
+            linea = f.readline()
+            if not linea:
+                break
+            procesar_linea(_decodificar(linea).rstrip('\r\n'), estadisticas)
+    return estadisticas
+
+def analizar(archivo, procesos=1):
+    """
+    Analiza un log completo, opcionalmente en paralelo.
+    
+    Args:
+        archivo: Ruta de parking.log
+        procesos: Número de procesos (1 = secuencial)
+    
+    Returns:
+        Estadisticas: contadores combinados de todo el fichero
+    """
+    tamano = os.path.getsize(archivo)
+    if procesos <= 1 or tamano < 1024 * 1024:
+        return analizar_trozo(archivo, 0, tamano)
+    
+    # Varios trozos por proceso para repartir mejor la carga
+    num_trozos = procesos * 4
+    limites = [tamano * i // num_trozos for i in range(num_trozos + 1)]
+    total = Estadisticas()
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = [pool.submit(analizar_trozo, archivo, limites[i], limites[i + 1])
+                   for i in range(num_trozos)]
+        for futuro in futuros:
+            total.combinar(futuro.result())
+    return total
+
+def imprimir_informe(informe):
+    print(f"Líneas leídas:      {informe['lineas']}")
+    print(f"Entradas:           {informe['entradas']}")
+    print(f"Rechazos:           {informe['rechazos']} ({informe['tasa_rechazo'] * 100:.1f}%)")
+    print(f"Salidas:            {informe['salidas']}")
+    print(f"Ingresos totales:   {informe['ingresos_total']:.2f}€")
+    print(f"Estancia media:     {informe['estancia_media_segundos']:.1f}s "
+          f"(máx {informe['estancia_max_segundos']:.1f}s)")
+    
+    print("\nIngresos por hora:")
+    for hora, ingresos in informe['ingresos_por_hora'].items():
+        print(f"  {hora}h  {ingresos:10.2f}€")
+    
+    print("\nDistribución de estancias:")
+    for tramo, n in informe['histograma_estancias'].items():
+        print(f"  {tramo:>9}  {n}")
+    
+    print("\nUtilización por plaza:")
+    for plaza, uso in informe['utilizacion_por_plaza'].items():
+        print(f"  {plaza:>4}  {uso * 100:5.1f}%")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analítica de parking.log")
+    parser.add_argument('archivo', nargs='?', default='parking.log')
+    parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1,
+                        help="procesos para ficheros grandes (por defecto, todos los núcleos)")
+    parser.add_argument('--json', action='store_true', help="salida en JSON")
+    args = parser.parse_args(argv)
+    
+    informe = analizar(args.archivo, args.procesos).informe()
+    if args.json:
+        json.dump(informe, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        imprimir_informe(informe)
+
+if __name__ == "__main__":
+    main()
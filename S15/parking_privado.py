@@ -1,20 +1,78 @@
 import json
+import os
 import random
 import string
+import sys
+import tempfile
 from datetime import datetime, timedelta
 import tkinter as tk
 from tkinter import messagebox, simpledialog
 import logging
+import logging.handlers
+import queue
 from threading import Thread
 import time
 
-# Configurar logging
-logging.basicConfig(
-    filename='parking.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+# ========================= LOGGING =========================
+
+logger = logging.getLogger('parking')
+logger.addHandler(logging.NullHandler())
+
+# Campos estructurados que se copian del LogRecord a cada línea JSON
+CAMPOS_EVENTO = ('evento', 'matricula', 'plaza', 'intento', 'tipo', 'segundos', 'tarifa')
+
+class FormateadorJSON(logging.Formatter):
+    """Formatea cada registro como una línea JSON (UTF-8)"""
+    def __init__(self):
+        super().__init__(datefmt='%Y-%m-%d %H:%M:%S')
+    
+    def format(self, record):
+        datos = {
+            'ts': self.formatTime(record, self.datefmt),
+            'nivel': record.levelname,
+            'msg': record.getMessage()
+        }
+        for campo in CAMPOS_EVENTO:
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                datos[campo] = valor
+        return json.dumps(datos, ensure_ascii=False)
+
+class ManejadorCola(logging.handlers.QueueHandler):
+    """QueueHandler que no formatea en el hilo que emite el evento.
+    
+    El QueueHandler estándar llama a format() antes de encolar; aquí se
+    encola el registro tal cual y el formateo (mensaje + JSON) lo hace el
+    hilo escritor en segundo plano.
+    """
+    def prepare(self, record):
+        return record
+
+def configurar_logging(archivo='parking.log', max_bytes=5 * 1024 * 1024, copias=5, nivel=logging.INFO):
+    """Configura el logging del parking con escritura en segundo plano.
+    
+    Los eventos se encolan sin formatear y un QueueListener los escribe en
+    `archivo` como líneas JSON UTF-8, rotando el fichero al llegar a
+    `max_bytes` (se conservan `copias` ficheros antiguos).
+    
+    Returns:
+        QueueListener: listener arrancado (llamar a stop() para vaciar la cola)
+    """
+    cola = queue.SimpleQueue()
+    escritor = logging.handlers.RotatingFileHandler(
+        archivo, maxBytes=max_bytes, backupCount=copias, encoding='utf-8'
+    )
+    escritor.setFormatter(FormateadorJSON())
+    
+    for manejador in list(logger.handlers):
+        logger.removeHandler(manejador)
+    logger.addHandler(ManejadorCola(cola))
+    logger.setLevel(nivel)
+    logger.propagate = False
+    
+    listener = logging.handlers.QueueListener(cola, escritor, respect_handler_level=False)
+    listener.start()
+    return listener
 
 class Coche:
     """Clase que representa un vehículo"""
@@ -134,7 +192,10 @@ class Cabina:
         coche = Coche(matricula, es_minusvalido)
         
         tipo_vehiculo = "MINUSVÁLIDO" if es_minusvalido else "NORMAL"
-        logging.info(f"INTENTO DE ENTRADA - Vehículo {matricula} ({tipo_vehiculo}) intenta acceder al parking")
+        registrar = logger.isEnabledFor(logging.INFO)
+        if registrar:
+            logger.info("INTENTO DE ENTRADA - Vehículo %s (%s) intenta acceder al parking", matricula, tipo_vehiculo,
+                        extra={'evento': 'intento_entrada', 'matricula': matricula, 'tipo': tipo_vehiculo})
         
         # Buscar plaza aleatoriamente con máximo de intentos
         aparcamiento_asignado = None
@@ -144,13 +205,18 @@ class Cabina:
             if aparcamiento.puede_ocupar(coche):
                 aparcamiento.ocupar(coche)
                 aparcamiento_asignado = aparcamiento
-                logging.info(f"ENTRADA EXITOSA - Vehículo {matricula} estacionado en plaza {aparcamiento.id} (intento {intento})")
+                if registrar:
+                    logger.info("ENTRADA EXITOSA - Vehículo %s estacionado en plaza %s (intento %d)", matricula, aparcamiento.id, intento,
+                                extra={'evento': 'entrada', 'matricula': matricula, 'plaza': aparcamiento.id, 'intento': intento})
                 return True, f"Vehículo {matricula} estacionado en {aparcamiento.id}"
             else:
-                motivo = "ocupada" if aparcamiento.ocupado else "solo minusválidos"
-                logging.info(f"Intento {intento} - Plaza {aparcamiento.id} no disponible ({motivo})")
+                if registrar:
+                    motivo = "ocupada" if aparcamiento.ocupado else "solo minusválidos"
+                    logger.info("Intento %d - Plaza %s no disponible (%s)", intento, aparcamiento.id, motivo,
+                                extra={'evento': 'intento_fallido', 'matricula': matricula, 'plaza': aparcamiento.id, 'intento': intento})
         
-        logging.warning(f"ENTRADA RECHAZADA - Vehículo {matricula} no encontró plaza tras {self.MAX_INTENTOS_BUSQUEDA} intentos")
+        logger.warning("ENTRADA RECHAZADA - Vehículo %s no encontró plaza tras %d intentos", matricula, self.MAX_INTENTOS_BUSQUEDA,
+                       extra={'evento': 'rechazo', 'matricula': matricula, 'intento': self.MAX_INTENTOS_BUSQUEDA})
         return False, f"Vehículo {matricula} no encontró plaza y se fue"
     
     def procesar_salida(self, parking, id_aparcamiento=None):
@@ -159,7 +225,7 @@ class Cabina:
         if id_aparcamiento is None:
             aparcamientos_ocupados = [a for a in parking.aparcamientos if a.ocupado]
             if not aparcamientos_ocupados:
-                logging.warning("SALIDA FALLIDA - No hay vehículos en el parking")
+                logger.warning("SALIDA FALLIDA - No hay vehículos en el parking", extra={'evento': 'salida_fallida'})
                 return False, "No hay vehículos para salir"
             aparcamiento = random.choice(aparcamientos_ocupados)
         else:
@@ -171,10 +237,13 @@ class Cabina:
             
             segundos = tiempo_estacionado.total_seconds() if tiempo_estacionado else 0
             
-            logging.info(f"SALIDA - Vehículo {coche.matricula} sale de plaza {aparcamiento.id} - Tiempo: {segundos:.1f}s - Tarifa: {tarifa}€")
+            logger.info("SALIDA - Vehículo %s sale de plaza %s - Tiempo: %.1fs - Tarifa: %s€", coche.matricula, aparcamiento.id, segundos, tarifa,
+                        extra={'evento': 'salida', 'matricula': coche.matricula, 'plaza': aparcamiento.id,
+                               'segundos': round(segundos, 1), 'tarifa': tarifa})
             return True, f"Vehículo {coche.matricula} - Tiempo: {segundos:.1f}s - Tarifa: {tarifa}€"
         else:
-            logging.warning(f"SALIDA FALLIDA - Plaza {id_aparcamiento if id_aparcamiento else 'aleatoria'} no está ocupada")
+            logger.warning("SALIDA FALLIDA - Plaza %s no está ocupada", id_aparcamiento or 'aleatoria',
+                           extra={'evento': 'salida_fallida', 'plaza': id_aparcamiento})
             return False, "El aparcamiento no está ocupado"
 
 class Parking:
@@ -185,7 +254,8 @@ class Parking:
         self.filas = filas
         self.columnas = columnas
         self._crear_aparcamientos(filas, columnas, porcentaje_minusvalidos)
-        logging.info(f"SISTEMA INICIADO - Parking creado con {len(self.aparcamientos)} plazas ({filas}x{columnas})")
+        logger.info("SISTEMA INICIADO - Parking creado con %d plazas (%dx%d)", len(self.aparcamientos), filas, columnas,
+                    extra={'evento': 'inicio'})
     
     def _crear_aparcamientos(self, filas, columnas, porcentaje_minusvalidos):
         """Crea la estructura de aparcamientos"""
@@ -209,7 +279,8 @@ class Parking:
             self.aparcamientos.append(aparcamiento)
             
             if solo_minusvalidos:
-                logging.info(f"Plaza {id_aparcamiento} configurada como EXCLUSIVA para minusválidos")
+                logger.info("Plaza %s configurada como EXCLUSIVA para minusválidos", id_aparcamiento,
+                            extra={'evento': 'config_plaza', 'plaza': id_aparcamiento})
     
     def buscar_aparcamiento_por_id(self, id_aparcamiento):
         """Busca un aparcamiento por su ID"""
@@ -233,7 +304,7 @@ class Parking:
         }
         with open(archivo, 'w') as f:
             json.dump(datos, f, indent=2)
-        logging.info("Estado del parking guardado en JSON")
+        logger.info("Estado del parking guardado en JSON", extra={'evento': 'guardado'})
     
     @staticmethod
     def cargar_estado(archivo='parking_estado.json'):
@@ -244,7 +315,7 @@ class Parking:
             
             parking = Parking(datos['filas'], datos['columnas'], 0)
             parking.aparcamientos = [Aparcamiento.from_dict(a) for a in datos['aparcamientos']]
-            logging.info("Estado del parking cargado desde JSON")
+            logger.info("Estado del parking cargado desde JSON", extra={'evento': 'cargado'})
             return parking
         except FileNotFoundError:
             return None
@@ -409,10 +480,10 @@ class InterfazParking:
         self.automatico = not self.automatico
         if self.automatico:
             self.boton_automatico.config(text="Detener Automático", bg='darkred')
-            logging.info("MODO AUTOMÁTICO ACTIVADO")
+            logger.info("MODO AUTOMÁTICO ACTIVADO", extra={'evento': 'automatico'})
         else:
             self.boton_automatico.config(text="Iniciar Automático", bg='purple')
-            logging.info("MODO AUTOMÁTICO DESACTIVADO")
+            logger.info("MODO AUTOMÁTICO DESACTIVADO", extra={'evento': 'automatico'})
     
     def proceso_automatico(self):
         """Proceso que simula entradas y salidas automáticas"""
@@ -440,10 +511,49 @@ class InterfazParking:
         """Inicia la interfaz gráfica"""
         self.ventana.mainloop()
 
+def medir_rendimiento(operaciones=20000, con_logging=True):
+    """Mide entradas+salidas por segundo con el logging activado o desactivado.
+    
+    El log de la medición va a un fichero temporal para no mezclarse con parking.log.
+    """
+    random.seed(1234)
+    listener = None
+    if con_logging:
+        archivo = tempfile.NamedTemporaryFile(suffix='.log', delete=False).name
+        listener = configurar_logging(archivo)
+    else:
+        logger.disabled = True
+    
+    parking = Parking(filas=7, columnas=10, porcentaje_minusvalidos=0.15)
+    inicio = time.perf_counter()
+    for i in range(operaciones):
+        if i % 2 == 0:
+            parking.cabina.procesar_entrada(parking)
+        else:
+            parking.cabina.procesar_salida(parking)
+    duracion = time.perf_counter() - inicio
+    
+    if listener:
+        listener.stop()
+        for manejador in list(logger.handlers):
+            logger.removeHandler(manejador)
+        logger.addHandler(logging.NullHandler())
+        os.remove(archivo)
+    logger.disabled = False
+    return operaciones / duracion
+
 if __name__ == "__main__":
-    logging.info("="*60)
-    logging.info("INICIO DEL SISTEMA DE PARKING")
-    logging.info("="*60)
+    if '--benchmark' in sys.argv:
+        sin_log = medir_rendimiento(con_logging=False)
+        con_log = medir_rendimiento(con_logging=True)
+        print(f"Sin logging: {sin_log:,.0f} ops/s")
+        print(f"Con logging: {con_log:,.0f} ops/s ({con_log / sin_log * 100:.0f}%)")
+        sys.exit(0)
+    
+    listener = configurar_logging()
+    logger.info("="*60)
+    logger.info("INICIO DEL SISTEMA DE PARKING")
+    logger.info("="*60)
     
     # Intentar cargar estado previo
     parking = Parking.cargar_estado()
@@ -454,4 +564,7 @@ if __name__ == "__main__":
         parking = Parking(filas=7, columnas=10, porcentaje_minusvalidos=0.15)
     
     interfaz = InterfazParking(parking)
-    interfaz.iniciar()
\ No newline at end of file
+    try:
+        interfaz.iniciar()
+    finally:
+        listener.stop()
@@ -0,0 +1,241 @@
+"""
+Mediciones de rendimiento del parking.
+
+Uso:
+    python benchmarks.py snapshots [--filas 26 --columnas 40]
+    python benchmarks.py puertas [--puertas 1,2,4,8 --servicio 0.5]
+    python benchmarks.py lotes [--lotes 1000,10000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from gestor_lotes import AlmacenLotes, GestorLotes
+from parking_privado import COMPRESIONES, Parking
+
+def _llenar(parking, proporcion):
+    """Ocupa aproximadamente `proporcion` de las plazas"""
+    for _ in range(int(len(parking.aparcamientos) * proporcion)):
+        parking.entrar()
+
+# ========================= SNAPSHOTS =========================
+
+def medir_snapshots(filas=26, columnas=40, ocupacion=0.6, repeticiones=5, semilla=0):
+    """
+    Compara tamaño, tiempo de guardado y de carga del JSON plano (esquemas
+    v1 y v2) frente a los snapshots comprimidos (v2).
+    
+    Returns:
+        list: Una fila (dict) por formato
+    """
+    parking = Parking(filas, columnas, semilla=semilla)
+    _llenar(parking, ocupacion)
+    resultados = []
+    
+    with tempfile.TemporaryDirectory() as directorio:
+        formatos = [('json v1', 1, None), ('json v2', 2, None)] + [(c, 2, c) for c in COMPRESIONES]
+        for formato, version, compresion in formatos:
+            archivo = os.path.join(directorio, f"estado_{formato.replace(' ', '_')}")
+            
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                parking.guardar_estado(archivo, compresion, version)
+            guardado = (time.perf_counter() - inicio) / repeticiones
+            
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                Parking.cargar_estado(archivo)
+            carga = (time.perf_counter() - inicio) / repeticiones
+            
+            resultados.append({
+                'formato': formato,
+                'bytes': os.path.getsize(archivo),
+                'guardado_ms': guardado * 1000,
+                'carga_ms': carga * 1000
+            })
+    return resultados
+
+# ========================= PUERTAS =========================
+
+def _operaciones_puertas(matriculas, puertas, estancia=50):
+    """Cada coche entra y, `estancia` llegadas después, sale por la misma puerta"""
+    operaciones = []
+    for i, matricula in enumerate(matriculas):
+        operaciones.append((i % puertas, 'entrar', (matricula, False, False)))
+        if i >= estancia:
+            anterior = i - estancia
+            operaciones.append((anterior % puertas, 'salir', (matriculas[anterior],)))
+    return operaciones
+
+def _medir_lote(filas, columnas, vehiculos, puertas, espera, semilla):
+    """Operaciones por segundo de un lote repartido entre `puertas` cabinas, y sus métricas"""
+    parking = Parking(filas, columnas, num_cabinas=puertas, semilla=semilla)
+    operaciones = _operaciones_puertas(parking.cabina.generar_matriculas(vehiculos), puertas)
+    
+    inicio = time.perf_counter()
+    parking.procesar_lote(operaciones, espera)
+    duracion = time.perf_counter() - inicio
+    return len(operaciones) / duracion, parking.metricas_puertas()
+
+def medir_puertas(filas=26, columnas=40, vehiculos=4000, puertas=(1, 2, 4, 8), servicio_ms=0.5,
+                  semilla=0):
+    """
+    Rendimiento de entradas/salidas al repartir la carga entre N cabinas.
+    
+    Cada número de puertas se mide dos veces. Con espera: cada vehículo
+    duerme `servicio_ms` fuera del cerrojo simulando la barrera, así que el
+    escalado viene sobre todo de solapar esas esperas entre hilos. Sin
+    espera: solo el trabajo real del parking, que se serializa en su cerrojo.
+    
+    Args:
+        servicio_ms: Tiempo de barrera simulado por vehículo (fuera del cerrojo)
+    
+    Returns:
+        list: Una fila (dict) por número de puertas
+    """
+    resultados = []
+    base = base_sin_espera = None
+    for n in puertas:
+        rendimiento, metricas = _medir_lote(filas, columnas, vehiculos, n, servicio_ms / 1000, semilla)
+        if servicio_ms:
+            sin_espera, _ = _medir_lote(filas, columnas, vehiculos, n, 0, semilla)
+        else:
+            sin_espera = rendimiento
+        base = base or rendimiento
+        base_sin_espera = base_sin_espera or sin_espera
+        resultados.append({
+            'puertas': n,
+            'ops_con_espera': rendimiento,
+            'acel_con_espera': rendimiento / base,
+            'ops_sin_espera': sin_espera,
+            'acel_sin_espera': sin_espera / base_sin_espera,
+            'rechazos': sum(m['rechazos'] for m in metricas),
+            'servicio_ms': sum(m['servicio_medio_ms'] for m in metricas) / n
+        })
+    return resultados
+
+# ========================= LOTES =========================
+
+def _memoria_por_lote(crear, lotes):
+    """KiB que ocupa cada lote creado con crear(i), medidos con tracemalloc"""
+    tracemalloc.start()
+    try:
+        antes = tracemalloc.get_traced_memory()[0]
+        objetos = [crear(i) for i in range(lotes)]
+        memoria = tracemalloc.get_traced_memory()[0] - antes
+    finally:
+        tracemalloc.stop()
+    del objetos
+    return memoria / lotes / 1024
+
+def _percentil(ordenados, q):
+    return ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))]
+
+def medir_lotes(lotes=(1000, 10000), operaciones=20000, independientes=100, semilla=0):
+    """
+    Memoria por lote y latencia de entrar/salir con muchos parkings de 7x13
+    en un proceso: `independientes` Parking sueltos frente a GestorLotes con
+    cada número de lotes (plantilla y generador de matrículas compartidos y
+    guardado en SQLite).
+    
+    Returns:
+        list: Una fila (dict) por configuración
+    """
+    resultados = [{
+        'modo': 'independientes',
+        'lotes': independientes,
+        'KiB_por_lote': _memoria_por_lote(lambda i: Parking(7, 13, semilla=semilla + i), independientes),
+        'op_p50_us': '-', 'op_p99_us': '-', 'guardar_s': '-', 'cargar_s': '-'
+    }]
+    
+    for n in lotes:
+        with tempfile.TemporaryDirectory() as directorio:
+            almacen = AlmacenLotes(os.path.join(directorio, 'lotes.db'))
+            gestor = GestorLotes(almacen, semilla=semilla)
+            gestor.plantilla()  # la plantilla compartida no cuenta como memoria de cada lote
+            memoria = _memoria_por_lote(lambda i: gestor.crear(f"lote{i:05d}"), n)
+            
+            rng = random.Random(semilla)
+            nombres = gestor.nombres()
+            matriculas = gestor.generador_matriculas.generar_lote(operaciones)
+            dentro = []
+            latencias = []
+            for matricula in matriculas:
+                if dentro and rng.random() < 0.45:
+                    nombre, saliente = dentro.pop(rng.randrange(len(dentro)))
+                    inicio = time.perf_counter()
+                    gestor.salir(nombre, saliente)
+                else:
+                    nombre = rng.choice(nombres)
+                    inicio = time.perf_counter()
+                    if gestor.entrar(nombre, matricula)[0]:
+                        dentro.append((nombre, matricula))
+                latencias.append(time.perf_counter() - inicio)
+            latencias.sort()
+            
+            inicio = time.perf_counter()
+            gestor.guardar()
+            guardado = time.perf_counter() - inicio
+            almacen.cerrar()
+            
+            almacen = AlmacenLotes(os.path.join(directorio, 'lotes.db'))
+            inicio = time.perf_counter()
+            recargado = GestorLotes(almacen)
+            for nombre in nombres:
+                recargado.obtener(nombre)
+            carga = time.perf_counter() - inicio
+            almacen.cerrar()
+        
+        resultados.append({
+            'modo': 'gestor',
+            'lotes': n,
+            'KiB_por_lote': memoria,
+            'op_p50_us': _percentil(latencias, 0.5) * 1e6,
+            'op_p99_us': _percentil(latencias, 0.99) * 1e6,
+            'guardar_s': guardado,
+            'cargar_s': carga
+        })
+    return resultados
+
+def imprimir_tabla(filas):
+    columnas = list(filas[0])
+    print('  '.join(f"{c:>14}" for c in columnas))
+    for fila in filas:
+        print('  '.join(f"{v:>14.2f}" if isinstance(v, float) else f"{v:>14}" for v in fila.values()))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del parking")
+    parser.add_argument('--semilla', type=int, default=0, help="semilla de los generadores aleatorios")
+    sub = parser.add_subparsers(dest='benchmark', required=True)
+    
+    snapshots = sub.add_parser('snapshots', help="JSON plano frente a snapshots comprimidos")
+    snapshots.add_argument('--filas', type=int, default=26)
+    snapshots.add_argument('--columnas', type=int, default=40)
+    
+    puertas = sub.add_parser('puertas', help="escalado con el número de cabinas")
+    puertas.add_argument('--puertas', default='1,2,4,8')
+    puertas.add_argument('--vehiculos', type=int, default=4000)
+    puertas.add_argument('--servicio', type=float, default=0.5, help="ms de barrera por vehículo")
+    
+    lotes = sub.add_parser('lotes', help="memoria y latencia con miles de parkings en un proceso")
+    lotes.add_argument('--lotes', default='1000,10000')
+    lotes.add_argument('--operaciones', type=int, default=20000)
+    args = parser.parse_args(argv)
+    
+    if args.benchmark == 'snapshots':
+        imprimir_tabla(medir_snapshots(args.filas, args.columnas, semilla=args.semilla))
+    elif args.benchmark == 'puertas':
+        numeros = tuple(int(n) for n in args.puertas.split(',') if n)
+        imprimir_tabla(medir_puertas(vehiculos=args.vehiculos, puertas=numeros,
+                                     servicio_ms=args.servicio, semilla=args.semilla))
+        print(f"(con espera: {args.servicio} ms de barrera simulada por vehículo; "
+              "sin espera: solo el trabajo del parking)")
+    elif args.benchmark == 'lotes':
+        numeros = tuple(int(n) for n in args.lotes.split(',') if n)
+        imprimir_tabla(medir_lotes(numeros, args.operaciones, semilla=args.semilla))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Captura y reproducción de carga de trabajo del parking.
+
+GrabadorCarga envuelve un Parking y escribe en una traza cada llamada a
+entrar/salir/cambiar_tarifa con su instante relativo. La traza es texto
+compacto, una operación por línea con los campos separados por tabuladores
+(gzip si el nombre acaba en .gz):
+
+    <segundos>  E  <matricula>  <pmr 0/1>  <ev 0/1>  [<puerta>]
+    <segundos>  S  <matricula>  [<puerta>]
+    <segundos>  T  <nombre estrategia>  [<puerta>]
+
+Sin puerta, E y S van por la 0 y T cambia la tarifa de todas.
+
+importar_log_s15 convierte un parking.log de S15 (texto o JSON lines) a ese
+formato y reproducir lanza la traza contra un Parking sin interfaz, tan rápido
+como se pueda o a tiempo real escalado, midiendo rendimiento y latencias.
+
+Uso:
+    python carga_trabajo.py importar ../../S15/parking.log traza.txt.gz
+    python carga_trabajo.py reproducir traza.txt.gz --velocidad 10
+"""
+import argparse
+import gzip
+import json
+import re
+import time
+from array import array
+from datetime import datetime
+from threading import Lock
+
+from parking_privado import Parking, crear_estrategia
+from registro_estancias import RegistroEstancias
+
+RE_LINEA = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) - (.*)$')
+RE_INTENTO = re.compile(r'INTENTO DE ENTRADA - Veh\S* (\w+) \(([^)]*)\)')
+RE_SALIDA = re.compile(r'SALIDA - Veh\S* (\w+) sale de plaza')
+
+def _abrir(archivo, modo):
+    if archivo.endswith('.gz'):
+        return gzip.open(archivo, modo + 't', encoding='utf-8')
+    return open(archivo, modo, encoding='utf-8')
+
+# ========================= CAPTURA =========================
+
+class GrabadorCarga:
+    """Proxy de Parking que graba las operaciones en una traza.
+    
+    Se puede pasar en lugar del Parking a InterfazParking: el resto de
+    atributos se delegan en el parking real. Admite llamadas desde varios
+    hilos (una por puerta, como procesar_lote).
+    """
+    def __init__(self, parking, archivo):
+        self.parking = parking
+        self._traza = _abrir(archivo, 'w')
+        self._inicio = time.perf_counter()
+        self._cerrojo = Lock()
+    
+    def __getattr__(self, nombre):
+        return getattr(self.parking, nombre)
+    
+    def _escribir(self, *campos):
+        with self._cerrojo:
+            t = time.perf_counter() - self._inicio
+            self._traza.write(f"{t:.3f}\t" + '\t'.join(campos) + '\n')
+    
+    def entrar(self, matricula=None, es_minusvalido=False, es_electrico=False, puerta=0):
+        # Fijar aquí la matrícula generada para que la traza sea reproducible
+        if matricula is None:
+            cabina = self.parking.cabinas[puerta]
+            matricula = cabina.generar_matricula()
+            es_minusvalido, es_electrico = cabina.detectar_caracteristicas()
+        self._escribir('E', matricula, str(int(es_minusvalido)), str(int(es_electrico)), str(puerta))
+        return self.parking.entrar(matricula, es_minusvalido, es_electrico, puerta)
+    
+    def salir(self, matricula, puerta=0):
+        self._escribir('S', matricula, str(puerta))
+        return self.parking.salir(matricula, puerta)
+    
+    def cambiar_tarifa(self, estrategia, puerta=None):
+        campos = ('T', estrategia.get_nombre()) + (() if puerta is None else (str(puerta),))
+        self._escribir(*campos)
+        return self.parking.cambiar_tarifa(estrategia, puerta)
+    
+    def cerrar(self):
+        with self._cerrojo:
+            self._traza.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+def importar_log_s15(archivo_log, archivo_traza):
+    """
+    Convierte un parking.log de S15 en una traza.
+    
+    Cada "INTENTO DE ENTRADA" se convierte en una entrada (salga bien o no) y
+    cada "SALIDA" en una salida. Se aceptan el formato de texto antiguo (cp1252)
+    y las líneas JSON de configurar_logging().
+    
+    Returns:
+        int: Número de operaciones escritas
+    """
+    inicio = None
+    operaciones = 0
+    with open(archivo_log, 'rb') as log, _abrir(archivo_traza, 'w') as traza:
+        for linea in log:
+            try:
+                linea = linea.decode('utf-8')
+            except UnicodeDecodeError:
+                linea = linea.decode('cp1252', errors='replace')
+            linea = linea.rstrip('\r\n')
+            
+            if linea.startswith('{'):
+                try:
+                    datos = json.loads(linea)
+                except ValueError:
+                    continue
+                evento, ts = datos.get('evento'), datos.get('ts')
+                if evento == 'intento_entrada':
+                    campos = ('E', datos['matricula'], str(int(datos.get('tipo') != 'NORMAL')), '0')
+                elif evento == 'salida':
+                    campos = ('S', datos['matricula'])
+                else:
+                    continue
+            else:
+                coincidencia = RE_LINEA.match(linea)
+                if not coincidencia:
+                    continue
+                ts, mensaje = coincidencia.groups()
+                intento = RE_INTENTO.match(mensaje)
+                salida = RE_SALIDA.match(mensaje) if not intento else None
+                if intento:
+                    matricula, tipo = intento.groups()
+                    campos = ('E', matricula, str(int(tipo != 'NORMAL')), '0')
+                elif salida:
+                    campos = ('S', salida.group(1))
+                else:
+                    continue
+            
+            instante = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S')
+            if inicio is None:
+                inicio = instante
+            traza.write(f"{(instante - inicio).total_seconds():.3f}\t" + '\t'.join(campos) + '\n')
+            operaciones += 1
+    return operaciones
+
+def leer_traza(archivo):
+    """Itera (segundos, operación, argumentos) de una traza"""
+    with _abrir(archivo, 'r') as traza:
+        for linea in traza:
+            campos = linea.rstrip('\n').split('\t')
+            if len(campos) >= 2:
+                yield float(campos[0]), campos[1], campos[2:]
+
+# ========================= REPRODUCCIÓN =========================
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return 0
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+def reproducir(parking, archivo, velocidad=None):
+    """
+    Lanza una traza contra un Parking.
+    
+    Args:
+        parking: Parking sobre el que se ejecuta la traza
+        archivo: Traza generada por GrabadorCarga o importar_log_s15
+        velocidad: None = lo más rápido posible; N = tiempo real acelerado N veces
+    
+    Returns:
+        dict: rendimiento, tasa de rechazo y latencias por operación (ms)
+    """
+    num_puertas = len(parking.cabinas)
+    
+    def puerta(argumentos, posicion, defecto=0):
+        # Una traza de un parking con más puertas se reparte entre las que hay
+        return int(argumentos[posicion]) % num_puertas if len(argumentos) > posicion else defecto
+    
+    latencias = {'E': array('d'), 'S': array('d'), 'T': array('d')}
+    entradas = rechazos = salidas = salidas_fallidas = 0
+    inicio = time.perf_counter()
+    
+    for t, operacion, argumentos in leer_traza(archivo):
+        if velocidad:
+            espera = inicio + t / velocidad - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+        
+        t0 = time.perf_counter()
+        if operacion == 'E':
+            exito, _, _ = parking.entrar(argumentos[0], argumentos[1] == '1', argumentos[2] == '1',
+                                         puerta(argumentos, 3))
+            entradas += 1
+            rechazos += not exito
+        elif operacion == 'S':
+            exito, _, _ = parking.salir(argumentos[0], puerta(argumentos, 1))
+            salidas += 1
+            salidas_fallidas += not exito
+        elif operacion == 'T':
+            parking.cambiar_tarifa(crear_estrategia(argumentos[0]), puerta(argumentos, 1, None))
+        else:
+            continue
+        latencias[operacion].append(time.perf_counter() - t0)
+    
+    duracion = time.perf_counter() - inicio
+    total = sum(len(l) for l in latencias.values())
+    informe = {
+        'operaciones': total,
+        'duracion_segundos': duracion,
+        'operaciones_por_segundo': total / duracion if duracion else 0,
+        'entradas': entradas,
+        'tasa_rechazo': rechazos / entradas if entradas else 0,
+        'salidas': salidas,
+        'salidas_fallidas': salidas_fallidas,
+        'latencias_ms': {}
+    }
+    for operacion, valores in latencias.items():
+        if valores:
+            ordenados = sorted(valores)
+            informe['latencias_ms'][operacion] = {
+                'p50': _percentil(ordenados, 0.50) * 1000,
+                'p95': _percentil(ordenados, 0.95) * 1000,
+                'p99': _percentil(ordenados, 0.99) * 1000,
+                'max': ordenados[-1] * 1000
+            }
+    return informe
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Captura y reproducción de carga del parking")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    
+    importar = sub.add_parser('importar', help="convertir un parking.log de S15 en traza")
+    importar.add_argument('log')
+    importar.add_argument('traza')
+    
+    repro = sub.add_parser('reproducir', help="lanzar una traza contra un parking sin interfaz")
+    repro.add_argument('traza')
+    repro.add_argument('--velocidad', type=float, default=None,
+                       help="factor de tiempo real (por defecto, lo más rápido posible)")
+    repro.add_argument('--estado', default=None, help="JSON de estado inicial (cargar_estado)")
+    repro.add_argument('--filas', type=int, default=7)
+    repro.add_argument('--columnas', type=int, default=13)
+    repro.add_argument('--semilla', type=int, default=None, help="semilla para repetir exactamente la ejecución")
+    repro.add_argument('--estancias', default=None,
+                       help="carpeta donde guardar el registro de estancias (por defecto, solo en memoria)")
+    args = parser.parse_args(argv)
+    
+    if args.comando == 'importar':
+        print(f"{importar_log_s15(args.log, args.traza)} operaciones escritas en {args.traza}")
+        return
+    
+    parking = Parking.cargar_estado(args.estado, args.semilla) if args.estado else None
+    if parking is None:
+        parking = Parking(args.filas, args.columnas, semilla=args.semilla)
+    parking.registro = RegistroEstancias(args.estancias)
+    try:
+        resultado = reproducir(parking, args.traza, args.velocidad)
+    finally:
+        parking.registro.guardar()
+    resultado['estancias_registradas'] = len(parking.registro)
+    print(json.dumps(resultado, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
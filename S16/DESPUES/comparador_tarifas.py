@@ -0,0 +1,190 @@
+"""
+Facturación "what-if": cuánto habría ingresado cada estrategia de tarifa.
+
+Aplica las subclases concretas de EstrategiaTarifa a un histórico de
+estancias y compara los ingresos por estrategia, tipo de plaza y hora de
+salida. Las que dependen del estado del parking (TarifaDinamica, con la
+ocupación de cada momento) quedan fuera: el histórico no guarda ese estado y
+sin él facturarían como la tarifa base. La salida lo indica. El histórico
+puede ser un directorio de RegistroEstancias (cada bloque es un trozo) o un
+CSV con columnas matricula, plaza, tipo_plaza, es_minusvalido, es_electrico,
+entrada, salida (ISO 8601). Los trozos se reparten entre núcleos con un pool
+de procesos.
+
+Uso:
+    python comparador_tarifas.py estancias/
+    python comparador_tarifas.py historico.csv --desde 2026-09-01 --hasta 2026-10-01
+"""
+import argparse
+import csv
+import inspect
+import os
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from parking_privado import Coche, EstrategiaTarifa
+from registro_estancias import Bloque, RegistroEstancias
+
+TAMANO_TROZO_CSV = 20000
+
+def estrategias_disponibles():
+    """Instancia todas las subclases concretas de EstrategiaTarifa"""
+    pendientes, estrategias = [EstrategiaTarifa], []
+    while pendientes:
+        for subclase in pendientes.pop().__subclasses__():
+            pendientes.append(subclase)
+            if not inspect.isabstract(subclase):
+                estrategias.append(subclase())
+    return estrategias
+
+def estrategias_comparables():
+    """
+    Estrategias que se pueden aplicar a un histórico: las que no necesitan un
+    parking vinculado (no redefinen EstrategiaTarifa.vincular).
+    
+    Returns:
+        tuple: (estrategias aplicables, nombres de las excluidas)
+    """
+    comparables, excluidas = [], []
+    for estrategia in estrategias_disponibles():
+        if type(estrategia).vincular is EstrategiaTarifa.vincular:
+            comparables.append(estrategia)
+        else:
+            excluidas.append(estrategia.get_nombre())
+    return comparables, excluidas
+
+def facturar(estancias, desde=None, hasta=None):
+    """
+    Factura un trozo de estancias con todas las estrategias.
+    
+    Args:
+        estancias: Iterable de dicts como los de RegistroEstancias.iterar()
+    
+    Returns:
+        Counter: ingresos por (estrategia, tipo_plaza, hora de salida)
+    """
+    estrategias = [(e.get_nombre(), e) for e in estrategias_comparables()[0]]
+    ingresos = Counter()
+    for estancia in estancias:
+        salida = estancia['salida']
+        if (desde and salida < desde) or (hasta and salida >= hasta):
+            continue
+        coche = Coche(estancia['matricula'], estancia['es_minusvalido'], estancia['es_electrico'])
+        tiempo = salida - estancia['entrada']
+        tipo = estancia['tipo_plaza']
+        for nombre, estrategia in estrategias:
+            ingresos[nombre, tipo, salida.hour] += estrategia.calcular(tiempo, coche, tipo, salida)
+    return ingresos
+
+def _facturar_bloque(archivo, desde, hasta):
+    return facturar(Bloque.cargar(archivo).registros(), desde, hasta)
+
+def _facturar_filas(filas, desde, hasta):
+    return facturar((_estancia_csv(f) for f in filas), desde, hasta)
+
+def _instante_csv(texto):
+    """ISO 8601 a datetime local sin zona, como los de RegistroEstancias (los
+    CSV de exportar_historico van en UTC con +00:00)"""
+    instante = datetime.fromisoformat(texto)
+    if instante.tzinfo is not None:
+        instante = instante.astimezone().replace(tzinfo=None)
+    return instante
+
+def _estancia_csv(fila):
+    return {
+        'matricula': fila['matricula'],
+        'tipo_plaza': fila['tipo_plaza'],
+        'es_minusvalido': fila['es_minusvalido'].lower() in ('1', 'true', 'si', 'sí'),
+        'es_electrico': fila['es_electrico'].lower() in ('1', 'true', 'si', 'sí'),
+        'entrada': _instante_csv(fila['entrada']),
+        'salida': _instante_csv(fila['salida'])
+    }
+
+def _trozos_csv(archivo, tamano=TAMANO_TROZO_CSV):
+    with open(archivo, newline='', encoding='utf-8') as f:
+        trozo = []
+        for fila in csv.DictReader(f):
+            trozo.append(fila)
+            if len(trozo) >= tamano:
+                yield trozo
+                trozo = []
+        if trozo:
+            yield trozo
+
+def comparar(origen, desde=None, hasta=None, procesos=None):
+    """
+    Factura todo el histórico con cada estrategia en paralelo.
+    
+    Args:
+        origen: Directorio de RegistroEstancias o ruta de un CSV
+        desde, hasta: Rango opcional de fechas de salida (datetime)
+        procesos: Tamaño del pool (por defecto, todos los núcleos)
+    
+    Returns:
+        Counter: ingresos por (estrategia, tipo_plaza, hora)
+    """
+    if os.path.isdir(origen):
+        trabajos = ((_facturar_bloque, os.path.join(origen, b['archivo']))
+                    for b in RegistroEstancias(origen).bloques)
+    else:
+        trabajos = ((_facturar_filas, trozo) for trozo in _trozos_csv(origen))
+    
+    procesos = procesos or os.cpu_count() or 1
+    total = Counter()
+    en_vuelo = deque()
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        for funcion, trozo in trabajos:
+            en_vuelo.append(pool.submit(funcion, trozo, desde, hasta))
+            # Limitar los trozos pendientes para que la memoria no crezca con el histórico
+            if len(en_vuelo) >= procesos * 2:
+                total.update(en_vuelo.popleft().result())
+        while en_vuelo:
+            total.update(en_vuelo.popleft().result())
+    return total
+
+def tabla_comparativa(ingresos):
+    """Reorganiza los ingresos en totales por estrategia, por tipo y por hora"""
+    estrategias = sorted({clave[0] for clave in ingresos})
+    por_estrategia = Counter()
+    por_tipo = {}
+    por_hora = {}
+    for (estrategia, tipo, hora), importe in ingresos.items():
+        por_estrategia[estrategia] += importe
+        por_tipo.setdefault(tipo, Counter())[estrategia] += importe
+        por_hora.setdefault(hora, Counter())[estrategia] += importe
+    return estrategias, por_estrategia, por_tipo, por_hora
+
+def imprimir_tabla(ingresos):
+    estrategias, por_estrategia, por_tipo, por_hora = tabla_comparativa(ingresos)
+    cabecera = f"{'':>14}" + ''.join(f"{e:>16}" for e in estrategias)
+    
+    def fila(etiqueta, valores):
+        print(f"{etiqueta:>14}" + ''.join(f"{valores[e]:>15.2f}€" for e in estrategias))
+    
+    print(cabecera)
+    fila('TOTAL', por_estrategia)
+    print("\nPor tipo de plaza:")
+    for tipo in sorted(por_tipo):
+        fila(tipo, por_tipo[tipo])
+    print("\nPor hora de salida:")
+    for hora in sorted(por_hora):
+        fila(f"{hora:02d}h", por_hora[hora])
+    
+    excluidas = estrategias_comparables()[1]
+    if excluidas:
+        print(f"\nNo comparadas: {', '.join(excluidas)} (dependen del estado del parking en cada "
+              f"momento, p. ej. la ocupación, que el histórico no guarda)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Comparativa de ingresos por estrategia de tarifa")
+    parser.add_argument('origen', help="directorio de RegistroEstancias o CSV de estancias")
+    parser.add_argument('--desde', type=datetime.fromisoformat, default=None)
+    parser.add_argument('--hasta', type=datetime.fromisoformat, default=None)
+    parser.add_argument('--procesos', type=int, default=None)
+    args = parser.parse_args(argv)
+    
+    imprimir_tabla(comparar(args.origen, args.desde, args.hasta, args.procesos))
+
+if __name__ == "__main__":
+    main()
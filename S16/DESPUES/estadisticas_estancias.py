@@ -0,0 +1,207 @@
+"""
+Estadísticas de estancias en vivo: coches que llevan más tiempo y cuantiles.
+
+EstadisticasEstancias se suscribe a un Parking y mantiene:
+
+- una cola de los coches aparcados en orden de entrada, para sacar los N que
+  llevan más tiempo sin ordenar listar_coches(). Como las entradas llegan en
+  orden, cada una se añade al final en O(1); las salidas no la tocan (borrado
+  perezoso) y las claves obsoletas se descartan al llegar al principio o al
+  compactar, cuando superan a las vivas;
+- un BocetoCuantiles con la duración de las estancias completadas, que da
+  p50/p95/... con error relativo acotado sin guardar cada duración y que se
+  puede combinar con otros (por ejemplo, uno por día o por bloque del registro).
+"""
+import itertools
+import math
+from bisect import insort
+from collections import Counter, deque
+from threading import Lock
+
+class BocetoCuantiles:
+    """Histograma con cubetas logarítmicas (al estilo DDSketch).
+    
+    Un valor x cae en la cubeta ceil(log_gamma(x)), con gamma = (1+e)/(1-e),
+    así que cualquier cuantil se devuelve con error relativo menor que
+    `error_relativo`. Dos bocetos con el mismo error se combinan sumando
+    cubetas.
+    """
+    def __init__(self, error_relativo=0.01):
+        self.error_relativo = error_relativo
+        self._gamma = (1 + error_relativo) / (1 - error_relativo)
+        self._log_gamma = math.log(self._gamma)
+        self.cubetas = Counter()
+        self.ceros = 0        # valores <= 0 (estancias de duración nula)
+        self.n = 0
+        self.minimo = math.inf
+        self.maximo = -math.inf
+    
+    def __len__(self):
+        return self.n
+    
+    def anotar(self, valor):
+        self.n += 1
+        self.minimo = min(self.minimo, valor)
+        self.maximo = max(self.maximo, valor)
+        if valor <= 0:
+            self.ceros += 1
+        else:
+            self.cubetas[math.ceil(math.log(valor) / self._log_gamma)] += 1
+    
+    def combinar(self, otro):
+        """Suma `otro` a este boceto (deben tener el mismo error relativo)"""
+        if otro.error_relativo != self.error_relativo:
+            raise ValueError("Solo se pueden combinar bocetos con el mismo error relativo")
+        self.cubetas.update(otro.cubetas)
+        self.ceros += otro.ceros
+        self.n += otro.n
+        self.minimo = min(self.minimo, otro.minimo)
+        self.maximo = max(self.maximo, otro.maximo)
+        return self
+    
+    def cuantil(self, q):
+        """
+        Valor aproximado del cuantil `q` (0..1).
+        
+        Returns:
+            float: None si el boceto está vacío
+        """
+        if not self.n:
+            return None
+        rango = q * (self.n - 1)
+        acumulado = self.ceros
+        if rango < acumulado:
+            return 0.0
+        for cubeta in sorted(self.cubetas):
+            acumulado += self.cubetas[cubeta]
+            if rango < acumulado:
+                valor = 2 * self._gamma ** cubeta / (self._gamma + 1)
+                return min(max(valor, self.minimo), self.maximo)
+        return self.maximo
+    
+    def to_dict(self):
+        return {
+            'error_relativo': self.error_relativo,
+            'cubetas': dict(self.cubetas),
+            'ceros': self.ceros,
+            'n': self.n,
+            'minimo': self.minimo if self.n else None,
+            'maximo': self.maximo if self.n else None
+        }
+    
+    @staticmethod
+    def from_dict(data):
+        boceto = BocetoCuantiles(data['error_relativo'])
+        boceto.cubetas = Counter({int(k): v for k, v in data['cubetas'].items()})
+        boceto.ceros = data['ceros']
+        boceto.n = data['n']
+        if boceto.n:
+            boceto.minimo, boceto.maximo = data['minimo'], data['maximo']
+        return boceto
+
+class EstadisticasEstancias:
+    """Observador de Parking con el índice por entrada y el boceto de duraciones"""
+    MARGEN_COMPACTAR = 64
+    
+    def __init__(self, parking, error_relativo=0.01):
+        self.parking = parking
+        self.duraciones = BocetoCuantiles(error_relativo)
+        # (epoch de entrada, secuencia, índice de plaza, matrícula, id de plaza),
+        # incluidas obsoletas; la secuencia distingue dos ocupaciones de la misma plaza
+        self._orden = deque()
+        self._claves = {}      # índice de plaza -> su clave viva en _orden
+        self._secuencia = itertools.count()
+        # Protege lo anterior: los ganchos llegan con el cerrojo del parking y
+        # las consultas solo toman este
+        self._cerrojo = Lock()
+        parking.suscribir(self, al_suscribir=self._cargar_ocupadas)
+    
+    def __len__(self):
+        """Coches aparcados que se siguen"""
+        return len(self._claves)
+    
+    def _cargar_ocupadas(self):
+        # Los ya aparcados, por orden de entrada, para que la cola empiece ordenada
+        ocupadas = [(a.timestamp_entrada.timestamp() if a.timestamp_entrada else math.inf, i)
+                    for i, a in enumerate(self.parking.aparcamientos) if a.ocupado]
+        for _, indice in sorted(ocupadas):
+            self.plaza_ocupada(indice)
+    
+    # Ganchos de Parking (se llaman con su cerrojo tomado)
+    
+    def plaza_ocupada(self, indice):
+        aparcamiento = self.parking.aparcamientos[indice]
+        entrada = aparcamiento.timestamp_entrada
+        clave = (entrada.timestamp() if entrada else math.inf, next(self._secuencia), indice,
+                 aparcamiento.coche.matricula, aparcamiento.id)
+        with self._cerrojo:
+            self._claves[indice] = clave
+            if not self._orden or clave >= self._orden[-1]:
+                self._orden.append(clave)
+            else:
+                # Entrada fuera de orden (reloj que retrocede, plaza sin hora): raro
+                orden = list(self._orden)
+                insort(orden, clave)
+                self._orden = deque(orden)
+    
+    def plaza_liberada(self, indice):
+        ahora = self.parking.reloj().timestamp()
+        with self._cerrojo:
+            self._liberar(indice, ahora)
+    
+    def _liberar(self, indice, ahora):
+        clave = self._claves.pop(indice, None)
+        if clave is None:
+            return
+        if clave[0] != math.inf:
+            self.duraciones.anotar(ahora - clave[0])
+        
+        # La clave se queda en la cola: se descarta al llegar al principio
+        # o al compactar
+        orden = self._orden
+        while orden and not self._viva(orden[0]):
+            orden.popleft()
+        if len(orden) > 2 * len(self._claves) + self.MARGEN_COMPACTAR:
+            self._orden = deque(c for c in orden if self._viva(c))
+    
+    def _viva(self, clave):
+        return self._claves.get(clave[2]) == clave
+    
+    # Consultas
+    
+    def mas_largas(self, n=10):
+        """
+        Los `n` coches aparcados que llevan más tiempo.
+        
+        Returns:
+            list: dicts con matricula, plaza y tiempo_segundos, de mayor a menor
+        """
+        ahora = self.parking.reloj().timestamp()
+        with self._cerrojo:
+            # Las primeras n vivas; las obsoletas intermedias son como mucho
+            # tantas como las vivas (se compacta antes)
+            candidatas = list(itertools.islice((c for c in self._orden if self._viva(c)), n))
+        return [
+            {
+                'matricula': matricula,
+                'plaza': plaza,
+                'tiempo_segundos': round(ahora - entrada, 1) if entrada != math.inf else None
+            }
+            for entrada, _, _, matricula, plaza in candidatas
+        ]
+    
+    def cuantiles(self, qs=(0.5, 0.95, 0.99)):
+        """
+        Duración (segundos) de las estancias completadas en cada cuantil.
+        
+        Raises:
+            ValueError: Si algún cuantil no está entre 0 y 1
+        """
+        for q in qs:
+            if not 0 <= q <= 1:
+                raise ValueError(f"Cuantil fuera de [0, 1]: {q}")
+        with self._cerrojo:
+            return {f"p{round(q * 100)}": self.duraciones.cuantil(q) for q in qs}
+    
+    def cerrar(self):
+        self.parking.desuscribir(self)
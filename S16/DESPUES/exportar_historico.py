@@ -0,0 +1,325 @@
+"""
+Exportación del histórico del parking para análisis fuera de línea.
+
+Escribe dos tablas, columna a columna y en streaming:
+
+- estancias: las estancias completadas de un RegistroEstancias, leídas
+  bloque a bloque;
+- ocupacion: muestras periódicas de la ocupación de un Parking en marcha,
+  tomadas por MuestreadorOcupacion.
+
+Cada tabla se escribe en CSV por trozos (nombre_000000.csv, ... con
+`filas_por_trozo` filas cada uno; el de estancias tiene las columnas que
+acepta comparador_tarifas) y/o en formato NumPy: un .npy por columna y un
+.npz que las agrupa, que se cargan con numpy.load sin pasar por texto. Los
+.npy se generan a mano (sin depender de numpy). Se reserva su cabecera y se
+completa con el número de filas al cerrar. Así la memoria usada no depende
+de la longitud del histórico, solo del tamaño de un bloque.
+
+Los instantes van en UTC: como datetime64[ms] en NumPy y en ISO 8601
+(con +00:00) en CSV. Un <nombre>.json describe las columnas y los
+archivos escritos.
+
+Uso:
+    python exportar_historico.py estancias/ exportacion/ [--formatos csv,npz]
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import struct
+import sys
+import zipfile
+from array import array
+from datetime import datetime, timezone
+from threading import Event, Thread
+
+from parking_privado import TipoPlaza
+from registro_estancias import FLAG_ELECTRICO, FLAG_MINUSVALIDO, TIPOS, RegistroEstancias
+
+FORMATOS = ('csv', 'npy', 'npz')
+FILAS_POR_TROZO = 100000
+TAMANO_CABECERA_NPY = 128  # múltiplo de 64, con sitio para cualquier número de filas
+
+# (nombre, dtype de NumPy) de cada tabla
+COLUMNAS_ESTANCIAS = (
+    ('matricula', '|S8'),
+    ('plaza', '|S8'),
+    ('tipo_plaza', '|S12'),
+    ('es_minusvalido', '|b1'),
+    ('es_electrico', '|b1'),
+    ('entrada', '<M8[ms]'),
+    ('salida', '<M8[ms]'),
+    ('duracion_s', '<f8'),
+    ('tarifa', '<f8'),
+    ('estrategia', '|S16')
+)
+
+COLUMNAS_OCUPACION = (
+    ('instante', '<M8[ms]'),
+    ('ocupadas_normal', '<i8'),
+    ('ocupadas_minusvalido', '<i8'),
+    ('ocupadas_electrico', '<i8'),
+    ('libres', '<i8'),
+    ('en_cola', '<i8'),
+    ('ocupacion_porcentaje', '<f8')
+)
+
+# ========================= CODIFICACIÓN =========================
+
+def _cabecera_npy(dtype, filas):
+    """Cabecera .npy (versión 1.0) de un vector de `filas` elementos"""
+    diccionario = f"{{'descr': '{dtype}', 'fortran_order': False, 'shape': ({filas},), }}"
+    relleno = TAMANO_CABECERA_NPY - 10 - len(diccionario) - 1
+    return (b'\x93NUMPY\x01\x00' + struct.pack('<H', TAMANO_CABECERA_NPY - 10)
+            + diccionario.encode('latin1') + b' ' * relleno + b'\n')
+
+def _codificar(dtype, valores):
+    """Bytes de `valores` en el dtype de NumPy indicado"""
+    if dtype in ('|b1', '|u1'):
+        return bytes(int(v) for v in valores)
+    if dtype.startswith('|S'):
+        ancho = int(dtype[2:])
+        return b''.join(v.encode('utf-8')[:ancho].ljust(ancho, b'\0') for v in valores)
+    if dtype == '<M8[ms]':
+        datos = array('q', [round(v * 1000) for v in valores])
+    elif dtype == '<i8':
+        datos = array('q', valores)
+    else:
+        datos = array('d', valores)
+    if sys.byteorder == 'big':
+        datos.byteswap()
+    return datos.tobytes()
+
+def _texto_csv(dtype, valores):
+    if dtype == '<M8[ms]':
+        return [datetime.fromtimestamp(v, timezone.utc).isoformat(timespec='milliseconds') for v in valores]
+    if dtype == '|b1':
+        return [int(v) for v in valores]
+    return valores
+
+# ========================= ESCRITOR =========================
+
+class ExportadorColumnas:
+    """Escritor en streaming de una tabla a CSV por trozos y a .npy/.npz"""
+    def __init__(self, directorio, nombre, columnas, formatos=('csv', 'npz'),
+                 filas_por_trozo=FILAS_POR_TROZO):
+        """
+        Args:
+            directorio: Carpeta de salida (se crea si no existe)
+            nombre: Prefijo de los archivos de la tabla
+            columnas: Tupla de (nombre, dtype) como COLUMNAS_ESTANCIAS
+            formatos: Subconjunto de FORMATOS
+            filas_por_trozo: Filas de cada CSV
+        """
+        desconocidos = set(formatos) - set(FORMATOS)
+        if desconocidos:
+            raise ValueError(f"Formatos no soportados: {sorted(desconocidos)} (usa {', '.join(FORMATOS)})")
+        os.makedirs(directorio, exist_ok=True)
+        self.directorio = directorio
+        self.nombre = nombre
+        self.columnas = columnas
+        self.formatos = tuple(formatos)
+        self.filas_por_trozo = filas_por_trozo
+        self.filas = 0
+        self._trozos = []
+        self._csv = None
+        self._filas_trozo = 0
+        self._npy = {}
+        self._descripcion = None  # se rellena al cerrar
+        if 'npy' in formatos or 'npz' in formatos:
+            for columna, dtype in columnas:
+                f = open(self._ruta(f"{nombre}_{columna}.npy"), 'wb')
+                f.write(_cabecera_npy(dtype, 0))
+                self._npy[columna] = f
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *excepcion):
+        self.cerrar()
+    
+    def _ruta(self, archivo):
+        return os.path.join(self.directorio, archivo)
+    
+    def escribir(self, valores):
+        """
+        Añade filas a la tabla.
+        
+        Args:
+            valores: {columna: secuencia de valores}, todas de la misma longitud
+        """
+        n = len(valores[self.columnas[0][0]])
+        for columna, dtype in self.columnas:
+            if columna in self._npy:
+                self._npy[columna].write(_codificar(dtype, valores[columna]))
+        if 'csv' in self.formatos:
+            filas = zip(*(_texto_csv(dtype, valores[columna]) for columna, dtype in self.columnas))
+            escritas = 0
+            while escritas < n:
+                escritor = self._trozo_csv()
+                cuantas = min(n - escritas, self.filas_por_trozo - self._filas_trozo)
+                escritor.writerows(next(filas) for _ in range(cuantas))
+                self._filas_trozo += cuantas
+                escritas += cuantas
+        self.filas += n
+    
+    def _trozo_csv(self):
+        """Escritor del CSV en curso (abre uno nuevo si el actual está lleno)"""
+        if self._csv is None or self._filas_trozo >= self.filas_por_trozo:
+            if self._csv is not None:
+                self._csv[0].close()
+            archivo = f"{self.nombre}_{len(self._trozos):06d}.csv"
+            f = open(self._ruta(archivo), 'w', newline='', encoding='utf-8')
+            escritor = csv.writer(f)
+            escritor.writerow(columna for columna, _ in self.columnas)
+            self._csv = (f, escritor)
+            self._filas_trozo = 0
+            self._trozos.append(archivo)
+        return self._csv[1]
+    
+    def cerrar(self):
+        """
+        Completa las cabeceras .npy, agrupa el .npz y escribe <nombre>.json.
+        
+        Returns:
+            dict: La descripción escrita en <nombre>.json
+        """
+        if self._descripcion is not None:
+            return self._descripcion
+        if self._csv is not None:
+            self._csv[0].close()
+            self._csv = None
+        dtypes = dict(self.columnas)
+        for columna, f in self._npy.items():
+            f.seek(0)
+            f.write(_cabecera_npy(dtypes[columna], self.filas))
+            f.close()
+        
+        descripcion = {
+            'filas': self.filas,
+            'columnas': [list(c) for c in self.columnas],
+            'csv': self._trozos,
+            'npy': [],
+            'npz': None
+        }
+        archivos_npy = [f"{self.nombre}_{columna}.npy" for columna in self._npy]
+        if 'npz' in self.formatos:
+            descripcion['npz'] = f"{self.nombre}.npz"
+            with zipfile.ZipFile(self._ruta(descripcion['npz']), 'w', zipfile.ZIP_STORED,
+                                 allowZip64=True) as npz:
+                for columna, archivo in zip(self._npy, archivos_npy):
+                    with open(self._ruta(archivo), 'rb') as origen, \
+                            npz.open(f"{columna}.npy", 'w', force_zip64=True) as destino:
+                        shutil.copyfileobj(origen, destino, 1 << 20)
+        if 'npy' in self.formatos:
+            descripcion['npy'] = archivos_npy
+        else:
+            for archivo in archivos_npy:
+                os.remove(self._ruta(archivo))
+        self._npy = {}
+        
+        with open(self._ruta(f"{self.nombre}.json"), 'w', encoding='utf-8') as f:
+            json.dump(descripcion, f, ensure_ascii=False, indent=2)
+        self._descripcion = descripcion
+        return descripcion
+
+# ========================= ESTANCIAS =========================
+
+def _columnas_bloque(bloque):
+    """Columnas de COLUMNAS_ESTANCIAS de un Bloque del registro"""
+    c = bloque.columnas
+    plazas, estrategias = bloque.plazas, bloque.estrategias
+    return {
+        'matricula': [bloque.matricula(i) for i in range(len(bloque))],
+        'plaza': [plazas[p] for p in c['plaza']],
+        'tipo_plaza': [TIPOS[t] for t in c['tipo']],
+        'es_minusvalido': [bool(f & FLAG_MINUSVALIDO) for f in c['flags']],
+        'es_electrico': [bool(f & FLAG_ELECTRICO) for f in c['flags']],
+        'entrada': c['entrada'],
+        'salida': c['salida'],
+        'duracion_s': [s - e for e, s in zip(c['entrada'], c['salida'])],
+        'tarifa': c['tarifa'],
+        'estrategia': [estrategias[e] for e in c['estrategia']]
+    }
+
+def exportar_estancias(registro, directorio, formatos=('csv', 'npz'), filas_por_trozo=FILAS_POR_TROZO):
+    """
+    Exporta todas las estancias de un RegistroEstancias, bloque a bloque.
+    
+    Returns:
+        dict: Descripción de lo escrito (ver ExportadorColumnas.cerrar)
+    """
+    with ExportadorColumnas(directorio, 'estancias', COLUMNAS_ESTANCIAS, formatos,
+                            filas_por_trozo) as exportador:
+        for bloque in registro.iterar_bloques():
+            if len(bloque):
+                exportador.escribir(_columnas_bloque(bloque))
+    return exportador.cerrar()
+
+# ========================= OCUPACIÓN =========================
+
+class MuestreadorOcupacion:
+    """Muestras periódicas de la ocupación de un Parking hacia un ExportadorColumnas.
+    
+    El exportador debe haberse creado con COLUMNAS_OCUPACION. Cada muestra se
+    escribe al tomarla, así que no se acumulan en memoria.
+    """
+    def __init__(self, parking, exportador, intervalo=60):
+        self.parking = parking
+        self.exportador = exportador
+        self.intervalo = intervalo
+        self._parar = Event()
+        self._hilo = None
+    
+    def muestrear(self):
+        """Toma y escribe una muestra (usa el reloj del parking, que puede ser simulado)"""
+        estado = self.parking.ocupacion_actual()
+        ocupadas = estado['ocupadas']
+        total = sum(estado['totales'].values())
+        ocupadas_total = sum(ocupadas.values())
+        self.exportador.escribir({
+            'instante': [estado['instante'].timestamp()],
+            'ocupadas_normal': [ocupadas[TipoPlaza.NORMAL]],
+            'ocupadas_minusvalido': [ocupadas[TipoPlaza.MINUSVALIDO]],
+            'ocupadas_electrico': [ocupadas[TipoPlaza.ELECTRICO]],
+            'libres': [total - ocupadas_total],
+            'en_cola': [estado['en_cola']],
+            'ocupacion_porcentaje': [ocupadas_total / total * 100 if total else 0.0]
+        })
+    
+    def iniciar(self):
+        """Muestrea cada `intervalo` segundos en un hilo en segundo plano"""
+        self._parar.clear()
+        self._hilo = Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+        return self
+    
+    def detener(self):
+        """Para el hilo (el exportador lo cierra quien lo creó)"""
+        self._parar.set()
+        if self._hilo:
+            self._hilo.join()
+    
+    def _bucle(self):
+        while True:
+            self.muestrear()
+            if self._parar.wait(self.intervalo):
+                break
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta las estancias a CSV por trozos y NumPy")
+    parser.add_argument('estancias', help="directorio de RegistroEstancias")
+    parser.add_argument('salida', help="directorio de salida")
+    parser.add_argument('--formatos', default='csv,npz', help="csv, npy y/o npz separados por comas")
+    parser.add_argument('--filas-por-trozo', type=int, default=FILAS_POR_TROZO)
+    args = parser.parse_args(argv)
+    
+    formatos = tuple(f for f in args.formatos.split(',') if f)
+    descripcion = exportar_estancias(RegistroEstancias(args.estancias), args.salida, formatos,
+                                     args.filas_por_trozo)
+    print(f"{descripcion['filas']} estancias exportadas en {args.salida}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Exportación del mapa del parking a SVG o PNG sin interfaz gráfica.
+
+Usa los colores de la interfaz (COLORES_TIPO y COLOR_OCUPADA): verde normal,
+azul minusválido, amarillo eléctrico y rojo ocupada. La fila A queda abajo,
+junto a la cabina.
+
+El estado se captura de forma compacta con Parking.instantanea_plazas (una
+máscara de tipo por plaza y las matrículas de las ocupadas), que solo retiene
+el cerrojo durante la copia; el dibujo y la compresión se hacen en un proceso
+aparte, de modo que exportar nunca frena la interfaz ni las cabinas. El PNG se genera a mano con
+zlib (sin dependencias externas).
+
+Uso:
+    python exportar_mapa.py parking_estado.json mapa.png [--escala 8]
+    python exportar_mapa.py parking_estado.json.gz mapa.svg
+"""
+import argparse
+import logging
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from threading import Event, Thread
+from xml.sax.saxutils import escape
+
+from parking_privado import COLOR_OCUPADA, COLORES_TIPO, TipoPlaza, leer_snapshot, nombre_fila
+
+COLORES_MASCARA = {TipoPlaza.MASCARAS[tipo]: color for tipo, color in COLORES_TIPO.items()}
+COLOR_FONDO = '#ffffff'
+ESCALA_TEXTO = 40  # px por plaza a partir de los que el SVG lleva identificador y matrícula
+
+# ========================= CAPTURA =========================
+
+def capturar(parking):
+    """
+    Copia compacta del estado del parking para dibujarlo en otro proceso.
+    
+    Returns:
+        dict: filas, columnas, mascaras (bytes), ocupadas (bytes 0/1) y
+            matriculas ({índice: matrícula})
+    """
+    return parking.instantanea_plazas()
+
+def capturar_archivo(archivo):
+    """Igual que capturar() pero a partir de un snapshot de guardar_estado"""
+    datos, plazas = leer_snapshot(archivo)
+    return {
+        'filas': datos['filas'],
+        'columnas': datos['columnas'],
+        'mascaras': bytes(p.mascara for p in plazas),
+        'ocupadas': bytes(1 if p.ocupado else 0 for p in plazas),
+        'matriculas': {i: p.coche.matricula for i, p in enumerate(plazas) if p.ocupado},
+        'instante': datetime.fromtimestamp(os.path.getmtime(archivo)).isoformat(timespec='seconds')
+    }
+
+def _color(captura, indice):
+    if captura['ocupadas'][indice]:
+        return COLOR_OCUPADA
+    return COLORES_MASCARA[captura['mascaras'][indice]]
+
+# ========================= SVG =========================
+
+def escribir_svg(captura, archivo, escala=20):
+    """Escribe el mapa como SVG (un rectángulo por plaza)"""
+    filas, columnas = captura['filas'], captura['columnas']
+    hueco = max(1, escala // 10)
+    lado = escala - hueco
+    ancho, alto = columnas * escala + hueco, filas * escala + hueco
+    con_texto = escala >= ESCALA_TEXTO
+    
+    with open(archivo, 'w', encoding='utf-8') as f:
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{ancho}" height="{alto}" '
+                f'viewBox="0 0 {ancho} {alto}" font-family="Arial">\n')
+        f.write(f'<title>Parking {captura["instante"]}</title>\n')
+        f.write(f'<rect width="{ancho}" height="{alto}" fill="{COLOR_FONDO}"/>\n')
+        for fila in range(filas):
+            y = (filas - 1 - fila) * escala + hueco
+            for columna in range(columnas):
+                indice = fila * columnas + columna
+                x = columna * escala + hueco
+                f.write(f'<rect x="{x}" y="{y}" width="{lado}" height="{lado}" '
+                        f'fill="{_color(captura, indice)}"/>\n')
+                if con_texto:
+                    centro = x + lado / 2
+                    color_texto = 'white' if captura['ocupadas'][indice] else 'black'
+                    f.write(f'<text x="{centro}" y="{y + lado * 0.3}" font-size="{lado * 0.2:.0f}" '
+                            f'text-anchor="middle" fill="{color_texto}">'
+                            f'{escape(nombre_fila(fila) + str(columna + 1))}</text>\n')
+                    matricula = captura['matriculas'].get(indice)
+                    if matricula:
+                        f.write(f'<text x="{centro}" y="{y + lado * 0.65}" font-size="{lado * 0.16:.0f}" '
+                                f'text-anchor="middle" fill="white">{escape(matricula)}</text>\n')
+        f.write('</svg>\n')
+
+# ========================= PNG =========================
+
+def _rgb(color):
+    return bytes.fromhex(color[1:])
+
+def _trozo_png(tipo, datos):
+    cuerpo = tipo + datos
+    return struct.pack('>I', len(datos)) + cuerpo + struct.pack('>I', zlib.crc32(cuerpo) & 0xFFFFFFFF)
+
+def escribir_png(captura, archivo, escala=8):
+    """Escribe el mapa como PNG RGB de 8 bits (escala px por plaza)"""
+    filas, columnas = captura['filas'], captura['columnas']
+    hueco = 1 if escala >= 3 else 0
+    lado = escala - hueco
+    ancho, alto = columnas * escala + hueco, filas * escala + hueco
+    fondo = _rgb(COLOR_FONDO)
+    colores = {color: _rgb(color) for color in list(COLORES_MASCARA.values()) + [COLOR_OCUPADA]}
+    
+    compresor = zlib.compressobj(6)
+    idat = bytearray()
+    linea_fondo = b'\x00' + fondo * ancho  # byte de filtro 0 + píxeles
+    if hueco:
+        idat += compresor.compress(linea_fondo)
+    for fila in reversed(range(filas)):
+        inicio = fila * columnas
+        pixeles = bytearray(fondo * hueco)
+        for indice in range(inicio, inicio + columnas):
+            pixeles += colores[_color(captura, indice)] * lado + fondo * hueco
+        linea = b'\x00' + bytes(pixeles)
+        idat += compresor.compress(linea * lado)
+        if hueco:
+            idat += compresor.compress(linea_fondo * hueco)
+    idat += compresor.flush()
+    
+    with open(archivo, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(_trozo_png(b'IHDR', struct.pack('>IIBBBBB', ancho, alto, 8, 2, 0, 0, 0)))
+        f.write(_trozo_png(b'IDAT', bytes(idat)))
+        f.write(_trozo_png(b'IEND', b''))
+
+def exportar_captura(captura, archivo, escala=None):
+    """Escribe SVG o PNG según la extensión de `archivo`"""
+    if archivo.lower().endswith('.svg'):
+        escribir_svg(captura, archivo, escala or 20)
+    elif archivo.lower().endswith('.png'):
+        escribir_png(captura, archivo, escala or 8)
+    else:
+        raise ValueError(f"Formato no soportado (usa .svg o .png): {archivo}")
+    return archivo
+
+# ========================= EXPORTACIÓN EN SEGUNDO PLANO =========================
+
+def _registrar_fallo(futuro):
+    """Deja constancia de una exportación programada que ha fallado (nadie espera su Future)"""
+    if not futuro.cancelled() and futuro.exception() is not None:
+        logging.getLogger(__name__).error("Fallo al exportar el mapa", exc_info=futuro.exception())
+
+class ExportadorMapa:
+    """Exporta mapas del parking sin bloquear a quien lo pide.
+    
+    La captura se hace en el hilo que llama (es una copia rápida); el dibujo,
+    en un pool de un proceso (o de un hilo con procesos=False).
+    """
+    def __init__(self, procesos=True):
+        self._pool = ProcessPoolExecutor(max_workers=1) if procesos else ThreadPoolExecutor(max_workers=1)
+        self._parar = Event()
+        self._hilo = None
+    
+    def exportar(self, parking, archivo, escala=None):
+        """
+        Lanza la exportación de un mapa.
+        
+        Returns:
+            Future: se resuelve con la ruta del archivo escrito
+        """
+        return self._pool.submit(exportar_captura, capturar(parking), archivo, escala)
+    
+    def programar(self, parking, directorio, cada=3600, formato='png', escala=None):
+        """Exporta un mapa cada `cada` segundos en `directorio` (mapa_AAAAMMDD_HHMM.png)"""
+        os.makedirs(directorio, exist_ok=True)
+        
+        def bucle():
+            while not self._parar.is_set():
+                nombre = f"mapa_{datetime.now():%Y%m%d_%H%M}.{formato}"
+                futuro = self.exportar(parking, os.path.join(directorio, nombre), escala)
+                futuro.add_done_callback(_registrar_fallo)
+                self._parar.wait(cada)
+        
+        self._hilo = Thread(target=bucle, daemon=True)
+        self._hilo.start()
+    
+    def cerrar(self):
+        self._parar.set()
+        if self._hilo:
+            self._hilo.join()
+        self._pool.shutdown(wait=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta el mapa del parking a SVG o PNG")
+    parser.add_argument('estado', help="snapshot de guardar_estado (plano o comprimido)")
+    parser.add_argument('salida', help="archivo .svg o .png")
+    parser.add_argument('--escala', type=int, default=None, help="px por plaza")
+    args = parser.parse_args(argv)
+    
+    inicio = time.perf_counter()
+    exportar_captura(capturar_archivo(args.estado), args.salida, args.escala)
+    print(f"{args.salida} escrito en {time.perf_counter() - inicio:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+Muchos parkings pequeños (lotes) en un mismo proceso.
+
+GestorLotes aloja miles de Parking identificados por nombre:
+
+- los lotes con el mismo tamaño y reparto de plazas comparten una
+  PlantillaPlazas inmutable (identificadores internados, tipos e índice);
+- todos emiten matrículas de un único GeneradorMatriculas, así que no se
+  repiten entre lotes;
+- el estado se guarda en un AlmacenLotes, una base SQLite compartida: la
+  disposición de cada plantilla una sola vez y, por lote, solo sus plazas
+  ocupadas (registros del esquema v2 del snapshot) y la tarifa de cada puerta.
+
+Los lotes que no están en memoria se cargan del almacén al pedirlos y se
+pueden descargar cuando no se usan.
+
+Uso:
+    python gestor_lotes.py lotes.db
+"""
+import argparse
+import json
+import random
+import sqlite3
+import zlib
+from threading import Lock, RLock
+
+from parking_privado import GeneradorMatriculas, Parking, PlantillaPlazas
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS plantillas (
+    clave TEXT PRIMARY KEY,
+    filas INTEGER NOT NULL,
+    columnas INTEGER NOT NULL,
+    mascaras BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lotes (
+    nombre TEXT PRIMARY KEY,
+    plantilla TEXT NOT NULL REFERENCES plantillas(clave),
+    datos BLOB NOT NULL
+);
+"""
+
+def clave_plantilla(filas, columnas, config_plazas=None):
+    """Nombre de la plantilla de un tamaño y reparto de plazas ('7x13-0.15-0.1')"""
+    config = config_plazas or {}
+    return f"{filas}x{columnas}-{config.get('minusvalidos', 0.15)}-{config.get('electricos', 0.10)}"
+
+# ========================= ALMACÉN =========================
+
+class AlmacenLotes:
+    """Estado de todos los lotes en una base SQLite compartida"""
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._cerrojo = Lock()
+        with self._cerrojo:
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.executescript(ESQUEMA)
+    
+    def guardar_plantilla(self, clave, plantilla):
+        with self._cerrojo, self._conexion:
+            self._conexion.execute(
+                "INSERT OR IGNORE INTO plantillas VALUES (?, ?, ?, ?)",
+                (clave, plantilla.filas, plantilla.columnas, plantilla.mascaras())
+            )
+    
+    def cargar_plantillas(self):
+        """
+        Returns:
+            dict: {clave: PlantillaPlazas}
+        """
+        with self._cerrojo:
+            filas = self._conexion.execute("SELECT clave, filas, columnas, mascaras FROM plantillas").fetchall()
+        return {clave: PlantillaPlazas.desde_mascaras(f, c, mascaras) for clave, f, c, mascaras in filas}
+    
+    def guardar(self, lotes):
+        """
+        Guarda varios lotes en una sola transacción.
+        
+        Args:
+            lotes: Iterable de (nombre, clave de plantilla, datos de estado_lote)
+        """
+        filas = [(nombre, clave, zlib.compress(json.dumps(datos, separators=(',', ':')).encode('utf-8')))
+                 for nombre, clave, datos in lotes]
+        with self._cerrojo, self._conexion:
+            self._conexion.executemany("INSERT OR REPLACE INTO lotes VALUES (?, ?, ?)", filas)
+    
+    def cargar(self, nombre):
+        """
+        Returns:
+            tuple: (clave de plantilla, datos) o None si el lote no existe
+        """
+        with self._cerrojo:
+            fila = self._conexion.execute(
+                "SELECT plantilla, datos FROM lotes WHERE nombre = ?", (nombre,)
+            ).fetchone()
+        if fila is None:
+            return None
+        return fila[0], json.loads(zlib.decompress(fila[1]).decode('utf-8'))
+    
+    def nombres(self):
+        with self._cerrojo:
+            return [nombre for (nombre,) in self._conexion.execute("SELECT nombre FROM lotes ORDER BY nombre")]
+    
+    def __contains__(self, nombre):
+        with self._cerrojo:
+            return self._conexion.execute("SELECT 1 FROM lotes WHERE nombre = ?", (nombre,)).fetchone() is not None
+    
+    def cerrar(self):
+        with self._cerrojo:
+            self._conexion.close()
+
+def estado_lote(parking):
+    """Lo que se guarda de un lote: plazas ocupadas y tarifa de cada puerta"""
+    return parking.exportar_ocupacion()
+
+# ========================= GESTOR =========================
+
+class GestorLotes:
+    """Registro de lotes en memoria respaldado por un AlmacenLotes opcional"""
+    def __init__(self, almacen=None, semilla=None, capacidad_cola=0, num_cabinas=1):
+        self.almacen = almacen
+        self.rng = random.Random(semilla)
+        self.generador_matriculas = GeneradorMatriculas(self.rng)
+        self.capacidad_cola = capacidad_cola
+        self.num_cabinas = num_cabinas
+        self._plantillas = almacen.cargar_plantillas() if almacen else {}
+        self._lotes = {}            # nombre -> Parking en memoria
+        self._plantilla_lote = {}   # nombre -> clave de su plantilla
+        self._cerrojo = RLock()
+    
+    def __len__(self):
+        return len(self.nombres())
+    
+    def __contains__(self, nombre):
+        return nombre in self._lotes or (self.almacen is not None and nombre in self.almacen)
+    
+    def nombres(self):
+        """Nombres de todos los lotes, en memoria o en el almacén"""
+        with self._cerrojo:
+            nombres = set(self._lotes)
+        if self.almacen is not None:
+            nombres.update(self.almacen.nombres())
+        return sorted(nombres)
+    
+    def en_memoria(self):
+        return len(self._lotes)
+    
+    def plantilla(self, filas=7, columnas=13, config_plazas=None):
+        """
+        Plantilla compartida para un tamaño y reparto de plazas (se crea la
+        primera vez que se pide).
+        
+        Returns:
+            tuple: (clave, PlantillaPlazas)
+        """
+        clave = clave_plantilla(filas, columnas, config_plazas)
+        with self._cerrojo:
+            if clave not in self._plantillas:
+                plantilla = PlantillaPlazas(filas, columnas, config_plazas, self.rng)
+                if self.almacen is not None:
+                    self.almacen.guardar_plantilla(clave, plantilla)
+                self._plantillas[clave] = plantilla
+            return clave, self._plantillas[clave]
+    
+    def _nuevo_parking(self, plantilla):
+        # Cada lote con su propio RNG (derivado de la semilla del gestor): los
+        # lotes se usan desde hilos distintos. El generador de matrículas sí se
+        # comparte, reserva con cerrojo y así no se repiten entre lotes.
+        return Parking(
+            plantilla.filas, plantilla.columnas, capacidad_cola=self.capacidad_cola,
+            num_cabinas=self.num_cabinas, rng=random.Random(self.rng.getrandbits(64)),
+            plantilla=plantilla, generador_matriculas=self.generador_matriculas
+        )
+    
+    def crear(self, nombre, filas=7, columnas=13, config_plazas=None):
+        """
+        Da de alta un lote vacío.
+        
+        Returns:
+            Parking: El lote creado
+        
+        Raises:
+            ValueError: Si ya existe un lote con ese nombre
+        """
+        with self._cerrojo:
+            if nombre in self:
+                raise ValueError(f"Ya existe el lote {nombre}")
+            clave, plantilla = self.plantilla(filas, columnas, config_plazas)
+            parking = self._nuevo_parking(plantilla)
+            parking.marcar_pendiente()  # pendiente de guardar aunque siga vacío
+            self._lotes[nombre] = parking
+            self._plantilla_lote[nombre] = clave
+            return parking
+    
+    def obtener(self, nombre):
+        """
+        Lote por nombre, cargándolo del almacén si no está en memoria.
+        
+        Raises:
+            KeyError: Si el lote no existe
+        """
+        parking = self._lotes.get(nombre)
+        if parking is not None:
+            return parking
+        with self._cerrojo:
+            if nombre in self._lotes:
+                return self._lotes[nombre]
+            guardado = self.almacen.cargar(nombre) if self.almacen is not None else None
+            if guardado is None:
+                raise KeyError(nombre)
+            clave, datos = guardado
+            parking = self._nuevo_parking(self._plantillas[clave])
+            parking.importar_ocupacion(datos)
+            self._lotes[nombre] = parking
+            self._plantilla_lote[nombre] = clave
+            return parking
+    
+    def entrar(self, nombre, *args, **kwargs):
+        """Parking.entrar en el lote `nombre`"""
+        return self.obtener(nombre).entrar(*args, **kwargs)
+    
+    def salir(self, nombre, *args, **kwargs):
+        """Parking.salir en el lote `nombre`"""
+        return self.obtener(nombre).salir(*args, **kwargs)
+    
+    def guardar(self, nombres=None):
+        """
+        Guarda en el almacén los lotes en memoria con cambios.
+        
+        Args:
+            nombres: Lotes a revisar (por defecto, todos los cargados)
+        
+        Returns:
+            int: Número de lotes escritos
+        """
+        if self.almacen is None:
+            return 0
+        with self._cerrojo:
+            candidatos = [(n, self._lotes[n]) for n in (nombres or list(self._lotes)) if n in self._lotes]
+        lotes, pendientes = [], []
+        for nombre, parking in candidatos:
+            # Un movimiento posterior a marcar_guardado queda pendiente para la
+            # próxima vez aunque ya salga en este estado
+            cambios = parking.marcar_guardado()
+            if not cambios:
+                continue
+            lotes.append((nombre, self._plantilla_lote[nombre], estado_lote(parking)))
+            pendientes.append((parking, cambios))
+        try:
+            self.almacen.guardar(lotes)
+        except BaseException:
+            for parking, cambios in pendientes:
+                parking.marcar_pendiente(cambios)
+            raise
+        return len(lotes)
+    
+    def descargar(self, nombre):
+        """Guarda el lote y lo quita de memoria (se recarga al pedirlo)"""
+        if self.almacen is None:
+            raise ValueError("Sin almacén no se puede descargar un lote")
+        with self._cerrojo:
+            self.guardar([nombre])
+            self._lotes.pop(nombre, None)
+    
+    def resumen(self):
+        """
+        Ocupación agregada de los lotes en memoria.
+        
+        Returns:
+            dict: lotes, plazas, ocupadas y ocupacion_porcentaje
+        """
+        with self._cerrojo:
+            parkings = list(self._lotes.values())
+        plazas = sum(len(p.aparcamientos) for p in parkings)
+        ocupadas = sum(p.vehiculos_aparcados() for p in parkings)
+        return {
+            'lotes': len(parkings),
+            'plazas': plazas,
+            'ocupadas': ocupadas,
+            'ocupacion_porcentaje': (ocupadas / plazas * 100) if plazas else 0
+        }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resumen de los lotes de un almacén")
+    parser.add_argument('almacen', help="base SQLite de AlmacenLotes")
+    args = parser.parse_args(argv)
+    
+    almacen = AlmacenLotes(args.almacen)
+    try:
+        gestor = GestorLotes(almacen)
+        for nombre in gestor.nombres():
+            gestor.obtener(nombre)
+        resumen = gestor.resumen()
+        print(f"{resumen['lotes']} lotes, {resumen['ocupadas']}/{resumen['plazas']} plazas ocupadas "
+              f"({resumen['ocupacion_porcentaje']:.1f}%)")
+    finally:
+        almacen.cerrar()
+
+if __name__ == "__main__":
+    main()
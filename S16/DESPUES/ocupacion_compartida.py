@@ -0,0 +1,219 @@
+"""
+Ocupación del parking publicada en memoria compartida.
+
+PublicadorOcupacion se suscribe a un Parking y mantiene en un segmento de
+multiprocessing.shared_memory un mapa de bits de ocupación y los contadores
+por tipo de plaza. Otros procesos de la misma máquina (pantallas, cajeros)
+lo leen con LectorOcupacion sin pasar por el proceso de la interfaz. La
+interfaz gráfica publica al arrancar y parking_consola con --publicar.
+
+Disposición del segmento (little endian):
+
+    0   4s  firma b'PRKO'
+    4   I   filas
+    8   I   columnas
+    12  I   total de plazas
+    16  Q   secuencia (impar mientras se escribe)
+    24  3I  ocupadas por tipo (normal, minusválido, eléctrico)
+    36  3I  total por tipo
+    48  total bytes con la máscara de tipo de cada plaza
+    ..  mapa de bits de ocupación, un bit por plaza
+
+El escritor incrementa la secuencia antes y después de cada cambio. El
+lector copia lo que necesita y repite si la secuencia era impar o ha
+cambiado entre medias, así que nunca ve una actualización a medias y no
+necesita cerrojos.
+
+Uso:
+    python ocupacion_compartida.py [--nombre parking_ocupacion] [--cada 2]
+"""
+import argparse
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+from parking_privado import TipoPlaza
+
+NOMBRE_SEGMENTO = 'parking_ocupacion'
+FIRMA = b'PRKO'
+CABECERA = struct.Struct('<4sIIIQ6I')
+SECUENCIA = struct.Struct('<Q')
+CONTADOR = struct.Struct('<I')
+OFFSET_SECUENCIA = 16
+OFFSET_CONTADORES = 24
+TIPOS = (TipoPlaza.NORMAL, TipoPlaza.MINUSVALIDO, TipoPlaza.ELECTRICO)
+CODIGO_MASCARA = {TipoPlaza.MASCARAS[tipo]: i for i, tipo in enumerate(TIPOS)}
+
+_publicados = set()  # segmentos creados por este proceso
+
+def _tamano(total):
+    return CABECERA.size + total + (total + 7) // 8
+
+class PublicadorOcupacion:
+    """Escritor del segmento compartido, alimentado por los ganchos de Parking"""
+    def __init__(self, parking, nombre=NOMBRE_SEGMENTO, reemplazar=False):
+        """
+        Args:
+            parking: Parking a publicar
+            nombre: Nombre del segmento de memoria compartida
+            reemplazar: Borrar el segmento si ya existe (solo para huérfanos de
+                una ejecución que terminó sin cerrar: si hay otro publicador
+                vivo, sus lectores se quedan sin datos)
+        
+        Raises:
+            FileExistsError: Si el segmento ya existe y no se pide reemplazarlo
+        """
+        self.parking = parking
+        total = len(parking.aparcamientos)
+        try:
+            self.memoria = shared_memory.SharedMemory(nombre, create=True, size=_tamano(total))
+        except FileExistsError:
+            if not reemplazar:
+                raise FileExistsError(
+                    f"El segmento {nombre} ya existe: otro proceso está publicando "
+                    f"(o quedó huérfano; en ese caso, reemplazar=True)"
+                ) from None
+            viejo = shared_memory.SharedMemory(nombre)
+            viejo.close()
+            viejo.unlink()
+            self.memoria = shared_memory.SharedMemory(nombre, create=True, size=_tamano(total))
+        
+        _publicados.add(nombre)
+        self._buffer = self.memoria.buf
+        self._offset_mapa = CABECERA.size + total
+        self._secuencia = 0
+        self._mascaras = b''
+        # El estado inicial se escribe con el cerrojo de la suscripción: así
+        # ningún cambio queda entre la copia y el primer gancho
+        parking.suscribir(self, al_suscribir=self._volcar)
+    
+    def _volcar(self):
+        """Escribe el estado completo del parking"""
+        plazas = self.parking.instantanea_plazas()
+        estado = self.parking.ocupacion_actual()
+        self._mascaras = plazas['mascaras']
+        total = len(self._mascaras)
+        ocupadas = [estado['ocupadas'][tipo] for tipo in TIPOS]
+        totales = [estado['totales'][tipo] for tipo in TIPOS]
+        mapa = bytearray((total + 7) // 8)
+        for i, ocupada in enumerate(plazas['ocupadas']):
+            if ocupada:
+                mapa[i >> 3] |= 1 << (i & 7)
+        
+        self._empezar()
+        CABECERA.pack_into(self._buffer, 0, FIRMA, plazas['filas'], plazas['columnas'], total,
+                           self._secuencia, *ocupadas, *totales)
+        self._buffer[CABECERA.size:self._offset_mapa] = self._mascaras
+        self._buffer[self._offset_mapa:self._offset_mapa + len(mapa)] = mapa
+        self._terminar()
+    
+    def _empezar(self):
+        self._secuencia += 1
+        SECUENCIA.pack_into(self._buffer, OFFSET_SECUENCIA, self._secuencia)
+    
+    def _terminar(self):
+        self._secuencia += 1
+        SECUENCIA.pack_into(self._buffer, OFFSET_SECUENCIA, self._secuencia)
+    
+    def _cambiar(self, indice, ocupada):
+        codigo = CODIGO_MASCARA[self._mascaras[indice]]
+        posicion = self._offset_mapa + (indice >> 3)
+        offset_contador = OFFSET_CONTADORES + codigo * CONTADOR.size
+        ocupadas = CONTADOR.unpack_from(self._buffer, offset_contador)[0]
+        
+        self._empezar()
+        if ocupada:
+            self._buffer[posicion] |= 1 << (indice & 7)
+            CONTADOR.pack_into(self._buffer, offset_contador, ocupadas + 1)
+        else:
+            self._buffer[posicion] &= ~(1 << (indice & 7)) & 0xFF
+            CONTADOR.pack_into(self._buffer, offset_contador, ocupadas - 1)
+        self._terminar()
+    
+    # Ganchos de Parking (se llaman con su cerrojo tomado)
+    
+    def plaza_ocupada(self, indice):
+        self._cambiar(indice, True)
+    
+    def plaza_liberada(self, indice):
+        self._cambiar(indice, False)
+    
+    def cerrar(self):
+        """Deja de publicar y elimina el segmento"""
+        self.parking.desuscribir(self)
+        self._buffer = None
+        self.memoria.close()
+        self.memoria.unlink()
+        _publicados.discard(self.memoria.name)
+
+class LectorOcupacion:
+    """Lector sin cerrojos del segmento publicado por PublicadorOcupacion"""
+    def __init__(self, nombre=NOMBRE_SEGMENTO):
+        self.memoria = shared_memory.SharedMemory(nombre)
+        if nombre not in _publicados:
+            # El segmento es del publicador: que el resource_tracker no lo borre al salir
+            resource_tracker.unregister(self.memoria._name, 'shared_memory')
+        self.buffer = self.memoria.buf
+        firma, self.filas, self.columnas, self.total = CABECERA.unpack_from(self.buffer, 0)[:4]
+        if firma != FIRMA:
+            raise ValueError(f"El segmento {nombre} no contiene ocupación del parking")
+        self._offset_mapa = CABECERA.size + self.total
+        self.mascaras = bytes(self.buffer[CABECERA.size:self._offset_mapa])  # no cambian
+    
+    def _leer(self, copiar):
+        while True:
+            inicio = SECUENCIA.unpack_from(self.buffer, OFFSET_SECUENCIA)[0]
+            if inicio & 1:
+                time.sleep(0)
+                continue
+            datos = copiar()
+            if SECUENCIA.unpack_from(self.buffer, OFFSET_SECUENCIA)[0] == inicio:
+                return datos
+    
+    def contadores(self):
+        """
+        Ocupación por tipo de plaza, consistente.
+        
+        Returns:
+            dict: {tipo: {'total', 'ocupadas', 'libres'}}
+        """
+        valores = self._leer(lambda: CABECERA.unpack_from(self.buffer, 0)[5:])
+        return {
+            tipo: {'total': valores[3 + i], 'ocupadas': valores[i], 'libres': valores[3 + i] - valores[i]}
+            for i, tipo in enumerate(TIPOS)
+        }
+    
+    def mapa(self):
+        """Copia consistente del mapa de bits de ocupación"""
+        fin = self._offset_mapa + (self.total + 7) // 8
+        return self._leer(lambda: bytes(self.buffer[self._offset_mapa:fin]))
+    
+    def ocupada(self, indice):
+        """Estado de una plaza (índice en orden fila-columna)"""
+        return bool(self.buffer[self._offset_mapa + (indice >> 3)] >> (indice & 7) & 1)
+    
+    def cerrar(self):
+        self.buffer = None
+        self.memoria.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lectura de la ocupación publicada por el parking")
+    parser.add_argument('--nombre', default=NOMBRE_SEGMENTO)
+    parser.add_argument('--cada', type=float, default=None, help="repetir cada N segundos")
+    args = parser.parse_args(argv)
+    
+    lector = LectorOcupacion(args.nombre)
+    try:
+        while True:
+            partes = [f"{tipo}: {c['ocupadas']}/{c['total']}" for tipo, c in lector.contadores().items()]
+            print(' | '.join(partes), flush=True)
+            if not args.cada:
+                break
+            time.sleep(args.cada)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        lector.cerrar()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Consola por lotes del parking, sin interfaz gráfica.
+
+Lee órdenes en JSON lines (una por línea, de un fichero o de stdin), las aplica
+sobre el parking cargado con Parking.cargar_estado y escribe en stdout un
+resultado JSON por orden. Las estancias completadas se anotan en un
+RegistroEstancias. Al terminar guarda el estado y el registro. Con --publicar,
+la ocupación se publica en memoria compartida mientras dura el lote (ver
+ocupacion_compartida.py).
+
+    {"op": "entrar", "matricula": "1234BCD", "es_minusvalido": false, "es_electrico": true}
+    {"op": "entrar"}
+    {"op": "salir", "matricula": "1234BCD"}
+    {"op": "listar"}
+    {"op": "resumen"}
+    {"op": "tarifa", "nombre": "Por Tramos"}
+    {"op": "mas_largas", "n": 5}
+    {"op": "cuantiles", "qs": [0.5, 0.9, 0.99]}
+
+mas_largas y cuantiles consultan las EstadisticasEstancias del parking
+(las duraciones son las de las estancias completadas durante el lote).
+
+Todas admiten "puerta" (índice de cabina) y "id", que se copia al resultado
+para poder emparejarlo con su orden. Una línea que no se puede interpretar da
+un resultado con "error" y se sigue con la siguiente.
+
+Uso:
+    python parking_consola.py ordenes.jsonl
+    generador | python parking_consola.py - --estado otro_estado.json.gz > resultados.jsonl
+"""
+import argparse
+import json
+import sys
+import weakref
+
+from estadisticas_estancias import EstadisticasEstancias
+from ocupacion_compartida import NOMBRE_SEGMENTO, PublicadorOcupacion
+from parking_privado import ESTRATEGIAS_TARIFA, Parking, crear_estrategia
+from registro_estancias import RegistroEstancias
+
+_estadisticas = weakref.WeakKeyDictionary()  # Parking -> EstadisticasEstancias
+
+def estadisticas(parking):
+    """EstadisticasEstancias del parking (se suscribe la primera vez que se pide)"""
+    if parking not in _estadisticas:
+        _estadisticas[parking] = EstadisticasEstancias(parking)
+    return _estadisticas[parking]
+
+def _validar(orden, matricula_obligatoria):
+    """Mensaje de error si matrícula o puerta no son válidas, o None"""
+    matricula = orden.get('matricula')
+    if (matricula is not None or matricula_obligatoria) and (
+            not isinstance(matricula, str) or not matricula.strip()):
+        return f"La matrícula debe ser un texto no vacío: {matricula!r}"
+    puerta = orden.get('puerta', 0)
+    if not isinstance(puerta, int) or isinstance(puerta, bool):
+        return f"La puerta debe ser un entero: {puerta!r}"
+    return None
+
+def _entrar(parking, orden):
+    error = _validar(orden, matricula_obligatoria=False)
+    if error:
+        return {'ok': False, 'error': error}
+    exito, mensaje, plaza = parking.entrar(
+        orden.get('matricula'),
+        bool(orden.get('es_minusvalido')),
+        bool(orden.get('es_electrico')),
+        orden.get('puerta', 0)
+    )
+    return {'ok': exito, 'mensaje': mensaje, 'plaza': plaza}
+
+def _salir(parking, orden):
+    error = _validar(orden, matricula_obligatoria=True)
+    if error:
+        return {'ok': False, 'error': error}
+    exito, mensaje, tarifa = parking.salir(orden['matricula'], orden.get('puerta', 0))
+    return {'ok': exito, 'mensaje': mensaje, 'tarifa': tarifa}
+
+def _listar(parking, orden):
+    return {'ok': True, 'coches': parking.listar_coches()}
+
+def _resumen(parking, orden):
+    return {'ok': True, 'resumen': parking.resumen()}
+
+def _tarifa(parking, orden):
+    nombre = orden['nombre']
+    if nombre not in ESTRATEGIAS_TARIFA:
+        return {'ok': False, 'error': f"Tarifa desconocida: {nombre}"}
+    parking.cambiar_tarifa(crear_estrategia(nombre), orden.get('puerta'))
+    return {'ok': True, 'mensaje': f"Tarifa cambiada a: {nombre}"}
+
+def _mas_largas(parking, orden):
+    return {'ok': True, 'coches': estadisticas(parking).mas_largas(int(orden.get('n', 10)))}
+
+def _cuantiles(parking, orden):
+    qs = orden.get('qs', (0.5, 0.95, 0.99))
+    try:
+        return {'ok': True, 'cuantiles': estadisticas(parking).cuantiles([float(q) for q in qs])}
+    except ValueError as e:
+        return {'ok': False, 'error': str(e)}
+
+ORDENES = {
+    'entrar': _entrar,
+    'salir': _salir,
+    'listar': _listar,
+    'resumen': _resumen,
+    'tarifa': _tarifa,
+    'mas_largas': _mas_largas,
+    'cuantiles': _cuantiles
+}
+
+def ejecutar(parking, lineas, salida):
+    """
+    Aplica las órdenes de `lineas` y escribe un resultado por cada una.
+    
+    Args:
+        parking: Parking sobre el que se ejecutan
+        lineas: Iterable de líneas JSON
+        salida: Fichero de texto donde se escriben los resultados
+    
+    Returns:
+        tuple: (órdenes procesadas, órdenes con error)
+    """
+    codificar = json.JSONEncoder(ensure_ascii=False, default=str).encode
+    procesadas = errores = 0
+    for numero, linea in enumerate(lineas, 1):
+        if not linea.strip():
+            continue
+        procesadas += 1
+        orden = {}
+        try:
+            orden = json.loads(linea)
+            resultado = ORDENES[orden['op']](parking, orden)
+        except ValueError as e:
+            resultado = {'ok': False, 'error': f"JSON inválido: {e}"}
+        except KeyError as e:
+            resultado = {'ok': False, 'error': f"Falta o no se reconoce {e}"}
+        except (IndexError, TypeError) as e:
+            resultado = {'ok': False, 'error': str(e)}
+        
+        errores += 'error' in resultado
+        resultado['linea'] = numero
+        if isinstance(orden, dict):
+            resultado['op'] = orden.get('op')
+            if 'id' in orden:
+                resultado['id'] = orden['id']
+        salida.write(codificar(resultado) + '\n')
+    return procesadas, errores
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Órdenes del parking por lotes (JSON lines)")
+    parser.add_argument('ordenes', nargs='?', default='-', help="fichero JSON lines o - para stdin")
+    parser.add_argument('--estado', default='parking_estado.json', help="snapshot a cargar y guardar")
+    parser.add_argument('--guardar-en', default=None, help="guardar el estado final en otro archivo")
+    parser.add_argument('--sin-guardar', action='store_true', help="no guardar el estado al terminar")
+    parser.add_argument('--filas', type=int, default=7, help="tamaño si no existe el estado")
+    parser.add_argument('--columnas', type=int, default=13)
+    parser.add_argument('--estancias', default='estancias', help="carpeta del registro de estancias")
+    parser.add_argument('--publicar', nargs='?', const=NOMBRE_SEGMENTO, default=None, metavar='SEGMENTO',
+                        help="publicar la ocupación en memoria compartida")
+    parser.add_argument('--reemplazar-segmento', action='store_true',
+                        help="borrar el segmento si ya existe (huérfano de otra ejecución)")
+    args = parser.parse_args(argv)
+    
+    parking = Parking.cargar_estado(args.estado)
+    if parking is None:
+        parking = Parking(args.filas, args.columnas)
+    parking.registro = RegistroEstancias(None if args.sin_guardar else args.estancias)
+    estadisticas(parking)  # desde el principio, para que cuenten todas las salidas del lote
+    publicador = None
+    if args.publicar:
+        publicador = PublicadorOcupacion(parking, args.publicar, args.reemplazar_segmento)
+    
+    entrada = sys.stdin if args.ordenes == '-' else open(args.ordenes, 'r', encoding='utf-8')
+    try:
+        procesadas, errores = ejecutar(parking, entrada, sys.stdout)
+    finally:
+        if entrada is not sys.stdin:
+            entrada.close()
+        if publicador is not None:
+            publicador.cerrar()
+        # Checkpoint también si el lote se interrumpe a medias
+        if not args.sin_guardar:
+            parking.guardar_estado(args.guardar_en or args.estado)
+            parking.registro.guardar()
+    
+    print(f"{procesadas} órdenes, {errores} con error", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,36 @@
+import gzip
+import itertools
 import json
+import logging
+import lzma
+import math
+import os
 import random
 import string
+import sys
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from types import MappingProxyType
 from abc import ABC, abstractmethod
 import tkinter as tk
 from tkinter import messagebox, simpledialog, ttk
-from threading import Thread
+from threading import Event, Lock, RLock, Thread
 import time
+import zlib
 
 # ========================= MODELOS DE DOMINIO =========================
 
 class Coche:
     """Clase que representa un vehículo"""
+    __slots__ = ('matricula', 'es_minusvalido', 'es_electrico', 'capacidades')
+    
     def __init__(self, matricula, es_minusvalido=False, es_electrico=False):
         self.matricula = matricula
         self.es_minusvalido = es_minusvalido
         self.es_electrico = es_electrico
+        self.capacidades = TipoPlaza.capacidades(es_minusvalido, es_electrico)
     
     def to_dict(self):
         return {
@@ -37,48 +52,61 @@ class TipoPlaza:
     NORMAL = "normal"
     MINUSVALIDO = "minusvalido"
     ELECTRICO = "electrico"
+    
+    # Un bit por tipo de plaza
+    MASCARAS = {NORMAL: 1, MINUSVALIDO: 2, ELECTRICO: 4}
+    
+    # Tipos que puede ocupar cada vehículo, indexado por (minusválido << 1) | eléctrico
+    COMPATIBILIDAD = (
+        MASCARAS[NORMAL],
+        MASCARAS[NORMAL] | MASCARAS[ELECTRICO],
+        MASCARAS[NORMAL] | MASCARAS[MINUSVALIDO],
+        MASCARAS[NORMAL] | MASCARAS[MINUSVALIDO] | MASCARAS[ELECTRICO]
+    )
+    
+    @staticmethod
+    def capacidades(es_minusvalido, es_electrico):
+        """Máscara de tipos de plaza que puede ocupar un vehículo"""
+        return TipoPlaza.COMPATIBILIDAD[(bool(es_minusvalido) << 1) | bool(es_electrico)]
 
 class Aparcamiento:
     """Clase que representa una plaza de aparcamiento"""
+    __slots__ = ('id', 'fila', 'columna', 'tipo', 'mascara', 'ocupado', 'coche', 'timestamp_entrada')
+    
     def __init__(self, id_aparcamiento, fila, columna, tipo=TipoPlaza.NORMAL):
         self.id = id_aparcamiento
         self.fila = fila
         self.columna = columna
         self.tipo = tipo
+        self.mascara = TipoPlaza.MASCARAS[tipo]
         self.ocupado = False
         self.coche = None
         self.timestamp_entrada = None
     
     def puede_ocupar(self, coche):
-        """Verifica si un coche puede ocupar esta plaza"""
-        if self.ocupado:
-            return False
+        """Verifica si un coche puede ocupar esta plaza.
         
-        # Plaza de minusválidos solo para coches con tarjeta
-        if self.tipo == TipoPlaza.MINUSVALIDO and not coche.es_minusvalido:
-            return False
-        
-        # Plaza eléctrica solo para coches eléctricos
-        if self.tipo == TipoPlaza.ELECTRICO and not coche.es_electrico:
-            return False
-        
-        return True
+        Las plazas de minusválidos solo admiten coches con tarjeta y las
+        eléctricas solo coches eléctricos: la tabla TipoPlaza.COMPATIBILIDAD ya
+        recoge esas reglas en coche.capacidades, así que basta un AND de bits.
+        """
+        return not self.ocupado and bool(self.mascara & coche.capacidades)
     
-    def ocupar(self, coche):
-        """Ocupa el aparcamiento con un coche"""
+    def ocupar(self, coche, instante=None):
+        """Ocupa el aparcamiento con un coche (en `instante` o ahora)"""
         if self.puede_ocupar(coche):
             self.ocupado = True
             self.coche = coche
-            self.timestamp_entrada = datetime.now()
+            self.timestamp_entrada = instante or datetime.now()
             return True
         return False
     
-    def liberar(self):
-        """Libera el aparcamiento"""
+    def liberar(self, instante=None):
+        """Libera el aparcamiento (en `instante` o ahora)"""
         coche = self.coche
         tiempo_estacionado = None
         if self.timestamp_entrada:
-            tiempo_estacionado = datetime.now() - self.timestamp_entrada
+            tiempo_estacionado = (instante or datetime.now()) - self.timestamp_entrada
         
         self.ocupado = False
         self.coche = None
@@ -117,21 +145,29 @@ class EstrategiaTarifa(ABC):
     """Clase abstracta para estrategias de tarificación"""
     
     @abstractmethod
-    def calcular(self, tiempo_estacionado, coche, tipo_plaza):
-        """Calcula la tarifa según el tiempo y características"""
+    def calcular(self, tiempo_estacionado, coche, tipo_plaza, salida=None):
+        """Calcula la tarifa según el tiempo y características.
+        
+        `salida` es el instante de salida (por defecto, ahora); solo lo usan
+        las estrategias que dependen de la hora.
+        """
         pass
     
     @abstractmethod
     def get_nombre(self):
         """Retorna el nombre de la estrategia"""
         pass
+    
+    def vincular(self, parking):
+        """Se llama al asignar la estrategia a un parking (por si necesita su estado)"""
+        pass
 
 class TarifaEstandar(EstrategiaTarifa):
     """Tarifa estándar: 1.5€ por 20 segundos después de 30s gratis"""
     TIEMPO_GRATIS_SEGUNDOS = 30
     TARIFA_POR_SEGUNDO = 1.5 / 20
     
-    def calcular(self, tiempo_estacionado, coche, tipo_plaza):
+    def calcular(self, tiempo_estacionado, coche, tipo_plaza, salida=None):
         if tiempo_estacionado is None:
             return 0
         
@@ -149,29 +185,69 @@ class TarifaEstandar(EstrategiaTarifa):
         return "Estándar"
 
 class TarifaPorTramos(EstrategiaTarifa):
-    """Tarifa por tramos horarios: más cara en horas punta"""
+    """Tarifa por tramos horarios: más cara en horas punta.
+    
+    Cada estancia se reparte entre los tramos que atraviesa según sus instantes
+    de entrada y salida. El coste acumulado desde medianoche hasta cada límite
+    de tramo está precalculado, así que el importe es una resta de dos
+    acumulados: no depende de la duración ni del número de días.
+    """
     TIEMPO_GRATIS_SEGUNDOS = 30
+    SEGUNDOS_DIA = 24 * 3600
+    # (hora de inicio, €/segundo) de cada tramo, ordenados desde las 0h
+    TRAMOS = (
+        (0, 1.0 / 20),   # Hora valle
+        (8, 2.0 / 20),   # Hora punta (8-20h)
+        (20, 1.0 / 20)   # Hora valle
+    )
     
-    def calcular(self, tiempo_estacionado, coche, tipo_plaza):
-        if tiempo_estacionado is None:
+    def __init__(self):
+        self._limites = [hora * 3600 for hora, _ in self.TRAMOS]
+        self._precios = [precio for _, precio in self.TRAMOS]
+        
+        # Coste acumulado desde las 0h hasta el inicio de cada tramo
+        self._acumulado = [0.0]
+        fines = self._limites[1:] + [self.SEGUNDOS_DIA]
+        for inicio, fin, precio in zip(self._limites, fines, self._precios):
+            self._acumulado.append(self._acumulado[-1] + (fin - inicio) * precio)
+        self._coste_dia = self._acumulado.pop()
+    
+    def _coste_hasta(self, instante, dia_base):
+        """Coste acumulado desde las 0h de `dia_base` (ordinal) hasta `instante`"""
+        segundo_dia = (instante.hour * 3600 + instante.minute * 60 + instante.second
+                       + instante.microsecond / 1e6)
+        i = bisect_right(self._limites, segundo_dia) - 1
+        return ((instante.toordinal() - dia_base) * self._coste_dia
+                + self._acumulado[i] + (segundo_dia - self._limites[i]) * self._precios[i])
+    
+    def importe(self, entrada, salida):
+        """Importe exacto de una estancia entre dos instantes"""
+        inicio_cobro = entrada + timedelta(seconds=self.TIEMPO_GRATIS_SEGUNDOS)
+        if salida <= inicio_cobro:
             return 0
         
-        segundos_totales = tiempo_estacionado.total_seconds()
-        
-        if segundos_totales <= self.TIEMPO_GRATIS_SEGUNDOS:
+        dia_base = inicio_cobro.toordinal()
+        tarifa = self._coste_hasta(salida, dia_base) - self._coste_hasta(inicio_cobro, dia_base)
+        return round(tarifa, 2)
+    
+    def calcular(self, tiempo_estacionado, coche, tipo_plaza, salida=None):
+        if tiempo_estacionado is None:
             return 0
         
-        # Simular hora punta (entre 8-20h) con tarifa más alta
-        hora_actual = datetime.now().hour
-        if 8 <= hora_actual < 20:
-            tarifa_por_segundo = 2.0 / 20  # Hora punta
-        else:
-            tarifa_por_segundo = 1.0 / 20  # Hora valle
+        salida = salida or datetime.now()
+        return self.importe(salida - tiempo_estacionado, salida)
+    
+    def calcular_lote(self, estancias):
+        """
+        Recalcula importes de estancias históricas.
         
-        segundos_cobrables = segundos_totales - self.TIEMPO_GRATIS_SEGUNDOS
-        tarifa = segundos_cobrables * tarifa_por_segundo
+        Args:
+            estancias: Iterable de tuplas (entrada: datetime, salida: datetime)
         
-        return round(tarifa, 2)
+        Returns:
+            list: Importe de cada estancia, en el mismo orden
+        """
+        return [self.importe(entrada, salida) for entrada, salida in estancias]
     
     def get_nombre(self):
         return "Por Tramos"
@@ -181,7 +257,7 @@ class TarifaDiferenciada(EstrategiaTarifa):
     TIEMPO_GRATIS_SEGUNDOS = 30
     TARIFA_BASE = 1.5 / 20
     
-    def calcular(self, tiempo_estacionado, coche, tipo_plaza):
+    def calcular(self, tiempo_estacionado, coche, tipo_plaza, salida=None):
         if tiempo_estacionado is None:
             return 0
         
@@ -206,52 +282,529 @@ class TarifaDiferenciada(EstrategiaTarifa):
     def get_nombre(self):
         return "Diferenciada"
 
+class TarifaDinamica(EstrategiaTarifa):
+    """Tarifa dinámica: el precio sube a medida que se llena el tipo de plaza.
+    
+    La ocupación se lee de los contadores por tipo del parking (O(1)) y se
+    suaviza con una media móvil exponencial en el tiempo, para que un pico
+    momentáneo no dispare el precio. El multiplicador sale de interpolar
+    linealmente la curva (ocupación, multiplicador).
+    """
+    TIEMPO_GRATIS_SEGUNDOS = 30
+    TARIFA_BASE = 1.5 / 20
+    CURVA = ((0.0, 0.8), (0.5, 1.0), (0.8, 1.5), (0.95, 2.0), (1.0, 2.5))
+    SUAVIZADO_SEGUNDOS = 600  # constante de tiempo de la media móvil
+    
+    def __init__(self, curva=CURVA, suavizado_segundos=SUAVIZADO_SEGUNDOS):
+        self.curva = tuple(sorted(curva))
+        self._ocupaciones = [o for o, _ in self.curva]
+        self._multiplicadores = [m for _, m in self.curva]
+        self.suavizado_segundos = suavizado_segundos
+        self._parking = None
+        self._media = {}   # tipo de plaza -> (ocupación suavizada, instante)
+    
+    def vincular(self, parking):
+        self._parking = parking
+        self._media = {}
+    
+    def ocupacion_suavizada(self, tipo_plaza, ahora):
+        """Actualiza y devuelve la media móvil de ocupación de `tipo_plaza`"""
+        actual = self._parking.ocupacion(tipo_plaza)
+        anterior = self._media.get(tipo_plaza)
+        if anterior is None:
+            media = actual
+        else:
+            media, instante = anterior
+            segundos = (ahora - instante).total_seconds()
+            if segundos > 0:
+                media += (actual - media) * (1 - math.exp(-segundos / self.suavizado_segundos))
+        self._media[tipo_plaza] = (media, ahora)
+        return media
+    
+    def multiplicador(self, ocupacion):
+        """Interpola la curva de precios en `ocupacion` (0..1)"""
+        i = bisect_right(self._ocupaciones, ocupacion)
+        if i == 0:
+            return self._multiplicadores[0]
+        if i == len(self._ocupaciones):
+            return self._multiplicadores[-1]
+        x0, x1 = self._ocupaciones[i - 1], self._ocupaciones[i]
+        y0, y1 = self._multiplicadores[i - 1], self._multiplicadores[i]
+        return y0 + (y1 - y0) * (ocupacion - x0) / (x1 - x0)
+    
+    def calcular(self, tiempo_estacionado, coche, tipo_plaza, salida=None):
+        if tiempo_estacionado is None:
+            return 0
+        
+        segundos_cobrables = tiempo_estacionado.total_seconds() - self.TIEMPO_GRATIS_SEGUNDOS
+        if segundos_cobrables <= 0:
+            return 0
+        
+        # Sin parking vinculado (p. ej. en el comparador) se cobra la tarifa base
+        multiplicador = 1.0
+        if self._parking is not None:
+            ahora = salida or self._parking.reloj()
+            multiplicador = self.multiplicador(self.ocupacion_suavizada(tipo_plaza, ahora))
+        
+        return round(segundos_cobrables * self.TARIFA_BASE * multiplicador, 2)
+    
+    def get_nombre(self):
+        return "Dinámica"
+
+ESTRATEGIAS_TARIFA = {
+    'Estándar': TarifaEstandar,
+    'Por Tramos': TarifaPorTramos,
+    'Diferenciada': TarifaDiferenciada,
+    'Dinámica': TarifaDinamica
+}
+
+def crear_estrategia(nombre):
+    """Crea la estrategia de tarifa a partir de su nombre (get_nombre)"""
+    return ESTRATEGIAS_TARIFA.get(nombre, TarifaEstandar)()
+
 # ========================= CABINA =========================
 
+class GeneradorMatriculas:
+    """Genera matrículas únicas (4 dígitos + 3 letras) sin repetir ninguna.
+    
+    Recorre en orden un contador y lo pasa por una permutación pseudoaleatoria
+    del espacio de 10^4 x 26^3 matrículas (red de Feistel de 28 bits con
+    "cycle walking"), así que no necesita recordar las matrículas ya emitidas.
+    """
+    TOTAL = 10**4 * 26**3
+    BITS_MITAD = 14
+    MASCARA_MITAD = (1 << BITS_MITAD) - 1
+    RONDAS = 4
+    _NUMEROS = [f"{n:04d}" for n in range(10**4)]
+    _LETRAS = [''.join(letras) for letras in itertools.product(string.ascii_uppercase, repeat=3)]
+    
+    MULTIPLICADOR = 0x9E3779B1  # constante de Knuth para hashing multiplicativo
+    
+    def __init__(self, rng=None):
+        # Una clave de 32 bits por ronda: no hace falta precalcular tablas
+        rng = rng or random.Random()
+        self._claves = [rng.getrandbits(32) for _ in range(self.RONDAS)]
+        self._siguiente = 0
+        self._cerrojo = Lock()
+    
+    def _ronda(self, mitad, clave):
+        """Función de ronda: hashing multiplicativo con clave, 14 bits altos de 32"""
+        return (((mitad ^ clave) * self.MULTIPLICADOR) & 0xFFFFFFFF) >> (32 - self.BITS_MITAD)
+    
+    def _permutar(self, indice):
+        mascara, bits, ronda = self.MASCARA_MITAD, self.BITS_MITAD, self._ronda
+        while True:
+            izq, der = indice >> bits, indice & mascara
+            for clave in self._claves:
+                izq, der = der, izq ^ ronda(der, clave)
+            indice = (izq << bits) | der
+            if indice < self.TOTAL:
+                return indice
+    
+    def _reservar(self, cantidad):
+        # El generador se comparte entre puertas, lotes e hilos de carga:
+        # la reserva del bloque tiene que ser atómica para no solapar rangos
+        with self._cerrojo:
+            inicio = self._siguiente
+            if inicio + cantidad > self.TOTAL:
+                raise RuntimeError("Se han agotado las matrículas disponibles")
+            self._siguiente = inicio + cantidad
+        return inicio
+    
+    def generar(self):
+        """Devuelve la siguiente matrícula de la permutación"""
+        letras, numero = divmod(self._permutar(self._reservar(1)), 10**4)
+        return self._NUMEROS[numero] + self._LETRAS[letras]
+    
+    def generar_lote(self, cantidad):
+        """Devuelve `cantidad` matrículas únicas de una vez (pruebas de carga)"""
+        inicio = self._reservar(cantidad)
+        permutar, numeros, letras = self._permutar, self._NUMEROS, self._LETRAS
+        resultado = []
+        for indice in range(inicio, inicio + cantidad):
+            l, n = divmod(permutar(indice), 10**4)
+            resultado.append(numeros[n] + letras[l])
+        return resultado
+
+class ColaEntrada:
+    """Cola de vehículos esperando plaza en la cabina.
+    
+    Tiene capacidad limitada: si está llena el vehículo se marcha (balking).
+    Cuando se libera una plaza se admite al primer vehículo compatible,
+    dando prioridad a PMR, luego a eléctricos y luego al resto (FIFO dentro
+    de cada clase).
+    """
+    PRIORIDADES = ('pmr', 'ev', 'normal')
+    
+    def __init__(self, capacidad=0):
+        self.capacidad = capacidad
+        self._colas = {clase: deque() for clase in self.PRIORIDADES}
+        
+        # Métricas
+        self.encolados = 0
+        self.admitidos = 0
+        self.abandonos = 0       # se marcharon por cola llena
+        self.retirados = 0       # salieron de la cola sin llegar a entrar
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self.longitud_max = 0
+        self._area_longitud = 0.0  # integral de la longitud en el tiempo
+        self._ultimo_cambio = None
+        self._primer_instante = None
+    
+    def __len__(self):
+        return sum(len(c) for c in self._colas.values())
+    
+    def __contains__(self, matricula):
+        return any(coche.matricula == matricula
+                   for cola in self._colas.values() for coche, _ in cola)
+    
+    def capacidades_en_espera(self):
+        """Máscara de los tipos de plaza que sirven a algún vehículo de la cola"""
+        capacidades = 0
+        for cola in self._colas.values():
+            for coche, _ in cola:
+                capacidades |= coche.capacidades
+        return capacidades
+    
+    def _clase(self, coche):
+        if coche.es_minusvalido:
+            return 'pmr'
+        if coche.es_electrico:
+            return 'ev'
+        return 'normal'
+    
+    def _registrar_longitud(self, ahora):
+        if self._ultimo_cambio is None:
+            self._primer_instante = ahora
+        else:
+            self._area_longitud += len(self) * (ahora - self._ultimo_cambio).total_seconds()
+        self._ultimo_cambio = ahora
+    
+    def encolar(self, coche, ahora):
+        """Añade un vehículo a la cola. Devuelve su posición o None si se marcha."""
+        if len(self) >= self.capacidad:
+            self.abandonos += 1
+            return None
+        self._registrar_longitud(ahora)
+        self._colas[self._clase(coche)].append((coche, ahora))
+        self.encolados += 1
+        self.longitud_max = max(self.longitud_max, len(self))
+        return len(self)
+    
+    def admitir(self, mascara_plaza, ahora):
+        """Saca de la cola el vehículo con más prioridad que cabe en la plaza"""
+        for clase in self.PRIORIDADES:
+            cola = self._colas[clase]
+            for posicion, (coche, llegada) in enumerate(cola):
+                if coche.capacidades & mascara_plaza:
+                    self._registrar_longitud(ahora)
+                    del cola[posicion]
+                    espera = (ahora - llegada).total_seconds()
+                    self.admitidos += 1
+                    self.espera_total += espera
+                    self.espera_max = max(self.espera_max, espera)
+                    return coche
+        return None
+    
+    def retirar(self, matricula, ahora):
+        """Quita de la cola un vehículo que se marcha sin entrar"""
+        for cola in self._colas.values():
+            for posicion, (coche, _) in enumerate(cola):
+                if coche.matricula == matricula:
+                    self._registrar_longitud(ahora)
+                    del cola[posicion]
+                    self.retirados += 1
+                    return True
+        return False
+    
+    def metricas(self, ahora):
+        """Métricas de la cola hasta `ahora`"""
+        area = self._area_longitud
+        if self._ultimo_cambio is not None:
+            area += len(self) * (ahora - self._ultimo_cambio).total_seconds()
+        periodo = (ahora - self._primer_instante).total_seconds() if self._primer_instante else 0
+        llegadas = self.encolados + self.abandonos
+        return {
+            'en_cola': len(self),
+            'capacidad': self.capacidad,
+            'encolados': self.encolados,
+            'admitidos': self.admitidos,
+            'abandonos': self.abandonos,
+            'retirados': self.retirados,
+            'tasa_abandono': self.abandonos / llegadas if llegadas else 0,
+            'espera_media_segundos': self.espera_total / self.admitidos if self.admitidos else 0,
+            'espera_max_segundos': self.espera_max,
+            'longitud_media': area / periodo if periodo else 0,
+            'longitud_max': self.longitud_max
+        }
+
 class Cabina:
-    """Clase que gestiona la generación de vehículos y tarifas"""
+    """Clase que gestiona la generación de vehículos, tarifas y cola de entrada"""
     MAX_INTENTOS_BUSQUEDA = 5
     
-    def __init__(self, estrategia_tarifa=None):
+    def __init__(self, estrategia_tarifa=None, capacidad_cola=0, rng=None, generador_matriculas=None):
+        self.rng = rng or random.Random()  # propio: reproducible con semilla y sin compartir entre hilos
         self.estrategia_tarifa = estrategia_tarifa or TarifaEstandar()
+        # Compartido entre puertas (y lotes) para que las matrículas no se repitan
+        self.generador_matriculas = generador_matriculas or GeneradorMatriculas(self.rng)
+        self.cola = ColaEntrada(capacidad_cola)
+        
+        # Métricas de la puerta
+        self.entradas = 0
+        self.rechazos = 0
+        self.salidas = 0
+        self.abandonos_cola = 0  # vehículos que dejan la cola por esta puerta sin haber entrado
+        self.ingresos = 0.0
+        self.tiempo_servicio = 0.0
     
     def cambiar_estrategia_tarifa(self, estrategia):
         """Permite cambiar la estrategia de tarificación"""
         self.estrategia_tarifa = estrategia
     
     def generar_matricula(self):
-        """Genera una matrícula aleatoria española"""
-        numeros = ''.join(random.choices(string.digits, k=4))
-        letras = ''.join(random.choices(string.ascii_uppercase, k=3))
-        return f"{numeros}{letras}"
+        """Genera una matrícula española que no se ha emitido antes"""
+        return self.generador_matriculas.generar()
+    
+    def generar_matriculas(self, cantidad):
+        """Genera muchas matrículas únicas de una vez"""
+        return self.generador_matriculas.generar_lote(cantidad)
     
     def detectar_caracteristicas(self):
         """Detecta características del vehículo"""
-        es_minusvalido = random.random() < 0.15  # 15%
-        es_electrico = random.random() < 0.20     # 20%
+        es_minusvalido = self.rng.random() < 0.15  # 15%
+        es_electrico = self.rng.random() < 0.20     # 20%
         return es_minusvalido, es_electrico
     
-    def calcular_tarifa(self, tiempo_estacionado, coche, tipo_plaza):
+    def detectar_caracteristicas_lote(self, cantidad):
+        """Características de `cantidad` vehículos de una vez (simulaciones)"""
+        aleatorio = self.rng.random
+        return [(aleatorio() < 0.15, aleatorio() < 0.20) for _ in range(cantidad)]
+    
+    def calcular_tarifa(self, tiempo_estacionado, coche, tipo_plaza, salida=None):
         """Calcula la tarifa usando la estrategia configurada"""
-        return self.estrategia_tarifa.calcular(tiempo_estacionado, coche, tipo_plaza)
+        return self.estrategia_tarifa.calcular(tiempo_estacionado, coche, tipo_plaza, salida)
+    
+    def registrar_entrada(self, exito, duracion):
+        if exito:
+            self.entradas += 1
+        else:
+            self.rechazos += 1
+        self.tiempo_servicio += duracion
+    
+    def registrar_salida(self, exito, tarifa, duracion, abandono_cola=False):
+        if abandono_cola:
+            self.abandonos_cola += 1
+        elif exito:
+            self.salidas += 1
+            self.ingresos += tarifa
+        self.tiempo_servicio += duracion
+    
+    def metricas(self):
+        """Contadores de la puerta"""
+        operaciones = self.entradas + self.rechazos + self.salidas + self.abandonos_cola
+        return {
+            'entradas': self.entradas,
+            'rechazos': self.rechazos,
+            'salidas': self.salidas,
+            'abandonos_cola': self.abandonos_cola,
+            'ingresos': round(self.ingresos, 2),
+            'estrategia_tarifa': self.estrategia_tarifa.get_nombre(),
+            'servicio_medio_ms': self.tiempo_servicio / operaciones * 1000 if operaciones else 0
+        }
+
+# ========================= SNAPSHOTS =========================
+
+COMPRESIONES = ('gzip', 'lzma', 'zlib')
+EXTENSIONES_COMPRESION = {'.gz': 'gzip', '.xz': 'lzma', '.lzma': 'lzma', '.zz': 'zlib'}
+SUFIJO_CAMBIOS = '.cambios'  # checkpoint incremental junto al snapshot
+
+def _detectar_compresion(cabecera):
+    """Detecta el formato del snapshot por sus primeros bytes"""
+    if cabecera.startswith(b'\x1f\x8b'):
+        return 'gzip'
+    if cabecera.startswith(b'\xfd7zXZ\x00'):
+        return 'lzma'
+    if cabecera[:1] == b'\x78':
+        return 'zlib'
+    return None
+
+def _escribir_json(datos, archivo, compresion, indentar=True):
+    """Escribe `datos` como JSON comprimiendo a medida que se serializa"""
+    if compresion is None:
+        with open(archivo, 'w', encoding='utf-8') as f:
+            if indentar:
+                json.dump(datos, f, indent=2)
+            else:
+                json.dump(datos, f, separators=(',', ':'), ensure_ascii=False)
+        return
+    
+    # Sin indentación: en un snapshot comprimido no aporta nada
+    trozos = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False).iterencode(datos)
+    if compresion == 'gzip':
+        with gzip.open(archivo, 'wt', encoding='utf-8') as f:
+            f.writelines(trozos)
+    elif compresion == 'lzma':
+        with lzma.open(archivo, 'wt', encoding='utf-8') as f:
+            f.writelines(trozos)
+    elif compresion == 'zlib':
+        compresor = zlib.compressobj(6)
+        with open(archivo, 'wb') as f:
+            for trozo in trozos:
+                f.write(compresor.compress(trozo.encode('utf-8')))
+            f.write(compresor.flush())
+    else:
+        raise ValueError(f"Compresión desconocida: {compresion}")
+
+def _escribir_atomico(datos, archivo, compresion, indentar=True):
+    """Escribe en un temporal y lo renombra: un fallo a medias nunca deja el archivo corrupto"""
+    temporal = archivo + '.tmp'
+    try:
+        _escribir_json(datos, temporal, compresion, indentar)
+        # Que el contenido esté en disco antes del rename, o un corte de luz
+        # podría dejar `archivo` apuntando a un temporal vacío
+        with open(temporal, 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(temporal, archivo)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+# Esquemas del snapshot:
+#   v1: 'aparcamientos' es una lista con un objeto Aparcamiento.to_dict() por plaza
+#   v2: 'version': 2; 'plazas' guarda la disposición una sola vez en listas
+#       paralelas (id, fila, columna, tipo como máscara de TipoPlaza.MASCARAS) y
+#       'ocupadas' solo las plazas ocupadas como registros
+#       [índice, matrícula, minusválido 0/1, eléctrico 0/1, entrada en epoch]
+VERSION_ESQUEMA = 2
+
+def _ocupadas_v2(aparcamientos):
+    """Registros del esquema v2 de las plazas ocupadas"""
+    ocupadas = []
+    for indice, aparcamiento in enumerate(aparcamientos):
+        if aparcamiento.ocupado:
+            coche = aparcamiento.coche
+            entrada = aparcamiento.timestamp_entrada
+            ocupadas.append([
+                indice, coche.matricula, int(coche.es_minusvalido), int(coche.es_electrico),
+                int(entrada.timestamp()) if entrada else None
+            ])
+    return ocupadas
+
+def _aplicar_ocupadas_v2(aparcamientos, ocupadas):
+    """Ocupa las plazas según los registros de _ocupadas_v2"""
+    for indice, matricula, es_minusvalido, es_electrico, entrada in ocupadas:
+        aparcamiento = aparcamientos[indice]
+        aparcamiento.ocupado = True
+        aparcamiento.coche = Coche(matricula, bool(es_minusvalido), bool(es_electrico))
+        if entrada is not None:
+            aparcamiento.timestamp_entrada = datetime.fromtimestamp(entrada)
+    return aparcamientos
+
+def _plazas_v2(aparcamientos):
+    """Disposición y ocupación de las plazas en el esquema v2"""
+    return {
+        'plazas': {
+            'id': [a.id for a in aparcamientos],
+            'fila': [a.fila for a in aparcamientos],
+            'columna': [a.columna for a in aparcamientos],
+            'tipo': [a.mascara for a in aparcamientos]
+        },
+        'ocupadas': _ocupadas_v2(aparcamientos)
+    }
+
+def _leer_aparcamientos(datos):
+    """Reconstruye la lista de Aparcamiento de un snapshot v1 o v2"""
+    version = datos.get('version', 1)
+    if version == 1:
+        return [Aparcamiento.from_dict(a) for a in datos['aparcamientos']]
+    if version != 2:
+        raise ValueError(f"Versión de snapshot no soportada: {version}")
+    
+    plazas = datos['plazas']
+    tipos = {mascara: tipo for tipo, mascara in TipoPlaza.MASCARAS.items()}
+    aparcamientos = [
+        Aparcamiento(id_aparcamiento, fila, columna, tipos[mascara])
+        for id_aparcamiento, fila, columna, mascara
+        in zip(plazas['id'], plazas['fila'], plazas['columna'], plazas['tipo'])
+    ]
+    return _aplicar_ocupadas_v2(aparcamientos, datos['ocupadas'])
+
+def leer_snapshot(archivo):
+    """
+    Lee un snapshot de guardar_estado (plano o comprimido, esquema v1 o v2)
+    sin crear un Parking ni aplicar el incremental.
+    
+    Returns:
+        tuple: (datos del snapshot, lista de Aparcamiento)
+    """
+    datos = _leer_json(archivo)
+    return datos, _leer_aparcamientos(datos)
+
+def _leer_json(archivo):
+    """Lee un snapshot JSON plano o comprimido (detectado automáticamente)"""
+    with open(archivo, 'rb') as f:
+        compresion = _detectar_compresion(f.read(6))
+        f.seek(0)
+        if compresion == 'gzip':
+            with gzip.open(f, 'rt', encoding='utf-8') as g:
+                return json.load(g)
+        if compresion == 'lzma':
+            with lzma.open(f, 'rt', encoding='utf-8') as g:
+                return json.load(g)
+        if compresion == 'zlib':
+            descompresor = zlib.decompressobj()
+            partes = [descompresor.decompress(bloque) for bloque in iter(lambda: f.read(1 << 16), b'')]
+            partes.append(descompresor.flush())
+            return json.loads(b''.join(partes).decode('utf-8'))
+        return json.loads(f.read().decode('utf-8'))
 
 # ========================= PARKING (INTERFAZ PÚBLICA) =========================
 
-class Parking:
-    """Clase principal que gestiona el parking con interfaz pública"""
+# Para cada máscara de capacidades, tabla de bytes.translate que convierte el
+# byte de una plaza en 1 si está libre y es compatible, o en 0 si no
+_TABLAS_COMPATIBLES = [
+    bytes(1 if valor & capacidades else 0 for valor in range(256))
+    for capacidades in range(8)
+]
+
+def nombre_fila(indice):
+    """Nombre de la fila `indice` (0 -> A, 25 -> Z, 26 -> AA, ...) como en una hoja de cálculo"""
+    nombre = ''
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        nombre = string.ascii_uppercase[resto] + nombre
+    return nombre
+
+class PlantillaPlazas:
+    """Disposición inmutable de un parking: identificador, fila y tipo de cada plaza.
     
-    def __init__(self, filas, columnas, config_plazas=None):
-        self.aparcamientos = []
-        self.cabina = Cabina()
+    Muchos Parking del mismo tamaño pueden compartir una plantilla: las cadenas
+    de la disposición se crean (internadas) una sola vez y cada parking solo
+    añade el estado de sus plazas.
+    """
+    __slots__ = ('filas', 'columnas', 'letras', 'ids', 'tipos', 'indice')
+    
+    def __init__(self, filas, columnas, config=None, rng=None, tipos=None):
+        """
+        Args:
+            config: Proporción de plazas 'minusvalidos' y 'electricos'
+            rng: Generador para repartir los tipos de plaza
+            tipos: Tipo de cada plaza ya repartido (en lugar de config y rng)
+        """
         self.filas = filas
         self.columnas = columnas
-        self._crear_aparcamientos(filas, columnas, config_plazas or {})
+        self.letras = tuple(sys.intern(nombre_fila(i)) for i in range(filas))
+        self.ids = tuple(sys.intern(f"{letra}{col}") for letra in self.letras for col in range(1, columnas + 1))
+        if tipos is None:
+            tipos = self._repartir_tipos(filas * columnas, config or {}, rng or random.Random())
+        self.tipos = tuple(tipos)
+        self.indice = MappingProxyType({id_aparcamiento: i for i, id_aparcamiento in enumerate(self.ids)})
     
-    def _crear_aparcamientos(self, filas, columnas, config):
-        """Crea la estructura de aparcamientos"""
-        letras_fila = string.ascii_uppercase[:filas]
-        total_plazas = filas * columnas
-        
+    @staticmethod
+    def _repartir_tipos(total_plazas, config, rng):
         # Configuración por defecto
         porcentaje_minusvalidos = config.get('minusvalidos', 0.15)
         porcentaje_electricos = config.get('electricos', 0.10)
@@ -259,32 +812,136 @@ class Parking:
         num_minusvalidos = int(total_plazas * porcentaje_minusvalidos)
         num_electricos = int(total_plazas * porcentaje_electricos)
         
-        # Crear todas las plazas
-        todas_plazas = []
-        for letra in letras_fila:
-            for col in range(1, columnas + 1):
-                id_aparcamiento = f"{letra}{col}"
-                todas_plazas.append((id_aparcamiento, letra, col))
-        
-        # Asignar tipos de plaza
-        plazas_especiales = random.sample(todas_plazas, num_minusvalidos + num_electricos)
-        plazas_minusvalidos = plazas_especiales[:num_minusvalidos]
-        plazas_electricos = plazas_especiales[num_minusvalidos:]
-        
-        for id_aparcamiento, letra, col in todas_plazas:
-            if (id_aparcamiento, letra, col) in plazas_minusvalidos:
-                tipo = TipoPlaza.MINUSVALIDO
-            elif (id_aparcamiento, letra, col) in plazas_electricos:
-                tipo = TipoPlaza.ELECTRICO
-            else:
-                tipo = TipoPlaza.NORMAL
-            
-            aparcamiento = Aparcamiento(id_aparcamiento, letra, col, tipo)
-            self.aparcamientos.append(aparcamiento)
+        # Asignar tipos de plaza (por índice: con listas la búsqueda era O(n²))
+        plazas_especiales = rng.sample(range(total_plazas), num_minusvalidos + num_electricos)
+        tipos = [TipoPlaza.NORMAL] * total_plazas
+        for posicion, indice in enumerate(plazas_especiales):
+            tipos[indice] = TipoPlaza.MINUSVALIDO if posicion < num_minusvalidos else TipoPlaza.ELECTRICO
+        return tipos
+    
+    def mascaras(self):
+        """Tipo de cada plaza como bytes (máscaras de TipoPlaza.MASCARAS)"""
+        return bytes(TipoPlaza.MASCARAS[tipo] for tipo in self.tipos)
+    
+    @staticmethod
+    def desde_mascaras(filas, columnas, mascaras):
+        tipos = {mascara: tipo for tipo, mascara in TipoPlaza.MASCARAS.items()}
+        return PlantillaPlazas(filas, columnas, tipos=[tipos[m] for m in mascaras])
+    
+    def crear_aparcamientos(self):
+        """Plazas libres con esta disposición, en orden fila-columna"""
+        columnas = self.columnas
+        return [
+            Aparcamiento(id_aparcamiento, self.letras[i // columnas], i % columnas + 1, tipo)
+            for i, (id_aparcamiento, tipo) in enumerate(zip(self.ids, self.tipos))
+        ]
+
+class Parking:
+    """Clase principal que gestiona el parking con interfaz pública"""
+    
+    def __init__(self, filas, columnas, config_plazas=None, registro=None, capacidad_cola=0,
+                 num_cabinas=1, semilla=None, rng=None, plantilla=None, generador_matriculas=None):
+        self.aparcamientos = []
+        # Cada parking y cada cabina tienen su propio generador, derivado de la
+        # semilla: con la misma semilla se repite exactamente la misma ejecución
+        self.rng = rng or random.Random(semilla)
+        self.cabinas = []
+        for _ in range(max(1, num_cabinas)):
+            # Todas las puertas emiten de la misma serie de matrículas
+            cabina = Cabina(capacidad_cola=capacidad_cola, rng=random.Random(self.rng.getrandbits(64)),
+                            generador_matriculas=generador_matriculas)
+            generador_matriculas = cabina.generador_matriculas
+            self.cabinas.append(cabina)
+        self.cabina = self.cabinas[0]  # puerta principal
+        for cabina in self.cabinas[1:]:
+            # y dan a la misma zona de espera
+            cabina.cola = self.cabina.cola
+        self._cerrojo = RLock()  # las puertas pueden atenderse desde varios hilos
+        self._cerrojo_guardado = RLock()
+        self._sucias = set()  # plazas modificadas desde el último snapshot completo
+        self._cambios = 0     # movimientos desde el último checkpoint
+        self._generacion = 0  # número de snapshot completo (enlaza los incrementales)
+        self._archivo_base = None  # snapshot completo al que se refieren _sucias y _generacion
+        self._observadores = []  # reciben plaza_ocupada(indice) / plaza_liberada(indice)
+        self.filas = filas
+        self.columnas = columnas
+        self.registro = registro  # RegistroEstancias opcional (estancias completadas)
+        self.reloj = datetime.now  # se sustituye por un reloj simulado en simulaciones
+        self.plantilla = plantilla  # disposición compartida con otros parkings (ver GestorLotes)
+        if plantilla is not None:
+            self.filas, self.columnas = plantilla.filas, plantilla.columnas
+            self.aparcamientos = plantilla.crear_aparcamientos()
+            self._reconstruir_indices()
+        else:
+            self._crear_aparcamientos(filas, columnas, config_plazas or {})
+    
+    def _crear_aparcamientos(self, filas, columnas, config):
+        """Crea la estructura de aparcamientos"""
+        self.aparcamientos = PlantillaPlazas(filas, columnas, config, self.rng).crear_aparcamientos()
+        self._reconstruir_indices()
+    
+    def _reconstruir_indices(self):
+        """Recalcula las estructuras derivadas de self.aparcamientos.
+        
+        `_libres` guarda un byte por plaza: su máscara de tipo si está libre y 0
+        si está ocupada. Así "libre y compatible" es un AND con las capacidades
+        del coche, y se puede evaluar para todo el parking de una vez con
+        bytes.translate() (ver plazas_compatibles_libres).
+        """
+        if self.plantilla is not None:
+            self._indice = self.plantilla.indice
+        else:
+            self._indice = {a.id: i for i, a in enumerate(self.aparcamientos)}
+        self._matriculas = {a.coche.matricula: i for i, a in enumerate(self.aparcamientos) if a.ocupado}
+        self._libres = bytearray(0 if a.ocupado else a.mascara for a in self.aparcamientos)
+        self._totales_tipo = {tipo: 0 for tipo in TipoPlaza.MASCARAS}
+        self._ocupadas_tipo = {tipo: 0 for tipo in TipoPlaza.MASCARAS}
+        for aparcamiento in self.aparcamientos:
+            self._totales_tipo[aparcamiento.tipo] += 1
+            if aparcamiento.ocupado:
+                self._ocupadas_tipo[aparcamiento.tipo] += 1
+    
+    def _marcar_ocupada(self, indice):
+        self._libres[indice] = 0
+        self._matriculas[self.aparcamientos[indice].coche.matricula] = indice
+        self._ocupadas_tipo[self.aparcamientos[indice].tipo] += 1
+        self._sucias.add(indice)
+        self._cambios += 1
+        for observador in self._observadores:
+            observador.plaza_ocupada(indice)
+    
+    def _marcar_libre(self, indice, matricula):
+        self._libres[indice] = self.aparcamientos[indice].mascara
+        del self._matriculas[matricula]
+        self._ocupadas_tipo[self.aparcamientos[indice].tipo] -= 1
+        self._sucias.add(indice)
+        self._cambios += 1
+        for observador in self._observadores:
+            observador.plaza_liberada(indice)
+    
+    def suscribir(self, observador, al_suscribir=None):
+        """
+        Registra un observador de cambios de ocupación.
+        
+        Args:
+            observador: Objeto con plaza_ocupada(indice) y plaza_liberada(indice),
+                que se llaman con el cerrojo del parking tomado
+            al_suscribir: Función sin argumentos que se llama justo antes de
+                registrarlo, con el mismo cerrojo tomado: el observador lee ahí
+                el estado inicial sin que se le escape ningún cambio
+        """
+        with self._cerrojo:
+            if al_suscribir is not None:
+                al_suscribir()
+            self._observadores.append(observador)
+    
+    def desuscribir(self, observador):
+        with self._cerrojo:
+            self._observadores.remove(observador)
     
     # ========== INTERFAZ PÚBLICA ==========
     
-    def entrar(self, matricula=None, es_minusvalido=False, es_electrico=False):
+    def entrar(self, matricula=None, es_minusvalido=False, es_electrico=False, puerta=0):
         """
         Procesa la entrada de un vehículo al parking.
         
@@ -292,47 +949,48 @@ class Parking:
             matricula: Matrícula del vehículo (opcional, se genera si no se proporciona)
             es_minusvalido: Si el vehículo tiene tarjeta de minusválido
             es_electrico: Si el vehículo es eléctrico
+            puerta: Índice de la cabina por la que entra
         
         Returns:
             tuple: (éxito: bool, mensaje: str, plaza_id: str|None)
-        """
-        if matricula is None:
-            matricula = self.cabina.generar_matricula()
-            es_minusvalido, es_electrico = self.cabina.detectar_caracteristicas()
         
-        coche = Coche(matricula, es_minusvalido, es_electrico)
-        
-        # Buscar plaza adecuada
-        for _ in range(self.cabina.MAX_INTENTOS_BUSQUEDA):
-            aparcamiento = random.choice(self.aparcamientos)
-            
-            if aparcamiento.puede_ocupar(coche):
-                aparcamiento.ocupar(coche)
-                tipo_texto = self._get_tipo_vehiculo_texto(coche)
-                return True, f"Vehículo {matricula} ({tipo_texto}) estacionado", aparcamiento.id
-        
-        return False, f"No hay plazas disponibles para {matricula}", None
+        Raises:
+            TypeError: Si la matrícula no es un texto
+            ValueError: Si la matrícula está vacía
+        """
+        if matricula is not None:
+            if not isinstance(matricula, str):
+                raise TypeError(f"La matrícula debe ser un texto, no {type(matricula).__name__}")
+            if not matricula.strip():
+                raise ValueError("La matrícula está vacía")
+        cabina = self.cabinas[puerta]
+        inicio = time.perf_counter()
+        with self._cerrojo:
+            resultado = self._entrar(cabina, matricula, es_minusvalido, es_electrico)
+            cabina.registrar_entrada(resultado[0], time.perf_counter() - inicio)
+        return resultado
     
-    def salir(self, matricula):
+    def salir(self, matricula, puerta=0):
         """
         Procesa la salida de un vehículo del parking.
         
         Args:
             matricula: Matrícula del vehículo a salir
+            puerta: Índice de la cabina por la que sale (cobra con su tarifa)
         
         Returns:
             tuple: (éxito: bool, mensaje: str, tarifa: float)
         """
-        aparcamiento = self._buscar_por_matricula(matricula)
-        
-        if not aparcamiento:
-            return False, f"Vehículo {matricula} no encontrado", 0
-        
-        coche, tiempo = aparcamiento.liberar()
-        tarifa = self.cabina.calcular_tarifa(tiempo, coche, aparcamiento.tipo)
-        
-        segundos = tiempo.total_seconds() if tiempo else 0
-        return True, f"Tiempo: {segundos:.0f}s - Tarifa: {tarifa}€", tarifa
+        cabina = self.cabinas[puerta]
+        inicio = time.perf_counter()
+        with self._cerrojo:
+            exito, mensaje, tarifa, abandono_cola = self._salir(cabina, matricula)
+            cabina.registrar_salida(exito, tarifa, time.perf_counter() - inicio, abandono_cola)
+            resultado = exito, mensaje, tarifa
+        if self.registro is not None:
+            # Los bloques llenos del registro se escriben ya fuera del cerrojo
+            self.registro.volcar()
+        return resultado
     
     def listar_coches(self):
         """
@@ -341,19 +999,21 @@ class Parking:
         Returns:
             list: Lista de diccionarios con info de cada coche
         """
-        coches = []
-        for aparcamiento in self.aparcamientos:
-            if aparcamiento.ocupado:
-                tiempo = (datetime.now() - aparcamiento.timestamp_entrada).total_seconds()
-                coches.append({
-                    'matricula': aparcamiento.coche.matricula,
-                    'plaza': aparcamiento.id,
-                    'tipo_plaza': aparcamiento.tipo,
-                    'es_minusvalido': aparcamiento.coche.es_minusvalido,
-                    'es_electrico': aparcamiento.coche.es_electrico,
-                    'tiempo_segundos': round(tiempo, 1)
-                })
-        return coches
+        with self._cerrojo:
+            coches = []
+            ahora = self.reloj()
+            for aparcamiento in self.aparcamientos:
+                if aparcamiento.ocupado:
+                    tiempo = (ahora - aparcamiento.timestamp_entrada).total_seconds()
+                    coches.append({
+                        'matricula': aparcamiento.coche.matricula,
+                        'plaza': aparcamiento.id,
+                        'tipo_plaza': aparcamiento.tipo,
+                        'es_minusvalido': aparcamiento.coche.es_minusvalido,
+                        'es_electrico': aparcamiento.coche.es_electrico,
+                        'tiempo_segundos': round(tiempo, 1)
+                    })
+            return coches
     
     def plazas_libres(self, tipo=None):
         """
@@ -365,10 +1025,76 @@ class Parking:
         Returns:
             int: Número de plazas libres
         """
-        libres = [a for a in self.aparcamientos if not a.ocupado]
-        if tipo:
-            libres = [a for a in libres if a.tipo == tipo]
-        return len(libres)
+        with self._cerrojo:
+            if tipo:
+                return self._totales_tipo[tipo] - self._ocupadas_tipo[tipo]
+            return len(self._libres) - sum(self._ocupadas_tipo.values())
+    
+    def ocupacion(self, tipo):
+        """
+        Fracción ocupada de un tipo de plaza, en O(1).
+        
+        Args:
+            tipo: Tipo de plaza
+        
+        Returns:
+            float: Entre 0 y 1 (0 si no hay plazas de ese tipo)
+        """
+        total = self._totales_tipo[tipo]
+        return self._ocupadas_tipo[tipo] / total if total else 0.0
+    
+    def ocupacion_actual(self):
+        """
+        Foto consistente de la ocupación en O(1), para muestreos periódicos.
+        
+        Returns:
+            dict: instante (reloj del parking), ocupadas y totales por tipo de
+                plaza, y vehículos en cola
+        """
+        with self._cerrojo:
+            return {
+                'instante': self.reloj(),
+                'ocupadas': dict(self._ocupadas_tipo),
+                'totales': dict(self._totales_tipo),
+                'en_cola': len(self.cabina.cola)
+            }
+    
+    def instantanea_plazas(self):
+        """
+        Copia compacta y consistente de las plazas (para dibujarlas o
+        exportarlas en otro hilo o proceso sin tocar el parking).
+        
+        Returns:
+            dict: filas, columnas, mascaras (bytes, una por plaza), ocupadas
+                (bytes 0/1), matriculas ({índice: matrícula}) e instante (ISO 8601)
+        """
+        with self._cerrojo:
+            libres = bytes(self._libres)
+            aparcamientos = self.aparcamientos
+            return {
+                'filas': self.filas,
+                'columnas': self.columnas,
+                'mascaras': bytes(a.mascara for a in aparcamientos),
+                'ocupadas': bytes(0 if libre else 1 for libre in libres),
+                'matriculas': {i: aparcamientos[i].coche.matricula
+                               for i, libre in enumerate(libres) if not libre},
+                'instante': self.reloj().isoformat(timespec='seconds')
+            }
+    
+    def plazas_compatibles_libres(self, es_minusvalido=False, es_electrico=False):
+        """
+        Cuenta las plazas libres que podría ocupar un vehículo.
+        
+        Args:
+            es_minusvalido: Si el vehículo tiene tarjeta de minusválido
+            es_electrico: Si el vehículo es eléctrico
+        
+        Returns:
+            int: Número de plazas libres compatibles
+        """
+        with self._cerrojo:
+            capacidades = TipoPlaza.capacidades(es_minusvalido, es_electrico)
+            return self._libres.translate(_TABLAS_COMPATIBLES[capacidades]).count(1)
     
     def resumen(self):
         """
@@ -377,45 +1103,231 @@ class Parking:
         Returns:
             dict: Diccionario con información resumida
         """
-        total = len(self.aparcamientos)
-        ocupadas = sum(1 for a in self.aparcamientos if a.ocupado)
-        
-        por_tipo = {}
-        for tipo in [TipoPlaza.NORMAL, TipoPlaza.MINUSVALIDO, TipoPlaza.ELECTRICO]:
-            total_tipo = sum(1 for a in self.aparcamientos if a.tipo == tipo)
-            ocupadas_tipo = sum(1 for a in self.aparcamientos if a.tipo == tipo and a.ocupado)
-            por_tipo[tipo] = {
-                'total': total_tipo,
-                'ocupadas': ocupadas_tipo,
-                'libres': total_tipo - ocupadas_tipo
+        with self._cerrojo:
+            total = len(self.aparcamientos)
+            ocupadas = total - self.plazas_libres()
+            
+            por_tipo = {}
+            for tipo in [TipoPlaza.NORMAL, TipoPlaza.MINUSVALIDO, TipoPlaza.ELECTRICO]:
+                total_tipo = self._totales_tipo[tipo]
+                libres_tipo = self.plazas_libres(tipo)
+                por_tipo[tipo] = {
+                    'total': total_tipo,
+                    'ocupadas': total_tipo - libres_tipo,
+                    'libres': libres_tipo
+                }
+            
+            return {
+                'total_plazas': total,
+                'ocupadas': ocupadas,
+                'libres': total - ocupadas,
+                'ocupacion_porcentaje': (ocupadas / total * 100) if total > 0 else 0,
+                'por_tipo': por_tipo,
+                'en_cola': len(self.cabina.cola),
+                'cola': self.cabina.cola.metricas(self.reloj()),
+                'estrategia_tarifa': self.cabina.estrategia_tarifa.get_nombre()
             }
-        
-        return {
-            'total_plazas': total,
-            'ocupadas': ocupadas,
-            'libres': total - ocupadas,
-            'ocupacion_porcentaje': (ocupadas / total * 100) if total > 0 else 0,
-            'por_tipo': por_tipo,
-            'estrategia_tarifa': self.cabina.estrategia_tarifa.get_nombre()
-        }
     
-    def cambiar_tarifa(self, estrategia):
+    def cambiar_tarifa(self, estrategia, puerta=None):
         """
         Cambia la estrategia de tarificación.
         
         Args:
             estrategia: Nueva estrategia de tarifa
+            puerta: Índice de la cabina (None = todas)
+        """
+        with self._cerrojo:
+            cabinas = self.cabinas if puerta is None else [self.cabinas[puerta]]
+            for cabina in cabinas:
+                cabina.cambiar_estrategia_tarifa(estrategia)
+            estrategia.vincular(self)
+            self._cambios += 1
+    
+    def cambios_pendientes(self):
         """
-        self.cabina.cambiar_estrategia_tarifa(estrategia)
+        Cambios sin guardar.
+        
+        Returns:
+            tuple: (movimientos desde el último checkpoint,
+                    plazas modificadas desde el último snapshot completo)
+        """
+        return self._cambios, len(self._sucias)
+    
+    def marcar_guardado(self):
+        """
+        Da por guardados los movimientos pendientes (para quien persiste el
+        parking por su cuenta, como GestorLotes).
+        
+        Returns:
+            int: Movimientos que había pendientes, para devolverlos con
+                marcar_pendiente si el guardado falla
+        """
+        with self._cerrojo:
+            cambios, self._cambios = self._cambios, 0
+            return cambios
+    
+    def marcar_pendiente(self, cambios=1):
+        """Suma `cambios` movimientos pendientes de guardar"""
+        with self._cerrojo:
+            self._cambios += cambios
+    
+    def vehiculos_aparcados(self):
+        """Número de vehículos estacionados (O(1))"""
+        return len(self._matriculas)
+    
+    def metricas_puertas(self):
+        """
+        Métricas de cada cabina.
+        
+        Returns:
+            list: Un dict por puerta (entradas, rechazos, salidas, ingresos...)
+                con las métricas de su cola en 'cola' (todas las puertas
+                comparten la misma)
+        """
+        with self._cerrojo:
+            ahora = self.reloj()
+            metricas = []
+            for cabina in self.cabinas:
+                datos = cabina.metricas()
+                datos['cola'] = cabina.cola.metricas(ahora)
+                metricas.append(datos)
+            return metricas
+    
+    def procesar_lote(self, operaciones, espera_servicio=0):
+        """
+        Atiende un lote de operaciones con un trabajador por puerta.
+        
+        Cada puerta procesa sus operaciones en orden; entre puertas solo se
+        comparte el cerrojo del parking. `espera_servicio` simula el tiempo de
+        barrera de cada vehículo (ticket, lectura, pago), que transcurre fuera
+        del cerrojo y es lo que se solapa al añadir puertas.
+        
+        Args:
+            operaciones: Iterable de (puerta, 'entrar'|'salir', argumentos)
+            espera_servicio: Segundos de servicio simulados por operación
+        
+        Returns:
+            list: Resultados en el mismo orden que `operaciones`
+        """
+        operaciones = list(operaciones)
+        por_puerta = [[] for _ in self.cabinas]
+        for posicion, (puerta, operacion, argumentos) in enumerate(operaciones):
+            por_puerta[puerta].append((posicion, operacion, argumentos))
+        resultados = [None] * len(operaciones)
+        
+        def atender(puerta):
+            for posicion, operacion, argumentos in por_puerta[puerta]:
+                if espera_servicio:
+                    time.sleep(espera_servicio)
+                metodo = self.entrar if operacion == 'entrar' else self.salir
+                resultados[posicion] = metodo(*argumentos, puerta=puerta)
+        
+        with ThreadPoolExecutor(max_workers=len(self.cabinas)) as pool:
+            list(pool.map(atender, range(len(self.cabinas))))
+        return resultados
     
     # ========== MÉTODOS DE SOPORTE ==========
     
+    def _entrar(self, cabina, matricula, es_minusvalido, es_electrico):
+        """Entrada por `cabina` (con el cerrojo ya tomado)"""
+        if matricula is None:
+            # La serie puede repetir matrículas de un estado cargado de otra ejecución
+            matricula = cabina.generar_matricula()
+            while matricula in self._matriculas or matricula in cabina.cola:
+                matricula = cabina.generar_matricula()
+            es_minusvalido, es_electrico = cabina.detectar_caracteristicas()
+        elif matricula in self._matriculas or matricula in cabina.cola:
+            return False, f"El vehículo {matricula} ya está en el parking", None
+        
+        coche = Coche(matricula, es_minusvalido, es_electrico)
+        
+        # Solo puede ocupar directamente las plazas que no sirven a nadie de la
+        # cola: las demás son de quien llegó antes (FIFO)
+        cola = cabina.cola
+        capacidades = coche.capacidades & ~cola.capacidades_en_espera()
+        
+        # Buscar plaza adecuada: unos sondeos aleatorios reparten los coches por
+        # el parking; si fallan, recorrido completo para no encolar con plazas libres
+        indice = -1
+        if capacidades:
+            total = len(self.aparcamientos)
+            for _ in range(cabina.MAX_INTENTOS_BUSQUEDA):
+                candidato = self.rng.randrange(total)
+                if self._libres[candidato] & capacidades:
+                    indice = candidato
+                    break
+            else:
+                indice = self._libres.translate(_TABLAS_COMPATIBLES[capacidades]).find(1)
+        
+        if indice >= 0:
+            aparcamiento = self.aparcamientos[indice]
+            aparcamiento.ocupar(coche, self.reloj())
+            self._marcar_ocupada(indice)
+            tipo_texto = self._get_tipo_vehiculo_texto(coche)
+            return True, f"Vehículo {matricula} ({tipo_texto}) estacionado", aparcamiento.id
+        
+        # Sin plaza: esperar en la cola de la cabina si la hay
+        if cola.capacidad:
+            posicion = cola.encolar(coche, self.reloj())
+            if posicion is not None:
+                return False, f"Vehículo {matricula} en cola de espera (posición {posicion})", None
+            return False, f"Cola llena: el vehículo {matricula} se marcha", None
+        
+        return False, f"No hay plazas disponibles para {matricula}", None
+    
+    def _salir(self, cabina, matricula):
+        """Salida por `cabina` (con el cerrojo ya tomado).
+        
+        Devuelve además si era un vehículo de la cola que se marcha sin haber
+        entrado, que la cabina cuenta como abandono y no como salida.
+        """
+        aparcamiento = self._buscar_por_matricula(matricula)
+        
+        if not aparcamiento:
+            if cabina.cola.retirar(matricula, self.reloj()):
+                return True, f"Vehículo {matricula} abandona la cola sin entrar", 0, True
+            return False, f"Vehículo {matricula} no encontrado", 0, False
+        
+        entrada = aparcamiento.timestamp_entrada
+        coche, tiempo = aparcamiento.liberar(self.reloj())
+        indice = self._indice[aparcamiento.id]
+        self._marcar_libre(indice, coche.matricula)
+        salida = entrada + tiempo if entrada else None
+        tarifa = cabina.calcular_tarifa(tiempo, coche, aparcamiento.tipo, salida)
+        
+        if self.registro is not None and entrada:
+            self.registro.anotar(
+                coche.matricula, aparcamiento.id, aparcamiento.tipo,
+                coche.es_minusvalido, coche.es_electrico,
+                entrada, salida, tarifa, cabina.estrategia_tarifa.get_nombre()
+            )
+        
+        segundos = tiempo.total_seconds() if tiempo else 0
+        mensaje = f"Tiempo: {segundos:.0f}s - Tarifa: {tarifa}€"
+        
+        admitido = self._admitir_desde_cola(indice)
+        if admitido:
+            mensaje += f" | Entra {admitido.matricula} desde la cola"
+        return True, mensaje, tarifa, False
+    
+    def _admitir_desde_cola(self, indice):
+        """Ocupa la plaza recién liberada con el primer vehículo compatible de la cola"""
+        cola = self.cabina.cola
+        if not len(cola):
+            return None
+        
+        ahora = self.reloj()
+        aparcamiento = self.aparcamientos[indice]
+        coche = cola.admitir(aparcamiento.mascara, ahora)
+        if coche:
+            aparcamiento.ocupar(coche, ahora)
+            self._marcar_ocupada(indice)
+        return coche
+    
     def _buscar_por_matricula(self, matricula):
         """Busca un aparcamiento por matrícula del coche"""
-        for aparcamiento in self.aparcamientos:
-            if aparcamiento.ocupado and aparcamiento.coche.matricula == matricula:
-                return aparcamiento
-        return None
+        indice = self._matriculas.get(matricula)
+        return None if indice is None else self.aparcamientos[indice]
     
     def _get_tipo_vehiculo_texto(self, coche):
         """Retorna descripción del tipo de vehículo"""
@@ -428,46 +1340,419 @@ class Parking:
     
     # ========== PERSISTENCIA ==========
     
-    def guardar_estado(self, archivo='parking_estado.json'):
-        """Guarda el estado del parking en JSON"""
-        datos = {
-            'filas': self.filas,
-            'columnas': self.columnas,
-            'aparcamientos': [a.to_dict() for a in self.aparcamientos],
-            'estrategia_tarifa': self.cabina.estrategia_tarifa.get_nombre()
-        }
-        with open(archivo, 'w') as f:
-            json.dump(datos, f, indent=2)
+    def guardar_estado(self, archivo='parking_estado.json', compresion=None, version=VERSION_ESQUEMA):
+        """
+        Guarda el estado del parking en JSON.
+        
+        Args:
+            archivo: Ruta del snapshot
+            compresion: 'gzip', 'lzma', 'zlib' o None. Si es None se deduce de la
+                extensión (.gz, .xz/.lzma, .zz); si no hay, JSON plano.
+            version: Esquema del snapshot: 2 (columnas, por defecto) o 1 (un
+                objeto indentado por plaza, el formato antiguo)
+        """
+        if compresion is None:
+            compresion = EXTENSIONES_COMPRESION.get(os.path.splitext(archivo)[1])
+        
+        with self._cerrojo_guardado:
+            with self._cerrojo:
+                # La generación solo avanza si el snapshot llega a escribirse:
+                # los incrementales posteriores tienen que seguir enlazando
+                datos = {
+                    'filas': self.filas,
+                    'columnas': self.columnas,
+                    'estrategia_tarifa': self.cabina.estrategia_tarifa.get_nombre(),
+                    'puertas': [c.estrategia_tarifa.get_nombre() for c in self.cabinas],
+                    'generacion': self._generacion + 1
+                }
+                if version == 1:
+                    datos['aparcamientos'] = [a.to_dict() for a in self.aparcamientos]
+                else:
+                    datos['version'] = 2
+                    datos.update(_plazas_v2(self.aparcamientos))
+                sucias, self._sucias = self._sucias, set()
+                cambios, self._cambios = self._cambios, 0
+            try:
+                _escribir_atomico(datos, archivo, compresion, indentar=version == 1)
+            except BaseException:
+                with self._cerrojo:
+                    self._sucias |= sucias
+                    self._cambios += cambios
+                raise
+            self._generacion = datos['generacion']
+            self._archivo_base = archivo
+            
+            # El incremental anterior queda cubierto por el snapshot completo
+            if os.path.exists(archivo + SUFIJO_CAMBIOS):
+                os.remove(archivo + SUFIJO_CAMBIOS)
+    
+    def guardar_cambios(self, archivo='parking_estado.json'):
+        """
+        Checkpoint incremental con las plazas modificadas desde el último
+        guardar_estado, en `archivo` + SUFIJO_CAMBIOS.
+        
+        Cada incremental sustituye al anterior (es acumulativo) y cargar_estado
+        solo lo aplica si corresponde a la misma generación del snapshot. Si el
+        último snapshot completo se guardó en otro archivo, las plazas
+        modificadas se cuentan desde ese, así que se guarda uno completo.
+        
+        Returns:
+            int: Número de plazas escritas
+        """
+        with self._cerrojo_guardado:
+            if archivo != self._archivo_base:
+                self.guardar_estado(archivo)
+                return len(self.aparcamientos)
+            with self._cerrojo:
+                datos = {
+                    'generacion': self._generacion,
+                    'aparcamientos': [self.aparcamientos[i].to_dict() for i in sorted(self._sucias)],
+                    'puertas': [c.estrategia_tarifa.get_nombre() for c in self.cabinas]
+                }
+                cambios, self._cambios = self._cambios, 0
+            try:
+                _escribir_atomico(datos, archivo + SUFIJO_CAMBIOS, None)
+            except BaseException:
+                with self._cerrojo:
+                    self._cambios += cambios
+                raise
+        return len(datos['aparcamientos'])
+    
+    def exportar_ocupacion(self):
+        """
+        Estado del parking sin la disposición de las plazas, que depende solo
+        del tamaño o de la plantilla.
+        
+        Returns:
+            dict: 'ocupadas' (registros del esquema v2) y 'puertas' (tarifa de cada cabina)
+        """
+        with self._cerrojo:
+            return {
+                'ocupadas': _ocupadas_v2(self.aparcamientos),
+                'puertas': [c.estrategia_tarifa.get_nombre() for c in self.cabinas]
+            }
+    
+    def importar_ocupacion(self, datos):
+        """
+        Restaura lo exportado con exportar_ocupacion en un parking vacío con la
+        misma disposición. Queda sin movimientos pendientes de guardar.
+        """
+        with self._cerrojo:
+            _aplicar_ocupadas_v2(self.aparcamientos, datos['ocupadas'])
+            self._reconstruir_indices()
+            for puerta, nombre in enumerate(datos['puertas'][:len(self.cabinas)]):
+                self.cambiar_tarifa(crear_estrategia(nombre), puerta)
+            self._cambios = 0
     
     @staticmethod
-    def cargar_estado(archivo='parking_estado.json'):
-        """Carga el estado del parking desde JSON"""
+    def cargar_estado(archivo='parking_estado.json', semilla=None):
+        """Carga el estado del parking desde JSON (plano o comprimido, esquema v1 o v2)"""
         try:
-            with open(archivo, 'r') as f:
-                datos = json.load(f)
+            datos = _leer_json(archivo)
             
-            parking = Parking(datos['filas'], datos['columnas'])
-            parking.aparcamientos = [Aparcamiento.from_dict(a) for a in datos['aparcamientos']]
+            # Los snapshots anteriores a las puertas solo guardan una estrategia
+            puertas = datos.get('puertas') or [datos.get('estrategia_tarifa', 'Estándar')]
+            generacion = datos.get('generacion', 0)
             
-            # Restaurar estrategia de tarifa
-            nombre_estrategia = datos.get('estrategia_tarifa', 'Estándar')
-            if nombre_estrategia == 'Por Tramos':
-                parking.cambiar_tarifa(TarifaPorTramos())
-            elif nombre_estrategia == 'Diferenciada':
-                parking.cambiar_tarifa(TarifaDiferenciada())
+            # Checkpoint incremental posterior al snapshot, si lo hay
+            cambios = None
+            if os.path.exists(archivo + SUFIJO_CAMBIOS):
+                cambios = _leer_json(archivo + SUFIJO_CAMBIOS)
+                if cambios.get('generacion') == generacion:
+                    puertas = cambios['puertas']
+                else:
+                    cambios = None
+            
+            parking = Parking(datos['filas'], datos['columnas'], num_cabinas=len(puertas), semilla=semilla)
+            parking.aparcamientos = _leer_aparcamientos(datos)
+            parking._generacion = generacion
+            parking._archivo_base = archivo
+            if cambios:
+                indice = {a.id: i for i, a in enumerate(parking.aparcamientos)}
+                for plaza in cambios['aparcamientos']:
+                    i = indice[plaza['id']]
+                    parking.aparcamientos[i] = Aparcamiento.from_dict(plaza)
+                    parking._sucias.add(i)
+            parking._reconstruir_indices()
+            
+            # Restaurar estrategia de tarifa de cada puerta
+            for puerta, nombre in enumerate(puertas):
+                parking.cambiar_tarifa(crear_estrategia(nombre), puerta)
             
             return parking
         except FileNotFoundError:
             return None
 
+# ========================= AUTOGUARDADO =========================
+
+class AutoGuardado:
+    """Guarda el parking en segundo plano mientras haya cambios.
+    
+    Cada `intervalo` segundos, o en cuanto se acumulan `umbral_cambios`
+    movimientos, escribe un checkpoint incremental con las plazas modificadas.
+    Cada `completo_cada` incrementales, o cuando ya cubren la mitad del
+    parking, escribe un snapshot completo. Con cada snapshot completo, y al
+    detenerse, también guarda el registro de estancias del parking si lo tiene.
+    """
+    def __init__(self, parking, archivo='parking_estado.json', intervalo=30,
+                 umbral_cambios=50, completo_cada=10):
+        self.parking = parking
+        self.archivo = archivo
+        self.intervalo = intervalo
+        self.umbral_cambios = umbral_cambios
+        self.completo_cada = completo_cada
+        self.checkpoints = 0
+        self.ultimo_error = None
+        self._incrementales = 0
+        self._parar = Event()
+        self._hilo = None
+    
+    def iniciar(self):
+        """Arranca el hilo de autoguardado"""
+        self._hilo = Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+        return self
+    
+    def detener(self, guardar=True):
+        """Para el hilo y, si se pide, deja un snapshot completo"""
+        self._parar.set()
+        if self._hilo:
+            self._hilo.join()
+        if guardar:
+            self.parking.guardar_estado(self.archivo)
+            if self.parking.registro is not None:
+                self.parking.registro.guardar()
+    
+    def _bucle(self):
+        ultimo = time.monotonic()
+        while not self._parar.wait(min(1, self.intervalo)):
+            cambios, _ = self.parking.cambios_pendientes()
+            if cambios >= self.umbral_cambios or (cambios and time.monotonic() - ultimo >= self.intervalo):
+                self.guardar()
+                ultimo = time.monotonic()
+    
+    def guardar(self):
+        """Escribe un checkpoint (incremental o completo)"""
+        _, sucias = self.parking.cambios_pendientes()
+        completo = (self._incrementales >= self.completo_cada
+                    or sucias * 2 >= len(self.parking.aparcamientos)
+                    or not os.path.exists(self.archivo))
+        try:
+            if completo:
+                self.parking.guardar_estado(self.archivo)
+                if self.parking.registro is not None:
+                    self.parking.registro.guardar()
+                self._incrementales = 0
+            else:
+                self.parking.guardar_cambios(self.archivo)
+                self._incrementales += 1
+            self.checkpoints += 1
+            self.ultimo_error = None
+        except Exception as e:
+            # Se reintenta en el siguiente ciclo: los cambios siguen pendientes.
+            # Cualquier fallo (disco, serialización...) se registra sin parar el hilo
+            self.ultimo_error = e
+            logging.getLogger(__name__).error("Fallo en el autoguardado de %s", self.archivo, exc_info=True)
+
+# ========================= ALERTAS DE ESTANCIA =========================
+
+class RuedaTemporizadores:
+    """Rueda de temporizadores (hashed timing wheel).
+    
+    El tiempo se divide en ticks de `resolucion` segundos y cada temporizador
+    va a la ranura tick % ranuras; los que vencen en vueltas posteriores se
+    quedan en su ranura hasta entonces. Programar y cancelar son O(1) y avanzar
+    solo recorre las ranuras de los ticks transcurridos, así que el coste por
+    temporizador es O(1) amortizado. Cancelar solo lo marca; se retira al pasar
+    por su ranura.
+    """
+    def __init__(self, resolucion=1.0, ranuras=1024, inicio=0.0):
+        self.resolucion = resolucion
+        self._ranuras = [[] for _ in range(ranuras)]
+        self._tick = int(inicio // resolucion)
+        self._activos = {}  # clave -> [tick, clave, datos, activo]
+    
+    def __len__(self):
+        return len(self._activos)
+    
+    def __contains__(self, clave):
+        return clave in self._activos
+    
+    def programar(self, clave, instante, datos=None):
+        """Programa (o reprograma) `clave` para el instante (epoch) dado"""
+        self.cancelar(clave)
+        tick = max(math.ceil(instante / self.resolucion), self._tick + 1)
+        entrada = [tick, clave, datos, True]
+        self._activos[clave] = entrada
+        self._ranuras[tick % len(self._ranuras)].append(entrada)
+    
+    def cancelar(self, clave):
+        entrada = self._activos.pop(clave, None)
+        if entrada:
+            entrada[3] = False
+    
+    def avanzar(self, instante):
+        """
+        Avanza la rueda hasta `instante` (epoch).
+        
+        Returns:
+            list: (clave, datos) de los temporizadores vencidos, por orden
+        """
+        objetivo = int(instante // self.resolucion)
+        if objetivo <= self._tick:
+            return []
+        
+        n = len(self._ranuras)
+        vencidos = []
+        # Con un salto de más de una vuelta basta con recorrer cada ranura una vez
+        ticks = range(self._tick + 1, objetivo + 1) if objetivo - self._tick < n else range(n)
+        for tick in ticks:
+            ranura = self._ranuras[tick % n]
+            quedan = []
+            for entrada in ranura:
+                if not entrada[3]:
+                    continue
+                if entrada[0] <= objetivo:
+                    vencidos.append(entrada)
+                else:
+                    quedan.append(entrada)
+            self._ranuras[tick % n] = quedan
+        self._tick = objetivo
+        
+        vencidos.sort(key=lambda e: e[0])
+        for entrada in vencidos:
+            del self._activos[entrada[1]]
+        return [(entrada[1], entrada[2]) for entrada in vencidos]
+
+class VigilanteEstancias:
+    """Avisa de estancias demasiado largas y de cargas eléctricas terminadas.
+    
+    Se suscribe a los ganchos del Parking: al ocupar una plaza programa el
+    aviso de exceso de estancia (y, si es un eléctrico en plaza de carga, el de
+    fin de la ventana de carga) y al liberarla los cancela. comprobar() avanza
+    la rueda con el reloj del parking y entrega cada evento a los callbacks.
+    """
+    EXCESO = 'exceso_estancia'
+    FIN_CARGA = 'fin_carga'
+    
+    def __init__(self, parking, estancia_maxima=timedelta(hours=4),
+                 ventana_carga=timedelta(hours=2), resolucion=1.0):
+        self.parking = parking
+        self.estancia_maxima = estancia_maxima.total_seconds()
+        self.ventana_carga = ventana_carga.total_seconds()
+        self.rueda = RuedaTemporizadores(resolucion, inicio=parking.reloj().timestamp())
+        self._callbacks = []
+        self._parar = Event()
+        self._hilo = None
+        parking.suscribir(self, al_suscribir=self._programar_ocupadas)
+    
+    def _programar_ocupadas(self):
+        for indice, aparcamiento in enumerate(self.parking.aparcamientos):
+            if aparcamiento.ocupado:
+                self.plaza_ocupada(indice)
+    
+    def suscribir(self, callback):
+        """Registra callback(evento); evento es un dict con tipo, matricula, plaza, entrada y vence"""
+        self._callbacks.append(callback)
+    
+    # Ganchos de Parking (se llaman con su cerrojo tomado)
+    
+    def plaza_ocupada(self, indice):
+        aparcamiento = self.parking.aparcamientos[indice]
+        if aparcamiento.timestamp_entrada is None:
+            return
+        entrada = aparcamiento.timestamp_entrada.timestamp()
+        self.rueda.programar((indice, self.EXCESO), entrada + self.estancia_maxima,
+                             aparcamiento.coche.matricula)
+        if aparcamiento.tipo == TipoPlaza.ELECTRICO and aparcamiento.coche.es_electrico:
+            self.rueda.programar((indice, self.FIN_CARGA), entrada + self.ventana_carga,
+                                 aparcamiento.coche.matricula)
+    
+    def plaza_liberada(self, indice):
+        self.rueda.cancelar((indice, self.EXCESO))
+        self.rueda.cancelar((indice, self.FIN_CARGA))
+    
+    def comprobar(self):
+        """
+        Entrega los eventos vencidos hasta ahora (reloj del parking).
+        
+        Returns:
+            list: Eventos entregados
+        """
+        with self.parking._cerrojo:
+            eventos = []
+            for (indice, tipo), matricula in self.rueda.avanzar(self.parking.reloj().timestamp()):
+                aparcamiento = self.parking.aparcamientos[indice]
+                limite = self.estancia_maxima if tipo == self.EXCESO else self.ventana_carga
+                eventos.append({
+                    'tipo': tipo,
+                    'matricula': matricula,
+                    'plaza': aparcamiento.id,
+                    'entrada': aparcamiento.timestamp_entrada,
+                    'vence': aparcamiento.timestamp_entrada + timedelta(seconds=limite)
+                })
+        
+        # Los callbacks se llaman sin el cerrojo: pueden usar el parking
+        for evento in eventos:
+            for callback in self._callbacks:
+                callback(evento)
+        return eventos
+    
+    def iniciar(self, intervalo=1.0):
+        """Comprueba en un hilo cada `intervalo` segundos"""
+        def bucle():
+            while not self._parar.wait(intervalo):
+                self.comprobar()
+        
+        self._hilo = Thread(target=bucle, daemon=True)
+        self._hilo.start()
+        return self
+    
+    def detener(self):
+        self._parar.set()
+        if self._hilo:
+            self._hilo.join()
+        self.parking.desuscribir(self)
+
 # ========================= INTERFAZ GRÁFICA =========================
 
+# Colores de las plazas (también los usa exportar_mapa, que no carga la interfaz)
+COLORES_TIPO = {
+    TipoPlaza.NORMAL: '#2ecc71',
+    TipoPlaza.MINUSVALIDO: '#3498db',
+    TipoPlaza.ELECTRICO: '#f1c40f'
+}
+COLOR_OCUPADA = '#e74c3c'
+
 class InterfazParking:
     """Interfaz gráfica mejorada del parking"""
+    # Geometría de una plaza con zoom 1
+    ANCHO_PLAZA = 90
+    ALTO_PLAZA = 65
+    ESPACIO = 8
+    MARGEN = 50
+    ALTO_CABINA = 150
+    
+    # Nivel de detalle según el ancho en pantalla de una plaza (px)
+    MIN_DETALLE = 70   # por encima: identificador, matrícula y símbolos
+    MIN_PLAZA = 12     # por encima: un rectángulo por plaza; por debajo: mapa de calor
+    ZOOM_MIN = 0.01
+    ZOOM_MAX = 2.0
+    
+    COLORES_TIPO = COLORES_TIPO
+    COLOR_OCUPADA = COLOR_OCUPADA
+    SIMBOLOS_TIPO = {
+        TipoPlaza.NORMAL: '',
+        TipoPlaza.MINUSVALIDO: '♿',
+        TipoPlaza.ELECTRICO: '⚡'
+    }
     
     def __init__(self, parking):
         self.parking = parking
         self.automatico = False
+        self.rng = random.Random(parking.rng.getrandbits(64))  # para el proceso automático
+        self.zoom = None  # se ajusta al tamaño de la ventana en el primer dibujo
+        self._dibujo_pendiente = False
         
         self.ventana = tk.Tk()
         self.ventana.title("Sistema de Parking Inteligente")
@@ -476,6 +1761,16 @@ class InterfazParking:
         
         self._crear_interfaz()
         
+        # Autoguardado en segundo plano
+        self.autoguardado = AutoGuardado(parking).iniciar()
+        
+        # Avisos de exceso de estancia y fin de carga
+        self.alertas = 0
+        self.vigilante = VigilanteEstancias(parking)
+        self.vigilante.suscribir(lambda evento: self.ventana.after(0, self._mostrar_alerta, evento))
+        self.vigilante.iniciar()
+        self.ventana.protocol("WM_DELETE_WINDOW", self.cerrar)
+        
         # Hilo automático
         self.hilo_automatico = Thread(target=self.proceso_automatico, daemon=True)
         self.hilo_automatico.start()
@@ -522,19 +1817,39 @@ class InterfazParking:
         
         self.label_info = tk.Label(frame_info, text="", font=('Arial', 11), 
                                    bg='#ecf0f1', fg='#2c3e50')
-        self.label_info.pack(pady=10)
+        self.label_info.pack(pady=(10, 0))
         
-        # Canvas para el parking
-        self.canvas = tk.Canvas(self.ventana, bg='white', highlightthickness=2, 
+        self.label_alertas = tk.Label(frame_info, text="", font=('Arial', 10, 'bold'),
+                                      bg='#ecf0f1', fg='#c0392b')
+        self.label_alertas.pack(pady=(0, 5))
+        
+        # Canvas para el parking, con desplazamiento y zoom
+        frame_canvas = tk.Frame(self.ventana)
+        frame_canvas.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        self.canvas = tk.Canvas(frame_canvas, bg='white', highlightthickness=2, 
                                highlightbackground='#bdc3c7')
-        self.canvas.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        barra_x = tk.Scrollbar(frame_canvas, orient=tk.HORIZONTAL, command=self._desplazar_x)
+        barra_y = tk.Scrollbar(frame_canvas, orient=tk.VERTICAL, command=self._desplazar_y)
+        self.canvas.configure(xscrollcommand=barra_x.set, yscrollcommand=barra_y.set)
+        barra_x.pack(side=tk.BOTTOM, fill=tk.X)
+        barra_y.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        # Rueda: desplazar (Mayús = horizontal, Ctrl = zoom); arrastrar: mover
+        self.canvas.bind('<MouseWheel>', self._rueda)
+        self.canvas.bind('<Button-4>', self._rueda)
+        self.canvas.bind('<Button-5>', self._rueda)
+        self.canvas.bind('<ButtonPress-1>', lambda e: self.canvas.scan_mark(e.x, e.y))
+        self.canvas.bind('<B1-Motion>', self._arrastrar)
+        self.canvas.bind('<Configure>', lambda e: self._programar_dibujo())
+        self.ventana.bind('<plus>', lambda e: self._cambiar_zoom(1.25))
+        self.ventana.bind('<minus>', lambda e: self._cambiar_zoom(0.8))
         
         self.actualizar_vista()
     
     def actualizar_vista(self):
         """Actualiza la visualización del parking"""
-        self.canvas.delete("all")
-        
         resumen = self.parking.resumen()
         
         # Información superior
@@ -544,74 +1859,170 @@ class InterfazParking:
                      f"Libres: Normal({resumen['por_tipo'][TipoPlaza.NORMAL]['libres']}) "
                      f"PMR({resumen['por_tipo'][TipoPlaza.MINUSVALIDO]['libres']}) "
                      f"EV({resumen['por_tipo'][TipoPlaza.ELECTRICO]['libres']})")
+        if self.parking.cabina.cola.capacidad:
+            info_texto += f" | En cola: {resumen['en_cola']}"
         
         self.label_info.config(text=info_texto)
+        self._dibujar_mapa()
+    
+    # ========== MAPA (ZOOM Y NIVEL DE DETALLE) ==========
+    
+    def _paso(self):
+        """Distancia entre plazas consecutivas con el zoom actual"""
+        return (self.ANCHO_PLAZA + self.ESPACIO) * self.zoom, (self.ALTO_PLAZA + self.ESPACIO) * self.zoom
+    
+    def _tamano_mundo(self):
+        """Tamaño del parking completo con zoom 1"""
+        ancho = 2 * self.MARGEN + self.parking.columnas * (self.ANCHO_PLAZA + self.ESPACIO)
+        alto = self.MARGEN + self.parking.filas * (self.ALTO_PLAZA + self.ESPACIO) + self.ALTO_CABINA
+        return ancho, alto
+    
+    def _ajustar_zoom(self):
+        """Zoom inicial: el parking entero si cabe con zoom <= 1"""
+        ancho, alto = self._tamano_mundo()
+        ancho_canvas = max(self.canvas.winfo_width(), 100)
+        alto_canvas = max(self.canvas.winfo_height(), 100)
+        self.zoom = max(self.ZOOM_MIN, min(1.0, ancho_canvas / ancho, alto_canvas / alto))
+    
+    def _programar_dibujo(self):
+        """Agrupa varios redibujados seguidos (scroll, redimensionado) en uno"""
+        if not self._dibujo_pendiente:
+            self._dibujo_pendiente = True
+            self.ventana.after_idle(self._dibujar_mapa)
+    
+    def _desplazar_x(self, *argumentos):
+        self.canvas.xview(*argumentos)
+        self._programar_dibujo()
+    
+    def _desplazar_y(self, *argumentos):
+        self.canvas.yview(*argumentos)
+        self._programar_dibujo()
+    
+    def _arrastrar(self, evento):
+        self.canvas.scan_dragto(evento.x, evento.y, gain=1)
+        self._programar_dibujo()
+    
+    def _rueda(self, evento):
+        arriba = evento.num == 4 or getattr(evento, 'delta', 0) > 0
+        if evento.state & 0x0004:      # Ctrl
+            self._cambiar_zoom(1.25 if arriba else 0.8, evento.x, evento.y)
+        elif evento.state & 0x0001:    # Mayús
+            self._desplazar_x('scroll', -3 if arriba else 3, 'units')
+        else:
+            self._desplazar_y('scroll', -3 if arriba else 3, 'units')
+    
+    def _cambiar_zoom(self, factor, x=None, y=None):
+        """Cambia el zoom manteniendo fijo el punto bajo el cursor (o el centro)"""
+        if self.zoom is None:
+            return
+        x = self.canvas.winfo_width() / 2 if x is None else x
+        y = self.canvas.winfo_height() / 2 if y is None else y
+        mundo_x = self.canvas.canvasx(x) / self.zoom
+        mundo_y = self.canvas.canvasy(y) / self.zoom
+        
+        self.zoom = min(self.ZOOM_MAX, max(self.ZOOM_MIN, self.zoom * factor))
+        ancho, alto = self._tamano_mundo()
+        self.canvas.configure(scrollregion=(0, 0, ancho * self.zoom, alto * self.zoom))
+        self.canvas.xview_moveto((mundo_x * self.zoom - x) / (ancho * self.zoom))
+        self.canvas.yview_moveto((mundo_y * self.zoom - y) / (alto * self.zoom))
+        self._dibujar_mapa()
+    
+    def _rango_visible(self):
+        """Filas y columnas (índices) que caen dentro de la ventana"""
+        paso_x, paso_y = self._paso()
+        margen = self.MARGEN * self.zoom
+        x0 = self.canvas.canvasx(0)
+        y0 = self.canvas.canvasy(0)
+        x1 = self.canvas.canvasx(self.canvas.winfo_width())
+        y1 = self.canvas.canvasy(self.canvas.winfo_height())
+        
+        filas, columnas = self.parking.filas, self.parking.columnas
+        col_ini = max(0, int((x0 - margen) // paso_x))
+        col_fin = min(columnas, int((x1 - margen) // paso_x) + 1)
+        # La fila 0 (A) se dibuja abajo, junto a la cabina
+        visual_ini = min(filas, max(0, int((y0 - margen) // paso_y)))
+        visual_fin = max(visual_ini, min(filas, int((y1 - margen) // paso_y) + 1))
+        return filas - visual_fin, filas - visual_ini, col_ini, col_fin
+    
+    def _posicion(self, fila, columna):
+        """Esquina superior izquierda de la plaza (fila, columna) en el canvas"""
+        paso_x, paso_y = self._paso()
+        margen = self.MARGEN * self.zoom
+        return margen + columna * paso_x, margen + (self.parking.filas - 1 - fila) * paso_y
+    
+    def _dibujar_mapa(self):
+        """Dibuja solo la parte visible, con el nivel de detalle que permite el zoom.
         
-        # Configuración visual
-        ancho_plaza = 90
-        alto_plaza = 65
-        margen_x = 50
-        espacio_x = 8
-        espacio_y = 8
-        
-        # Organizar plazas
-        filas_dict = {}
-        for aparcamiento in self.parking.aparcamientos:
-            if aparcamiento.fila not in filas_dict:
-                filas_dict[aparcamiento.fila] = []
-            filas_dict[aparcamiento.fila].append(aparcamiento)
-        
-        filas_ordenadas = sorted(filas_dict.keys())
-        for fila in filas_ordenadas:
-            filas_dict[fila].sort(key=lambda a: a.columna)
-        
-        # Dibujar desde abajo
-        canvas_height = self.canvas.winfo_height() or 700
-        y_inicial = canvas_height - 150
-        
-        colores_tipo = {
-            TipoPlaza.NORMAL: '#2ecc71',
-            TipoPlaza.MINUSVALIDO: '#3498db',
-            TipoPlaza.ELECTRICO: '#f1c40f'
-        }
+        Las plazas están en self.parking.aparcamientos por filas, así que la
+        plaza (fila, columna) es la de índice fila * columnas + columna.
+        """
+        self._dibujo_pendiente = False
+        if self.zoom is None:
+            self.ventana.update_idletasks()
+            self._ajustar_zoom()
         
-        simbolos_tipo = {
-            TipoPlaza.NORMAL: '',
-            TipoPlaza.MINUSVALIDO: '♿',
-            TipoPlaza.ELECTRICO: '⚡'
-        }
+        ancho, alto = self._tamano_mundo()
+        self.canvas.configure(scrollregion=(0, 0, ancho * self.zoom, alto * self.zoom))
+        self.canvas.delete("all")
         
-        for idx, fila in enumerate(reversed(filas_ordenadas)):
-            y_actual = y_inicial - ((idx + 1) * (alto_plaza + espacio_y))
-            x_actual = margen_x
-            
-            for aparcamiento in filas_dict[fila]:
+        ancho_plaza = (self.ANCHO_PLAZA + self.ESPACIO) * self.zoom
+        with self.parking._cerrojo:
+            rango = self._rango_visible()
+            if ancho_plaza >= self.MIN_DETALLE:
+                self._dibujar_plazas(*rango, detalle=True)
+            elif ancho_plaza >= self.MIN_PLAZA:
+                self._dibujar_plazas(*rango, detalle=False)
+            else:
+                self._dibujar_calor(*rango, lado=self._lado_bloque(ancho_plaza))
+        self._dibujar_cabina()
+    
+    def _lado_bloque(self, ancho_plaza):
+        """Plazas por lado de cada casilla del mapa de calor (potencia de 2)"""
+        lado = 1
+        while lado * ancho_plaza < self.MIN_PLAZA:
+            lado *= 2
+        return lado
+    
+    def _dibujar_plazas(self, fila_ini, fila_fin, col_ini, col_fin, detalle):
+        """Un rectángulo por plaza visible; con detalle, también textos y símbolos"""
+        aparcamientos = self.parking.aparcamientos
+        columnas = self.parking.columnas
+        ancho = self.ANCHO_PLAZA * self.zoom
+        alto = self.ALTO_PLAZA * self.zoom
+        escala = min(self.zoom, 1.0)
+        
+        for fila in range(fila_ini, fila_fin):
+            for columna in range(col_ini, col_fin):
+                aparcamiento = aparcamientos[fila * columnas + columna]
+                x, y = self._posicion(fila, columna)
+                
                 # Color según estado
                 if aparcamiento.ocupado:
-                    color = '#e74c3c'
+                    color = self.COLOR_OCUPADA
                 else:
-                    color = colores_tipo[aparcamiento.tipo]
+                    color = self.COLORES_TIPO[aparcamiento.tipo]
                 
                 # Dibujar plaza
                 self.canvas.create_rectangle(
-                    x_actual, y_actual,
-                    x_actual + ancho_plaza, y_actual + alto_plaza,
-                    fill=color, outline='#34495e', width=2
+                    x, y, x + ancho, y + alto,
+                    fill=color, outline='#34495e', width=2 if detalle else 1
                 )
+                if not detalle:
+                    continue
                 
                 # ID
                 self.canvas.create_text(
-                    x_actual + ancho_plaza/2, y_actual + 15,
-                    text=aparcamiento.id, font=('Arial', 10, 'bold'),
+                    x + ancho/2, y + 15 * self.zoom,
+                    text=aparcamiento.id, font=('Arial', max(6, int(10 * escala)), 'bold'),
                     fill='white' if aparcamiento.ocupado else 'black'
                 )
                 
                 # Matrícula o símbolo
                 if aparcamiento.ocupado:
                     self.canvas.create_text(
-                        x_actual + ancho_plaza/2, y_actual + 35,
+                        x + ancho/2, y + 35 * self.zoom,
                         text=aparcamiento.coche.matricula, 
-                        font=('Arial', 8), fill='white'
+                        font=('Arial', max(6, int(8 * escala))), fill='white'
                     )
                     # Indicadores
                     indicadores = []
@@ -621,33 +2032,66 @@ class InterfazParking:
                         indicadores.append('⚡')
                     if indicadores:
                         self.canvas.create_text(
-                            x_actual + ancho_plaza/2, y_actual + 52,
-                            text=' '.join(indicadores), font=('Arial', 10),
+                            x + ancho/2, y + 52 * self.zoom,
+                            text=' '.join(indicadores), font=('Arial', max(6, int(10 * escala))),
                             fill='white'
                         )
                 else:
-                    simbolo = simbolos_tipo[aparcamiento.tipo]
+                    simbolo = self.SIMBOLOS_TIPO[aparcamiento.tipo]
                     if simbolo:
                         self.canvas.create_text(
-                            x_actual + ancho_plaza/2, y_actual + 45,
-                            text=simbolo, font=('Arial', 16)
+                            x + ancho/2, y + 45 * self.zoom,
+                            text=simbolo, font=('Arial', max(6, int(16 * escala)))
                         )
+    
+    def _dibujar_calor(self, fila_ini, fila_fin, col_ini, col_fin, lado):
+        """Casillas de lado x lado plazas coloreadas por su ocupación"""
+        libres = self.parking._libres  # 0 = ocupada
+        columnas = self.parking.columnas
+        paso_x, paso_y = self._paso()
+        
+        # Alinear a la rejilla de bloques para que no "bailen" al desplazarse
+        fila_ini -= fila_ini % lado
+        col_ini -= col_ini % lado
+        for fila in range(fila_ini, fila_fin, lado):
+            filas_bloque = range(fila, min(fila + lado, self.parking.filas))
+            for columna in range(col_ini, col_fin, lado):
+                col_hasta = min(columna + lado, columnas)
+                ocupadas = sum(
+                    libres[f * columnas + columna:f * columnas + col_hasta].count(0)
+                    for f in filas_bloque
+                )
+                fraccion = ocupadas / (len(filas_bloque) * (col_hasta - columna))
                 
-                x_actual += ancho_plaza + espacio_x
-        
-        # Cabina
-        total_ancho = self.parking.columnas * (ancho_plaza + espacio_x)
-        cabina_x = margen_x + (total_ancho / 2) - 60
-        cabina_y = y_inicial + 30
+                x, _ = self._posicion(fila, columna)
+                _, y = self._posicion(filas_bloque[-1], columna)
+                self.canvas.create_rectangle(
+                    x, y, x + (col_hasta - columna) * paso_x, y + len(filas_bloque) * paso_y,
+                    fill=self._color_calor(fraccion), outline=''
+                )
+    
+    @staticmethod
+    def _color_calor(fraccion):
+        """Verde (vacío) -> rojo (lleno)"""
+        verde, rojo = (0x2e, 0xcc, 0x71), (0xe7, 0x4c, 0x3c)
+        r, g, b = (int(v + (w - v) * fraccion) for v, w in zip(verde, rojo))
+        return f'#{r:02x}{g:02x}{b:02x}'
+    
+    def _dibujar_cabina(self):
+        paso_x, paso_y = self._paso()
+        total_ancho = self.parking.columnas * paso_x
+        cabina_x = self.MARGEN * self.zoom + (total_ancho / 2) - 60 * self.zoom
+        cabina_y = self.MARGEN * self.zoom + self.parking.filas * paso_y + 30 * self.zoom
         
         self.canvas.create_rectangle(
-            cabina_x, cabina_y, cabina_x + 120, cabina_y + 60,
+            cabina_x, cabina_y, cabina_x + 120 * self.zoom, cabina_y + 60 * self.zoom,
             fill='#f39c12', outline='#34495e', width=3
         )
-        self.canvas.create_text(
-            cabina_x + 60, cabina_y + 30,
-            text="🎫 CABINA", font=('Arial', 12, 'bold'), fill='white'
-        )
+        if self.zoom >= 0.5:
+            self.canvas.create_text(
+                cabina_x + 60 * self.zoom, cabina_y + 30 * self.zoom,
+                text="🎫 CABINA", font=('Arial', 12, 'bold'), fill='white'
+            )
     
     def entrada_automatica(self):
         """Entrada con matrícula generada automáticamente"""
@@ -818,7 +2262,7 @@ class InterfazParking:
         """Permite cambiar la estrategia de tarificación"""
         ventana = tk.Toplevel(self.ventana)
         ventana.title("Cambiar Estrategia de Tarifa")
-        ventana.geometry("400x300")
+        ventana.geometry("400x360")
         ventana.configure(bg='#ecf0f1')
         
         tk.Label(ventana, text="Selecciona estrategia de tarifa:", 
@@ -832,7 +2276,9 @@ class InterfazParking:
             ('Por Tramos', TarifaPorTramos(), 
              'Más cara en horas punta (8-20h)'),
             ('Diferenciada', TarifaDiferenciada(), 
-             '50% desc. PMR, +2€ carga eléctrica')
+             '50% desc. PMR, +2€ carga eléctrica'),
+            ('Dinámica', TarifaDinamica(), 
+             'Sube con la ocupación de cada tipo de plaza')
         ]
         
         for nombre, estrategia, descripcion in estrategias:
@@ -873,17 +2319,17 @@ class InterfazParking:
         while True:
             if self.automatico:
                 # Entrada aleatoria
-                if random.random() < 0.6:
+                if self.rng.random() < 0.6:
                     self.parking.entrar()
                     self.ventana.after(0, self.actualizar_vista)
                 
-                time.sleep(random.uniform(2, 5))
+                time.sleep(self.rng.uniform(2, 5))
                 
                 # Salida aleatoria
-                if random.random() < 0.4 and self.automatico:
+                if self.rng.random() < 0.4 and self.automatico:
                     coches = self.parking.listar_coches()
                     if coches:
-                        coche = random.choice(coches)
+                        coche = self.rng.choice(coches)
                         self.parking.salir(coche['matricula'])
                         self.ventana.after(0, self.actualizar_vista)
             
@@ -894,6 +2340,22 @@ class InterfazParking:
         self.parking.guardar_estado()
         messagebox.showinfo("💾 Guardado", "Estado guardado correctamente")
     
+    def _mostrar_alerta(self, evento):
+        """Muestra el último aviso del vigilante de estancias"""
+        self.alertas += 1
+        if evento['tipo'] == VigilanteEstancias.EXCESO:
+            texto = f"⏰ {evento['matricula']} supera la estancia máxima en {evento['plaza']}"
+        else:
+            texto = f"🔌 {evento['matricula']} sigue en la plaza de carga {evento['plaza']} tras la ventana de carga"
+        self.label_alertas.config(text=f"{texto} ({self.alertas} avisos)")
+    
+    def cerrar(self):
+        """Guarda el estado final y cierra la ventana"""
+        self.automatico = False
+        self.vigilante.detener()
+        self.autoguardado.detener()
+        self.ventana.destroy()
+    
     def iniciar(self):
         """Inicia la interfaz gráfica"""
         self.ventana.mainloop()
@@ -901,6 +2363,9 @@ class InterfazParking:
 # ========================= PROGRAMA PRINCIPAL =========================
 
 if __name__ == "__main__":
+    from ocupacion_compartida import PublicadorOcupacion
+    from registro_estancias import RegistroEstancias
+    
     # Intentar cargar estado previo
     parking = Parking.cargar_estado()
     
@@ -913,5 +2378,19 @@ if __name__ == "__main__":
         }
         parking = Parking(filas=7, columnas=13, config_plazas=config)
     
+    # Histórico de estancias completadas (lo guarda el autoguardado)
+    parking.registro = RegistroEstancias('estancias')
+    
+    # Ocupación en memoria compartida para otros procesos (ocupacion_compartida.py)
+    try:
+        publicador = PublicadorOcupacion(parking)
+    except FileExistsError as e:
+        print(f"No se publica la ocupación: {e}")
+        publicador = None
+    
     interfaz = InterfazParking(parking)
-    interfaz.iniciar()
\ No newline at end of file
+    try:
+        interfaz.iniciar()
+    finally:
+        if publicador is not None:
+            publicador.cerrar()
\ No newline at end of file
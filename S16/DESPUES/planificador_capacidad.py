@@ -0,0 +1,175 @@
+"""
+Planificador de capacidad por Monte Carlo.
+
+Para cada combinación de tamaño y reparto de plazas (los `minusvalidos` y
+`electricos` de config_plazas) lanza muchas simulaciones con semilla de un día
+de tráfico contra un Parking sin interfaz: llegadas de Poisson que llaman a
+entrar() y estancias exponenciales que terminan en salir(), con un reloj
+simulado. Las simulaciones se reparten en un pool de procesos y se informa,
+por configuración, de la tasa de rechazo, la utilización y los ingresos.
+
+Uso:
+    python planificador_capacidad.py --minusvalidos 0.05,0.1,0.15 --electricos 0.05,0.1,0.2
+    python planificador_capacidad.py --tamanos 7x13,8x15 --simulaciones 500 --llegadas 80
+"""
+import argparse
+import heapq
+import itertools
+import os
+import random
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from parking_privado import Parking, crear_estrategia
+
+INICIO_SIMULACION = datetime(2026, 1, 5)  # lunes a las 0h, fijo para que sea reproducible
+
+def simular(filas, columnas, minusvalidos, electricos, semilla, horas=24,
+            llegadas_por_hora=60, estancia_media_min=90, estrategia='Estándar'):
+    """
+    Simula `horas` de tráfico sobre un parking nuevo.
+    
+    Returns:
+        dict: llegadas, rechazos, tasa_rechazo, utilizacion e ingresos
+    """
+    rng = random.Random(semilla)
+    parking = Parking(filas, columnas, {'minusvalidos': minusvalidos, 'electricos': electricos},
+                      rng=random.Random(rng.getrandbits(64)))
+    parking.cambiar_tarifa(crear_estrategia(estrategia))
+    
+    ahora = [INICIO_SIMULACION]
+    parking.reloj = lambda: ahora[0]
+    
+    capacidad = len(parking.aparcamientos)
+    fin = horas * 3600
+    tasa_llegada = llegadas_por_hora / 3600
+    tasa_salida = 1 / (estancia_media_min * 60)
+    
+    salidas = []            # heap de (segundo, secuencia, matrícula)
+    secuencia = itertools.count()
+    t = ultimo = 0.0
+    ocupadas = 0
+    area_ocupacion = 0.0    # integral de plazas ocupadas por segundo
+    llegadas = rechazos = 0
+    ingresos = 0.0
+    
+    while True:
+        t = t + rng.expovariate(tasa_llegada)
+        
+        # Salidas pendientes antes de la próxima llegada
+        while salidas and salidas[0][0] <= min(t, fin):
+            instante, _, matricula = heapq.heappop(salidas)
+            area_ocupacion += ocupadas * (instante - ultimo)
+            ultimo = instante
+            ahora[0] = INICIO_SIMULACION + timedelta(seconds=instante)
+            _, _, tarifa = parking.salir(matricula)
+            ingresos += tarifa
+            ocupadas -= 1
+        
+        if t >= fin:
+            break
+        
+        area_ocupacion += ocupadas * (t - ultimo)
+        ultimo = t
+        ahora[0] = INICIO_SIMULACION + timedelta(seconds=t)
+        
+        matricula = parking.cabina.generar_matricula()
+        es_minusvalido, es_electrico = parking.cabina.detectar_caracteristicas()
+        llegadas += 1
+        exito, _, _ = parking.entrar(matricula, es_minusvalido, es_electrico)
+        if exito:
+            ocupadas += 1
+            heapq.heappush(salidas, (t + rng.expovariate(tasa_salida), next(secuencia), matricula))
+        else:
+            rechazos += 1
+    
+    area_ocupacion += ocupadas * (fin - ultimo)
+    return {
+        'llegadas': llegadas,
+        'rechazos': rechazos,
+        'tasa_rechazo': rechazos / llegadas if llegadas else 0,
+        'utilizacion': area_ocupacion / (capacidad * fin) if capacidad else 0,
+        'ingresos': ingresos
+    }
+
+def _simular_tarea(tarea):
+    configuracion, semilla, parametros = tarea
+    return configuracion, simular(*configuracion, semilla, **parametros)
+
+def planificar(tamanos, fracciones_minusvalidos, fracciones_electricos, simulaciones=200,
+               semilla=0, procesos=None, **parametros):
+    """
+    Ejecuta la rejilla completa de configuraciones en paralelo.
+    
+    Args:
+        tamanos: Lista de (filas, columnas)
+        fracciones_minusvalidos: Valores de config_plazas['minusvalidos']
+        fracciones_electricos: Valores de config_plazas['electricos']
+        simulaciones: Simulaciones (semillas) por configuración
+        semilla: Semilla base; la simulación i usa semilla + i
+        procesos: Tamaño del pool (por defecto, todos los núcleos)
+        **parametros: horas, llegadas_por_hora, estancia_media_min, estrategia
+    
+    Returns:
+        list: Un dict por configuración con medias y desviaciones
+    """
+    configuraciones = [
+        (filas, columnas, m, e)
+        for (filas, columnas), m, e in itertools.product(tamanos, fracciones_minusvalidos, fracciones_electricos)
+        if m + e <= 1
+    ]
+    tareas = [(c, semilla + i, parametros) for c in configuraciones for i in range(simulaciones)]
+    
+    resultados = {c: [] for c in configuraciones}
+    procesos = procesos or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        trozo = max(1, len(tareas) // (procesos * 8))
+        for configuracion, resultado in pool.map(_simular_tarea, tareas, chunksize=trozo):
+            resultados[configuracion].append(resultado)
+    
+    informe = []
+    for (filas, columnas, m, e), lista in resultados.items():
+        fila = {'plazas': f"{filas}x{columnas}", 'minusvalidos': m, 'electricos': e}
+        for metrica in ('tasa_rechazo', 'utilizacion', 'ingresos'):
+            valores = [r[metrica] for r in lista]
+            fila[metrica] = statistics.fmean(valores)
+            fila[metrica + '_desv'] = statistics.pstdev(valores)
+        informe.append(fila)
+    return informe
+
+def _lista_floats(texto):
+    return [float(x) for x in texto.split(',') if x]
+
+def _lista_tamanos(texto):
+    return [tuple(int(n) for n in t.lower().split('x')) for t in texto.split(',') if t]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Planificador de capacidad (Monte Carlo)")
+    parser.add_argument('--tamanos', type=_lista_tamanos, default=[(7, 13)], help="p.ej. 7x13,8x15")
+    parser.add_argument('--minusvalidos', type=_lista_floats, default=[0.05, 0.10, 0.15, 0.20])
+    parser.add_argument('--electricos', type=_lista_floats, default=[0.05, 0.10, 0.15, 0.20])
+    parser.add_argument('--simulaciones', type=int, default=200)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--procesos', type=int, default=None)
+    parser.add_argument('--horas', type=float, default=24)
+    parser.add_argument('--llegadas', type=float, default=60, help="llegadas por hora")
+    parser.add_argument('--estancia', type=float, default=90, help="estancia media en minutos")
+    parser.add_argument('--tarifa', default='Estándar', help="nombre de la estrategia de tarifa")
+    args = parser.parse_args(argv)
+    
+    informe = planificar(
+        args.tamanos, args.minusvalidos, args.electricos, args.simulaciones,
+        args.semilla, args.procesos, horas=args.horas, llegadas_por_hora=args.llegadas,
+        estancia_media_min=args.estancia, estrategia=args.tarifa
+    )
+    
+    print(f"{'plazas':>7} {'PMR':>5} {'EV':>5} {'rechazo':>15} {'utilización':>15} {'ingresos':>20}")
+    for fila in sorted(informe, key=lambda f: f['tasa_rechazo']):
+        print(f"{fila['plazas']:>7} {fila['minusvalidos']:>5.2f} {fila['electricos']:>5.2f} "
+              f"{fila['tasa_rechazo'] * 100:>7.1f}% ±{fila['tasa_rechazo_desv'] * 100:4.1f} "
+              f"{fila['utilizacion'] * 100:>7.1f}% ±{fila['utilizacion_desv'] * 100:4.1f} "
+              f"{fila['ingresos']:>11.2f}€ ±{fila['ingresos_desv']:6.2f}")
+
+if __name__ == "__main__":
+    main()
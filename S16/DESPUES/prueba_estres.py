@@ -0,0 +1,328 @@
+"""
+Prueba de estrés concurrente del parking, sin interfaz gráfica.
+
+Varios hilos llaman a la vez a entrar, salir, listar_coches, resumen,
+guardar_estado y guardar_cambios sobre el mismo Parking (con varias puertas y
+cola de espera). Durante la ronda cada hilo valida lo que ve (listados sin
+matrículas repetidas, resúmenes que suman) y al terminarla se comprueban los
+invariantes del parking:
+
+- una plaza está ocupada si y solo si tiene coche;
+- _libres, el índice de matrículas y los contadores por tipo cuadran con las
+  plazas, y resumen() y listar_coches() con todo ello;
+- ninguna matrícula está en dos plazas, ni aparcada y en la cola a la vez;
+- el estado guardado (completo, incremental y comprimido) se vuelve a cargar
+  idéntico.
+
+Imprime el rendimiento de cada ronda y las latencias por operación, y termina
+con código 1 si se ha roto algún invariante.
+
+Uso:
+    python prueba_estres.py [--hilos 1,4,16] [--rondas 5] [--operaciones 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import Counter
+
+from estadisticas_estancias import EstadisticasEstancias
+from parking_privado import Parking, TipoPlaza
+
+TIPOS = (TipoPlaza.NORMAL, TipoPlaza.MINUSVALIDO, TipoPlaza.ELECTRICO)
+
+# Peso de cada operación en la mezcla de los hilos
+MEZCLA = {'entrar': 40, 'salir': 35, 'listar': 10, 'resumen': 10, 'guardar': 5}
+
+# ========================= INVARIANTES =========================
+
+def _comprobar_listado(coches):
+    """Un listado de listar_coches() sin matrículas ni plazas repetidas"""
+    errores = []
+    for campo in ('matricula', 'plaza'):
+        repetidas = [v for v, n in Counter(c[campo] for c in coches).items() if n > 1]
+        if repetidas:
+            errores.append(f"listar_coches repite {campo}: {repetidas[:5]}")
+    return errores
+
+def _comprobar_resumen(resumen):
+    """Un resumen() cuyas cifras suman"""
+    errores = []
+    por_tipo = resumen['por_tipo'].values()
+    if resumen['ocupadas'] + resumen['libres'] != resumen['total_plazas']:
+        errores.append(f"resumen: ocupadas + libres != total ({resumen})")
+    if sum(t['total'] for t in por_tipo) != resumen['total_plazas']:
+        errores.append("resumen: los totales por tipo no suman el total")
+    if sum(t['ocupadas'] for t in por_tipo) != resumen['ocupadas']:
+        errores.append("resumen: las ocupadas por tipo no suman las ocupadas")
+    if any(t['libres'] < 0 or t['ocupadas'] < 0 for t in por_tipo):
+        errores.append(f"resumen: contadores negativos ({resumen['por_tipo']})")
+    return errores
+
+def comprobar_invariantes(parking):
+    """
+    Revisa la coherencia interna del parking con su cerrojo tomado.
+    
+    Es una comprobación de caja blanca: lee a propósito el estado privado
+    (_cerrojo, _libres, _matriculas, _ocupadas_tipo y la cola) para contrastar
+    las estructuras derivadas con las plazas. El resto del código debe usar
+    la interfaz pública de Parking.
+    
+    Returns:
+        list: Descripción de cada invariante roto (vacía si todo cuadra)
+    """
+    errores = []
+    with parking._cerrojo:
+        ocupadas_tipo = Counter()
+        aparcados = {}
+        for indice, aparcamiento in enumerate(parking.aparcamientos):
+            if aparcamiento.ocupado != (aparcamiento.coche is not None):
+                errores.append(f"{aparcamiento.id}: ocupado={aparcamiento.ocupado} "
+                               f"con coche={aparcamiento.coche}")
+            esperado = 0 if aparcamiento.ocupado else aparcamiento.mascara
+            if parking._libres[indice] != esperado:
+                errores.append(f"{aparcamiento.id}: _libres={parking._libres[indice]}, "
+                               f"debería ser {esperado}")
+            if aparcamiento.ocupado and aparcamiento.coche:
+                ocupadas_tipo[aparcamiento.tipo] += 1
+                matricula = aparcamiento.coche.matricula
+                if matricula in aparcados:
+                    errores.append(f"{matricula} aparcado en {aparcados[matricula]} y en {indice}")
+                aparcados[matricula] = indice
+        
+        if parking._matriculas != aparcados:
+            errores.append("El índice de matrículas no coincide con las plazas")
+        for tipo in TIPOS:
+            if parking._ocupadas_tipo[tipo] != ocupadas_tipo[tipo]:
+                errores.append(f"Ocupadas de tipo {tipo}: contador {parking._ocupadas_tipo[tipo]}, "
+                               f"plazas {ocupadas_tipo[tipo]}")
+        
+        en_cola = Counter(coche.matricula for cola in parking.cabina.cola._colas.values()
+                          for coche, _ in cola)
+        for matricula, veces in en_cola.items():
+            if veces > 1 or matricula in aparcados:
+                errores.append(f"{matricula} está {veces} veces en la cola"
+                               + (" y aparcado" if matricula in aparcados else ""))
+        
+        resumen = parking.resumen()
+        errores.extend(_comprobar_resumen(resumen))
+        if resumen['ocupadas'] != len(aparcados):
+            errores.append(f"resumen: {resumen['ocupadas']} ocupadas, pero hay {len(aparcados)} coches")
+        try:
+            coches = parking.listar_coches()
+        except (AttributeError, TypeError) as e:
+            # Una plaza ocupada sin coche o sin hora de entrada rompe el listado
+            errores.append(f"listar_coches falla: {e!r}")
+            return errores
+        errores.extend(_comprobar_listado(coches))
+        if len(coches) != len(aparcados):
+            errores.append(f"listar_coches: {len(coches)} coches, pero hay {len(aparcados)} aparcados")
+    return errores
+
+def firma(parking):
+    """Lo que debe sobrevivir a guardar y cargar el estado"""
+    estado = parking.exportar_ocupacion()
+    disposicion = [(a.id, a.tipo) for a in parking.aparcamientos]
+    return disposicion, estado['ocupadas'], estado['puertas']
+
+def comprobar_persistencia(parking, archivo, version=None):
+    """
+    Guarda el estado (si se indica `version`) o un incremental sobre el
+    último snapshot de `archivo`, lo vuelve a cargar y lo compara.
+    
+    Returns:
+        list: Invariantes rotos del parking cargado o diferencias con el original
+    """
+    if version is None:
+        parking.guardar_cambios(archivo)
+    else:
+        parking.guardar_estado(archivo, version=version)
+    cargado = Parking.cargar_estado(archivo)
+    errores = [f"{os.path.basename(archivo)} cargado: {e}" for e in comprobar_invariantes(cargado)]
+    if firma(cargado) != firma(parking):
+        tipo = 'incremental' if version is None else f"v{version}"
+        errores.append(f"{os.path.basename(archivo)} ({tipo}): el estado cargado no coincide con el guardado")
+    return errores
+
+# ========================= RONDAS =========================
+
+def _trabajar(parking, rng, operaciones, matriculas, archivos, barrera, resultado):
+    """Bucle de un hilo: `operaciones` llamadas elegidas según MEZCLA"""
+    nombres = list(MEZCLA)
+    pesos = list(MEZCLA.values())
+    vistas = []  # matrículas del último listado, candidatas a salir
+    puertas = len(parking.cabinas)
+    latencias = resultado['latencias']
+    barrera.wait()
+    
+    for operacion in rng.choices(nombres, pesos, k=operaciones):
+        inicio = time.perf_counter()
+        try:
+            if operacion == 'entrar':
+                if rng.random() < 0.5:
+                    # Matrícula de un grupo compartido: varios hilos intentan la misma
+                    exito, _, plaza = parking.entrar(rng.choice(matriculas), rng.random() < 0.15,
+                                                     rng.random() < 0.2, rng.randrange(puertas))
+                else:
+                    exito, _, plaza = parking.entrar(puerta=rng.randrange(puertas))
+                if exito and plaza is None:
+                    resultado['errores'].append("entrar con éxito pero sin plaza")
+            elif operacion == 'salir':
+                matricula = rng.choice(vistas) if vistas else rng.choice(matriculas)
+                parking.salir(matricula, rng.randrange(puertas))
+            elif operacion == 'listar':
+                coches = parking.listar_coches()
+                resultado['errores'].extend(_comprobar_listado(coches))
+                vistas = [c['matricula'] for c in coches]
+            elif operacion == 'resumen':
+                resultado['errores'].extend(_comprobar_resumen(parking.resumen()))
+            elif rng.random() < 0.5:
+                parking.guardar_cambios(archivos['base'])
+            else:
+                parking.guardar_estado(archivos[rng.choice(('base', 'comprimido'))])
+        except Exception:
+            resultado['errores'].append(f"{operacion}: {traceback.format_exc(limit=3)}")
+        latencias.setdefault(operacion, []).append(time.perf_counter() - inicio)
+
+def ronda(parking, hilos, operaciones, directorio, semilla=0):
+    """
+    Lanza `hilos` hilos a la vez sobre el parking y comprueba después los
+    invariantes y la persistencia.
+    
+    Returns:
+        dict: operaciones, duración, latencias por operación y errores
+    """
+    rng = random.Random(semilla)
+    matriculas = parking.cabina.generar_matriculas(len(parking.aparcamientos))
+    archivos = {
+        'base': os.path.join(directorio, 'estado.json'),
+        'comprimido': os.path.join(directorio, 'estado.json.gz')
+    }
+    parking.guardar_estado(archivos['base'])  # base de los incrementales de la ronda
+    
+    barrera = threading.Barrier(hilos + 1)
+    resultados = [{'latencias': {}, 'errores': []} for _ in range(hilos)]
+    trabajadores = [
+        threading.Thread(target=_trabajar, args=(parking, random.Random(rng.getrandbits(64)), operaciones,
+                                                 matriculas, archivos, barrera, resultado))
+        for resultado in resultados
+    ]
+    for trabajador in trabajadores:
+        trabajador.start()
+    barrera.wait()
+    inicio = time.perf_counter()
+    for trabajador in trabajadores:
+        trabajador.join()
+    duracion = time.perf_counter() - inicio
+    
+    errores = [e for r in resultados for e in r['errores']]
+    errores += comprobar_invariantes(parking)
+    # El comprimido es una foto de mitad de ronda: solo se puede exigir que sea coherente
+    if os.path.exists(archivos['comprimido']):
+        errores += [f"estado.json.gz cargado: {e}"
+                    for e in comprobar_invariantes(Parking.cargar_estado(archivos['comprimido']))]
+    errores += comprobar_persistencia(parking, archivos['base'])
+    errores += comprobar_persistencia(parking, os.path.join(directorio, 'estado_v1.json'), version=1)
+    errores += comprobar_persistencia(parking, archivos['base'], version=2)
+    
+    latencias = {}
+    for resultado in resultados:
+        for operacion, valores in resultado['latencias'].items():
+            latencias.setdefault(operacion, []).extend(valores)
+    return {
+        'operaciones': hilos * operaciones,
+        'duracion': duracion,
+        'latencias': latencias,
+        'errores': errores
+    }
+
+def _percentil(ordenados, q):
+    return ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))]
+
+def estresar(hilos=(1, 4, 16), rondas=5, operaciones=2000, filas=10, columnas=20, puertas=4,
+             capacidad_cola=20, semilla=0):
+    """
+    Ejecuta `rondas` rondas con cada número de hilos sobre un parking nuevo.
+    
+    Returns:
+        tuple: (filas de rendimiento por ronda, filas de latencia por
+                operación, lista de errores)
+    """
+    rendimiento, latencias, errores = [], {}, []
+    for n in hilos:
+        parking = Parking(filas, columnas, capacidad_cola=capacidad_cola, num_cabinas=puertas,
+                          semilla=semilla)
+        estadisticas = EstadisticasEstancias(parking)  # observador activo durante la prueba
+        with tempfile.TemporaryDirectory() as directorio:
+            for numero in range(1, rondas + 1):
+                medida = ronda(parking, n, operaciones, directorio, semilla + numero)
+                if len(estadisticas) != parking.vehiculos_aparcados():
+                    medida['errores'].append("EstadisticasEstancias no sigue la ocupación")
+                for error in medida['errores']:
+                    errores.append(f"[{n} hilos, ronda {numero}] {error}")
+                for operacion, valores in medida['latencias'].items():
+                    latencias.setdefault((n, operacion), []).extend(valores)
+                resumen = parking.resumen()
+                rendimiento.append({
+                    'hilos': n,
+                    'ronda': numero,
+                    'ops_por_seg': medida['operaciones'] / medida['duracion'],
+                    'ocupacion_%': resumen['ocupacion_porcentaje'],
+                    'en_cola': resumen['en_cola'],
+                    'errores': len(medida['errores'])
+                })
+        estadisticas.cerrar()
+    
+    por_operacion = []
+    for (n, operacion), valores in sorted(latencias.items()):
+        valores.sort()
+        por_operacion.append({
+            'hilos': n,
+            'operacion': operacion,
+            'llamadas': len(valores),
+            'p50_ms': _percentil(valores, 0.5) * 1000,
+            'p99_ms': _percentil(valores, 0.99) * 1000,
+            'max_ms': valores[-1] * 1000
+        })
+    return rendimiento, por_operacion, errores
+
+def imprimir_tabla(filas):
+    columnas = list(filas[0])
+    print('  '.join(f"{c:>12}" for c in columnas))
+    for fila in filas:
+        print('  '.join(f"{v:>12.2f}" if isinstance(v, float) else f"{v:>12}" for v in fila.values()))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de estrés concurrente del parking")
+    parser.add_argument('--hilos', default='1,4,16', help="números de hilos separados por comas")
+    parser.add_argument('--rondas', type=int, default=5)
+    parser.add_argument('--operaciones', type=int, default=2000, help="llamadas por hilo y ronda")
+    parser.add_argument('--filas', type=int, default=10)
+    parser.add_argument('--columnas', type=int, default=20)
+    parser.add_argument('--puertas', type=int, default=4)
+    parser.add_argument('--cola', type=int, default=20, help="capacidad de la cola de espera")
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args(argv)
+    
+    hilos = tuple(int(n) for n in args.hilos.split(',') if n)
+    rendimiento, por_operacion, errores = estresar(
+        hilos, args.rondas, args.operaciones, args.filas, args.columnas, args.puertas,
+        args.cola, args.semilla
+    )
+    imprimir_tabla(rendimiento)
+    print()
+    imprimir_tabla(por_operacion)
+    
+    if errores:
+        print(f"\n{len(errores)} invariantes rotos:", file=sys.stderr)
+        for error in errores[:50]:
+            print(f"  {error}", file=sys.stderr)
+        sys.exit(1)
+    print("\nTodos los invariantes se cumplen")
+
+if __name__ == "__main__":
+    main()
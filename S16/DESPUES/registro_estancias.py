@@ -0,0 +1,302 @@
+"""
+Registro de estancias completadas (append-only) en formato columnar.
+
+Cada estancia que termina en Parking.salir se anota en columnas de `array`
+(una por campo). Cuando el bloque en memoria se llena se aparta y
+Parking.salir lo vuelca a disco, ya fuera de su cerrojo, como un fichero
+binario; en memoria solo queda su resumen (rango de fechas y totales por
+tipo de plaza). Las consultas agregadas usan esos resúmenes para los bloques
+que caen enteros dentro del rango y solo leen de disco los bloques que lo
+cortan.
+"""
+import json
+import os
+import sys
+from array import array
+from datetime import datetime
+from threading import Lock
+
+from parking_privado import TipoPlaza
+
+TIPOS = (TipoPlaza.NORMAL, TipoPlaza.MINUSVALIDO, TipoPlaza.ELECTRICO)
+CODIGO_TIPO = {tipo: i for i, tipo in enumerate(TIPOS)}
+
+FLAG_MINUSVALIDO = 1
+FLAG_ELECTRICO = 2
+
+ANCHO_MATRICULA = 8
+
+# (nombre, typecode) de las columnas numéricas
+COLUMNAS = (
+    ('plaza', 'H'),       # índice en la tabla de plazas del bloque
+    ('tipo', 'B'),        # índice en TIPOS
+    ('flags', 'B'),       # FLAG_MINUSVALIDO | FLAG_ELECTRICO
+    ('estrategia', 'B'),  # índice en la tabla de estrategias del bloque
+    ('entrada', 'd'),     # epoch en segundos
+    ('salida', 'd'),      # epoch en segundos
+    ('tarifa', 'd')
+)
+
+def _epoch(instante):
+    """Acepta datetime, epoch o None"""
+    if instante is None or isinstance(instante, (int, float)):
+        return instante
+    return instante.timestamp()
+
+class Bloque:
+    """Bloque de estancias con una columna por campo"""
+    def __init__(self):
+        self.matriculas = bytearray()
+        self.columnas = {nombre: array(codigo) for nombre, codigo in COLUMNAS}
+        self.plazas = []
+        self.estrategias = []
+        self._indice_plaza = {}
+        self._indice_estrategia = {}
+    
+    def __len__(self):
+        return len(self.columnas['salida'])
+    
+    def _codificar(self, valor, tabla, indice):
+        codigo = indice.get(valor)
+        if codigo is None:
+            codigo = indice[valor] = len(tabla)
+            tabla.append(valor)
+        return codigo
+    
+    def anotar(self, matricula, plaza, tipo, flags, entrada, salida, tarifa, estrategia):
+        self.matriculas += matricula.encode('ascii', 'replace')[:ANCHO_MATRICULA].ljust(ANCHO_MATRICULA)
+        c = self.columnas
+        c['plaza'].append(self._codificar(plaza, self.plazas, self._indice_plaza))
+        c['tipo'].append(CODIGO_TIPO.get(tipo, 0))
+        c['flags'].append(flags)
+        c['estrategia'].append(self._codificar(estrategia, self.estrategias, self._indice_estrategia))
+        c['entrada'].append(entrada)
+        c['salida'].append(salida)
+        c['tarifa'].append(tarifa)
+    
+    def matricula(self, i):
+        inicio = i * ANCHO_MATRICULA
+        return self.matriculas[inicio:inicio + ANCHO_MATRICULA].decode('ascii').rstrip()
+    
+    def resumen(self):
+        """Rango de salidas y totales por tipo (para no releer el bloque)"""
+        c = self.columnas
+        por_tipo = {tipo: [0, 0.0, 0.0] for tipo in TIPOS}
+        for codigo, entrada, salida, tarifa in zip(c['tipo'], c['entrada'], c['salida'], c['tarifa']):
+            totales = por_tipo[TIPOS[codigo]]
+            totales[0] += 1
+            totales[1] += tarifa
+            totales[2] += salida - entrada
+        return {
+            'n': len(self),
+            'salida_min': min(c['salida']) if len(self) else None,
+            'salida_max': max(c['salida']) if len(self) else None,
+            'por_tipo': por_tipo
+        }
+    
+    def guardar(self, archivo):
+        cabecera = {
+            'n': len(self),
+            'orden': sys.byteorder,
+            'plazas': self.plazas,
+            'estrategias': self.estrategias
+        }
+        with open(archivo, 'wb') as f:
+            f.write(json.dumps(cabecera, ensure_ascii=False).encode('utf-8') + b'\n')
+            f.write(self.matriculas)
+            for nombre, _ in COLUMNAS:
+                self.columnas[nombre].tofile(f)
+    
+    @staticmethod
+    def cargar(archivo):
+        bloque = Bloque()
+        with open(archivo, 'rb') as f:
+            cabecera = json.loads(f.readline())
+            n = cabecera['n']
+            bloque.matriculas = bytearray(f.read(n * ANCHO_MATRICULA))
+            for nombre, _ in COLUMNAS:
+                columna = bloque.columnas[nombre]
+                columna.fromfile(f, n)
+                if cabecera['orden'] != sys.byteorder:
+                    columna.byteswap()
+        bloque.plazas = cabecera['plazas']
+        bloque.estrategias = cabecera['estrategias']
+        bloque._indice_plaza = {p: i for i, p in enumerate(bloque.plazas)}
+        bloque._indice_estrategia = {e: i for i, e in enumerate(bloque.estrategias)}
+        return bloque
+    
+    def registros(self):
+        """Itera las estancias del bloque como diccionarios"""
+        c = self.columnas
+        for i in range(len(self)):
+            flags = c['flags'][i]
+            yield {
+                'matricula': self.matricula(i),
+                'plaza': self.plazas[c['plaza'][i]],
+                'tipo_plaza': TIPOS[c['tipo'][i]],
+                'es_minusvalido': bool(flags & FLAG_MINUSVALIDO),
+                'es_electrico': bool(flags & FLAG_ELECTRICO),
+                'entrada': datetime.fromtimestamp(c['entrada'][i]),
+                'salida': datetime.fromtimestamp(c['salida'][i]),
+                'tarifa': c['tarifa'][i],
+                'estrategia': self.estrategias[c['estrategia'][i]]
+            }
+
+class RegistroEstancias:
+    """Libro de estancias completadas con persistencia por bloques"""
+    TAMANO_BLOQUE = 8192
+    
+    def __init__(self, directorio=None, tamano_bloque=TAMANO_BLOQUE):
+        """
+        Args:
+            directorio: Carpeta donde se vuelcan los bloques (None = solo memoria)
+            tamano_bloque: Estancias por bloque antes de volcarlo a disco
+        """
+        self.directorio = directorio
+        self.tamano_bloque = tamano_bloque
+        self.bloques = []          # resúmenes de bloques volcados a disco
+        self.actual = Bloque()
+        self._en_memoria = []      # bloques llenos sin volcar (todos, si no hay directorio)
+        self._cerrojo = Lock()          # bloque en curso y listas de bloques
+        self._cerrojo_volcado = Lock()  # una sola escritura a disco a la vez
+        
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+            indice = self._ruta_indice()
+            if os.path.exists(indice):
+                with open(indice, 'r', encoding='utf-8') as f:
+                    self.bloques = json.load(f)['bloques']
+    
+    def __len__(self):
+        return (sum(b['n'] for b in self.bloques)
+                + sum(len(b) for b in self._en_memoria) + len(self.actual))
+    
+    # ========== ESCRITURA ==========
+    
+    def anotar(self, matricula, plaza, tipo_plaza, es_minusvalido, es_electrico,
+               entrada, salida, tarifa, estrategia):
+        """Añade una estancia completada (entrada/salida como datetime o epoch)"""
+        flags = (FLAG_MINUSVALIDO if es_minusvalido else 0) | (FLAG_ELECTRICO if es_electrico else 0)
+        with self._cerrojo:
+            self.actual.anotar(matricula, plaza, tipo_plaza, flags,
+                               _epoch(entrada), _epoch(salida), tarifa, estrategia)
+            if len(self.actual) >= self.tamano_bloque:
+                self._cerrar_bloque()
+    
+    def guardar(self):
+        """Cierra el bloque en curso aunque no esté lleno y vuelca a disco los pendientes"""
+        if not self.directorio:
+            return
+        with self._cerrojo:
+            if len(self.actual):
+                self._cerrar_bloque()
+        self.volcar()
+    
+    def volcar(self):
+        """
+        Escribe en disco los bloques llenos pendientes.
+        
+        anotar solo aparta el bloque lleno, porque se llama con el cerrojo del
+        parking tomado; la escritura se hace aquí, después de soltarlo.
+        
+        Returns:
+            int: Número de bloques escritos
+        """
+        if not self.directorio or not self._en_memoria:
+            return 0
+        with self._cerrojo_volcado:
+            volcados = 0
+            while self._en_memoria:
+                bloque = self._en_memoria[0]
+                nombre = f"bloque_{len(self.bloques):06d}.bin"
+                bloque.guardar(os.path.join(self.directorio, nombre))
+                resumen = bloque.resumen()
+                resumen['archivo'] = nombre
+                with self._cerrojo:
+                    self.bloques.append(resumen)
+                    self._en_memoria.pop(0)
+                volcados += 1
+            
+            if volcados:
+                temporal = self._ruta_indice() + '.tmp'
+                with open(temporal, 'w', encoding='utf-8') as f:
+                    json.dump({'bloques': self.bloques}, f)
+                os.replace(temporal, self._ruta_indice())
+            return volcados
+    
+    def _cerrar_bloque(self):
+        self._en_memoria.append(self.actual)
+        self.actual = Bloque()
+    
+    def _ruta_indice(self):
+        return os.path.join(self.directorio, 'indice.json')
+    
+    # ========== LECTURA ==========
+    
+    def iterar_bloques(self):
+        """Itera los bloques de uno en uno (los de disco se cargan bajo demanda)"""
+        with self._cerrojo:
+            bloques, en_memoria, actual = list(self.bloques), list(self._en_memoria), self.actual
+        for resumen in bloques:
+            yield Bloque.cargar(os.path.join(self.directorio, resumen['archivo']))
+        yield from en_memoria
+        if len(actual):
+            yield actual
+    
+    def iterar(self):
+        """Itera todas las estancias como diccionarios, bloque a bloque"""
+        for bloque in self.iterar_bloques():
+            yield from bloque.registros()
+    
+    def agregar(self, desde=None, hasta=None, tipo_plaza=None):
+        """
+        Agrega las estancias con salida en [desde, hasta).
+        
+        Args:
+            desde: Inicio del rango (datetime o epoch, opcional)
+            hasta: Fin del rango (datetime o epoch, opcional)
+            tipo_plaza: Filtrar por tipo de plaza (opcional)
+        
+        Returns:
+            dict: estancias, ingresos y estancia_media_segundos
+        """
+        desde, hasta = _epoch(desde), _epoch(hasta)
+        tipos = [tipo_plaza] if tipo_plaza else list(TIPOS)
+        n, ingresos, duracion = 0, 0.0, 0.0
+        
+        with self._cerrojo:
+            bloques, pendientes = list(self.bloques), list(self._en_memoria) + [self.actual]
+        for resumen in bloques:
+            if not resumen['n']:
+                continue
+            if ((desde is not None and resumen['salida_max'] < desde)
+                    or (hasta is not None and resumen['salida_min'] >= hasta)):
+                continue
+            if ((desde is None or resumen['salida_min'] >= desde)
+                    and (hasta is None or resumen['salida_max'] < hasta)):
+                # Bloque entero dentro del rango: basta con su resumen
+                for tipo in tipos:
+                    cuenta, suma_tarifa, suma_duracion = resumen['por_tipo'][tipo]
+                    n += cuenta
+                    ingresos += suma_tarifa
+                    duracion += suma_duracion
+                continue
+            pendientes.append(Bloque.cargar(os.path.join(self.directorio, resumen['archivo'])))
+        
+        codigos = {CODIGO_TIPO[t] for t in tipos}
+        for bloque in pendientes:
+            c = bloque.columnas
+            for codigo, entrada, salida, tarifa in zip(c['tipo'], c['entrada'], c['salida'], c['tarifa']):
+                if codigo not in codigos:
+                    continue
+                if (desde is not None and salida < desde) or (hasta is not None and salida >= hasta):
+                    continue
+                n += 1
+                ingresos += tarifa
+                duracion += salida - entrada
+        
+        return {
+            'estancias': n,
+            'ingresos': round(ingresos, 2),
+            'estancia_media_segundos': duracion / n if n else 0
+        }